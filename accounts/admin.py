@@ -59,9 +59,11 @@ class UserAdmin(BaseUserAdmin):
     def profile_picture_preview(self, obj):
         """Exibe uma prévia da foto de perfil no admin."""
         if obj.profile_picture:
+            # Miniatura gerada por backend.images; o original enquanto ela não existe
+            thumb = (obj.profile_picture_variants or {}).get('thumb', {}).get('webp')
             return format_html(
                 '<img src="{}" width="50" height="50" style="border-radius: 50%; object-fit: cover;" />',
-                obj.profile_picture.url
+                obj.profile_picture.storage.url(thumb) if thumb else obj.profile_picture.url
             )
         return 'Sem foto'
 
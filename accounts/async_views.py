@@ -0,0 +1,25 @@
+"""Variante assíncrona da lista de usuários (``ASYNC_READ_VIEWS``; ver ``backend/aio.py``)."""
+from asgiref.sync import sync_to_async
+from rest_framework.settings import api_settings
+
+from backend import aio
+from .models import User
+from .serializers import UserSerializer, resolve_followed_ids
+from .views import UsersListView
+
+
+@aio.async_variant(UsersListView.as_view())
+async def users_list(request):
+    if request.GET.get(api_settings.SEARCH_PARAM) or request.GET.get(api_settings.ORDERING_PARAM):
+        raise aio.Fallback()
+    user = await aio.authenticate(request)
+    queryset = User.objects.all().order_by('-date_joined')
+    if user.is_authenticated:
+        queryset = queryset.exclude(id=user.id)
+    users = [u async for u in queryset]
+    # Só os usuários da resposta, como na view síncrona: os seguidos do leitor podem ser milhares
+    followed_ids = await sync_to_async(resolve_followed_ids)(user, users)
+    context = {'request': request, 'followed_ids': followed_ids}
+    data = UserSerializer(users, many=True, context=context).data
+    # Como o ETag que ConditionalGetMixin tira do response.data na view síncrona
+    return aio.conditional_json(request, user, (data,), lambda: data)
@@ -0,0 +1,49 @@
+"""
+Autenticação JWT sem sessão (opcional, ``JWT_AUTH_ENABLED``).
+
+O token é validado só com a assinatura, sem tocar na tabela de sessões, e o
+usuário é resolvido por um cache com TTL (``JWT_USER_CACHE_TTL``) indexado
+pelo id: num acerto de cache a autenticação não faz nenhuma consulta.
+``User.save()`` e ``delete()`` invalidam a entrada (``accounts/signals.py``);
+quem altera o usuário com ``.update()`` (ex.: contadores de seguidores) deve
+chamar ``invalidate_cached_user``. Com vários workers, o cache precisa ser
+compartilhado para a invalidação valer em todos.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(*user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.JWT_USER_CACHE_TTL)
+            return user
+
+        # Mesmas verificações de JWTAuthentication.get_user, sobre o usuário em cache
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
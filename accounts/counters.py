@@ -0,0 +1,25 @@
+"""Contadores desnormalizados de ``User`` (seguidores e seguidos)."""
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, User
+
+# Ids por UPDATE (o IN de um perfil com muitos seguidores estouraria o limite de variáveis do SQLite)
+BATCH_SIZE = 1000
+
+
+def _total(field):
+    rows = Follow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('id'))
+    return Coalesce(Subquery(rows.values('n')), 0)
+
+
+def recount_follows(user_ids=None):
+    """Recalcula ``followers_count`` e ``following_count`` a partir de ``Follow``; devolve o nº de usuários."""
+    counters = {'followers_count': _total('following'), 'following_count': _total('follower')}
+    if user_ids is None:
+        return User.objects.update(**counters)
+    user_ids = list(user_ids)
+    return sum(
+        User.objects.filter(pk__in=user_ids[i:i + BATCH_SIZE]).update(**counters)
+        for i in range(0, len(user_ids), BATCH_SIZE)
+    )
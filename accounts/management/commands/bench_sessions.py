@@ -0,0 +1,69 @@
+import json
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from accounts.models import User
+from backend.bench import scratch_database
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+class Command(BaseCommand):
+    help = 'Conta gravações de sessão por 1k requisições autenticadas, por engine e granularidade do IdleLogoutMiddleware.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--spacing', type=float, default=5.0, help='Segundos simulados entre requisições do mesmo usuário.')
+        parser.add_argument('--granularities', type=int, nargs='*', default=[0, 60])
+        parser.add_argument('--path', default='/api/auth/check-auth/')
+
+    def handle(self, *args, **options):
+        report = {'requests': options['requests'], 'spacing_s': options['spacing'], 'path': options['path'], 'engines': {}}
+        with scratch_database():
+            user = User.objects.create_user(email='bench@example.com', username='bench', password='SenhaSegura123')
+            for name, engine in ENGINES.items():
+                report['engines'][name] = {
+                    str(granularity): self.run(user, engine, granularity, options)
+                    for granularity in options['granularities']
+                }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, user, engine, granularity, options):
+        with override_settings(SESSION_ENGINE=engine, IDLE_TOUCH_GRANULARITY_SECONDS=granularity):
+            client = Client()
+            client.force_login(user)
+            clock = time.time()
+            db_reads = db_writes = cookie_writes = 0
+
+            def count_session_queries(execute, sql, params, many, context):
+                nonlocal db_reads, db_writes
+                if 'django_session' in sql:
+                    if sql.lstrip().upper().startswith(('UPDATE', 'INSERT')):
+                        db_writes += 1
+                    else:
+                        db_reads += 1
+                return execute(sql, params, many, context)
+
+            # Relógio simulado: cada requisição acontece ``spacing`` segundos depois da anterior
+            with mock.patch('backend.middleware.time.time', side_effect=lambda: clock), \
+                    connection.execute_wrapper(count_session_queries):
+                for _ in range(options['requests']):
+                    clock += options['spacing']
+                    response = client.get(options['path'], secure=True, HTTP_HOST='localhost')
+                    if response.status_code != 200:
+                        raise CommandError(f'{options["path"]} respondeu {response.status_code}.')
+                    cookie_writes += 'sessionid' in response.cookies
+        per_1k = 1000 / options['requests']
+        return {
+            'db_reads_per_1k': round(db_reads * per_1k, 1),
+            'db_writes_per_1k': round(db_writes * per_1k, 1),
+            'set_cookie_per_1k': round(cookie_writes * per_1k, 1),
+        }
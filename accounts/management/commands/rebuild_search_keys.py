@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User, sync_name_keys
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as chaves do typeahead (username_key, name_key e UserNameKey) de todos os usuários.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = User.objects.only('id', 'username', 'first_name', 'last_name').order_by('pk')
+        total = 0
+        with transaction.atomic():
+            batch = []
+            for user in users.iterator(chunk_size=batch_size):
+                user.refresh_search_keys()
+                batch.append(user)
+                if len(batch) == batch_size:
+                    total += self.write(batch)
+                    batch = []
+            total += self.write(batch)
+        self.stdout.write(self.style.SUCCESS(f'Chaves de busca recalculadas para {total} usuários.'))
+
+    def write(self, users):
+        User.objects.bulk_update(users, ['username_key', 'name_key'])
+        sync_name_keys(users)
+        return len(users)
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:48
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize(value):
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+
+def backfill_keys(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    users = list(User.objects.only('id', 'username', 'first_name', 'last_name'))
+    for user in users:
+        user.username_key = normalize(user.username)
+        user.name_key = normalize(f'{user.first_name} {user.last_name}')
+    User.objects.bulk_update(users, ['username_key', 'name_key'], batch_size=1000)
+
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX accounts_user_username_key_trgm ON accounts_user USING gin (username_key gin_trgm_ops)',
+    'CREATE INDEX accounts_user_name_key_trgm ON accounts_user USING gin (name_key gin_trgm_ops)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS accounts_user_name_key_trgm',
+    'DROP INDEX IF EXISTS accounts_user_username_key_trgm',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_follow_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='name_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='username_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+        migrations.RunPython(run(POSTGRES_FORWARD), run(POSTGRES_BACKWARD)),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_name_keys(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserNameKey = apps.get_model('accounts', 'UserNameKey')
+    rows = []
+    for user_id, name_key in User.objects.values_list('id', 'name_key').iterator():
+        words = name_key.split()
+        for key in dict.fromkeys(' '.join(words[i:]) for i in range(len(words))):
+            rows.append(UserNameKey(user_id=user_id, key=key))
+    UserNameKey.objects.bulk_create(rows, batch_size=1000)
+
+
+# O trigram do typeahead passa da coluna name_key para as chaves por palavra
+POSTGRES_FORWARD = [
+    'DROP INDEX IF EXISTS accounts_user_name_key_trgm',
+    'CREATE INDEX accounts_usernamekey_key_trgm ON accounts_usernamekey USING gin (key gin_trgm_ops)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS accounts_usernamekey_key_trgm',
+    'CREATE INDEX accounts_user_name_key_trgm ON accounts_user USING gin (name_key gin_trgm_ops)',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserNameKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=150)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='unique_user_name_key')],
+            },
+        ),
+        migrations.RunPython(backfill_name_keys, migrations.RunPython.noop),
+        migrations.RunPython(run(POSTGRES_FORWARD), run(POSTGRES_BACKWARD)),
+    ]
@@ -1,8 +1,23 @@
+import unicodedata
+
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 
+def normalize_search_key(value):
+    """Chave de busca: sem acentos, minúscula e com espaços normalizados."""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+def name_key_suffixes(name_key):
+    """Sufixos da chave do nome a partir de cada palavra: "ana da silva" -> "ana da silva", "da silva", "silva"."""
+    words = name_key.split()
+    return list(dict.fromkeys(' '.join(words[i:]) for i in range(len(words))))
+
+NAME_FIELDS = {'first_name', 'last_name'}
+
 class UserManager(BaseUserManager):
     
     def create_user(self, email, username, password=None, **extra_fields):
@@ -34,10 +49,18 @@ class User(AbstractUser):
     first_name = models.CharField(_('nome'), max_length=30)
     last_name = models.CharField(_('sobrenome'), max_length=30)
     profile_picture = models.ImageField(_('foto de perfil'), upload_to='profile_pics/', blank=True, null=True)
+    # Variantes geradas por backend.images ({'thumb': {'webp': ..., 'jpeg': ...}}); nulo até o processamento
+    profile_picture_variants = models.JSONField(null=True, blank=True, editable=False)
     bio = models.TextField(_('biografia'), max_length=500, blank=True)
     date_joined = models.DateTimeField(_('data de registro'), auto_now_add=True)
     is_active = models.BooleanField(_('ativo'), default=True)
     is_staff = models.BooleanField(_('equipe'), default=False)
+    # Contadores desnormalizados, mantidos por FollowToggleView
+    followers_count = models.PositiveIntegerField(_('seguidores'), default=0)
+    following_count = models.PositiveIntegerField(_('seguindo'), default=0)
+    # Chaves normalizadas para o typeahead (busca por prefixo indexada)
+    username_key = models.CharField(max_length=150, db_index=True, editable=False, default='')
+    name_key = models.CharField(max_length=150, db_index=True, editable=False, default='')
 
     objects = UserManager()
 
@@ -51,6 +74,28 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def refresh_search_keys(self):
+        self.username_key = normalize_search_key(self.username)
+        self.name_key = normalize_search_key(f'{self.first_name} {self.last_name}')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Chave gravada: o save() só refaz as linhas de UserNameKey se o nome mudou
+        user._stored_name_key = user.__dict__.get('name_key')
+        return user
+
+    def save(self, *args, **kwargs):
+        self.refresh_search_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'username', *NAME_FIELDS} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'username_key', 'name_key'}
+        names_saved = update_fields is None or bool(NAME_FIELDS & set(update_fields))
+        super().save(*args, **kwargs)
+        if names_saved and self.name_key != getattr(self, '_stored_name_key', None):
+            sync_name_keys([self])
+            self._stored_name_key = self.name_key
+
 class Follow(models.Model):
     follower = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -70,4 +115,32 @@ class Follow(models.Model):
         ]
 
     def __str__(self):
-        return f'{self.follower_id} -> {self.following_id}'
\ No newline at end of file
+        return f'{self.follower_id} -> {self.following_id}'
+
+class UserNameKey(models.Model):
+    """
+    Chave de prefixo do typeahead: o nome normalizado a partir de cada palavra
+    (``name_key_suffixes``), para "silva" encontrar "Ana Silva". Mantida por
+    ``User.save()``; quem grava usuários com ``bulk_create`` ou ``.update()``
+    chama ``sync_name_keys()`` (ou ``manage.py rebuild_search_keys``).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='name_keys')
+    key = models.CharField(max_length=150, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_user_name_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.key}'
+
+
+def sync_name_keys(users):
+    """Regrava as linhas de ``UserNameKey`` de ``users`` a partir do ``name_key`` de cada um."""
+    users = list(users)
+    UserNameKey.objects.filter(user_id__in=[user.pk for user in users]).delete()
+    UserNameKey.objects.bulk_create(
+        [UserNameKey(user_id=user.pk, key=key) for user in users for key in name_key_suffixes(user.name_key)],
+        batch_size=1000,
+    )
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from backend.images import ImageVariantsField
+from backend.serializers import UpdateFieldsMixin
 from .models import User, Follow
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
@@ -53,13 +55,26 @@ class UserLoginSerializer(serializers.Serializer):
         else:
             raise serializers.ValidationError('Email/username e senha são obrigatórios.')
 
-class UserProfileSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+def resolve_followed_ids(user, users):
+    """Ids de ``users`` seguidos por ``user``, resolvidos com uma única consulta IN."""
+    if not (user and user.is_authenticated):
+        return set()
+    ids = [u.id for u in users]
+    return set(
+        Follow.objects.filter(follower=user, following_id__in=ids)
+        .values_list('following_id', flat=True)
+    )
+
+def _picture_variants():
+    return ImageVariantsField(User._meta.get_field('profile_picture').storage)
+
+
+class UserProfileSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
+    profile_picture_variants = _picture_variants()
 
     class Meta:
         model = User
-        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'profile_picture', 'bio', 'date_joined', 'followers_count', 'following_count')
+        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'profile_picture', 'profile_picture_variants', 'bio', 'date_joined', 'followers_count', 'following_count')
         read_only_fields = ('id', 'email', 'date_joined', 'followers_count', 'following_count')
 
     def validate_username(self, value):
@@ -68,38 +83,39 @@ class UserProfileSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Este nome de usuário já esta em uso.')
         return value
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-
-    def get_following_count(self, obj):
-        return obj.following.count()
-
 class UserSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
     followed_by_me = serializers.SerializerMethodField()
+    profile_picture_variants = _picture_variants()
 
     class Meta:
         model = User
         fields = (
             'id', 'email', 'username', 'first_name', 'last_name',
-            'profile_picture', 'bio', 'date_joined',
+            'profile_picture', 'profile_picture_variants', 'bio', 'date_joined',
             'followers_count', 'following_count', 'followed_by_me'
         )
-
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-
-    def get_following_count(self, obj):
-        return obj.following.count()
+        read_only_fields = ('followers_count', 'following_count')
 
     def get_followed_by_me(self, obj):
+        # Listas recebem 'followed_ids' no contexto (ver FollowStateMixin)
+        followed_ids = self.context.get('followed_ids')
+        if followed_ids is not None:
+            return obj.id in followed_ids
         request = self.context.get('request')
         user = getattr(request, 'user', None) if request else None
         if user and user.is_authenticated:
             return Follow.objects.filter(follower=user, following=obj).exists()
         return False
 
+class UserTypeaheadSerializer(serializers.ModelSerializer):
+    """Payload compacto para o typeahead."""
+    profile_picture_variants = _picture_variants()
+
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'first_name', 'last_name', 'profile_picture', 'profile_picture_variants')
+        read_only_fields = fields
+
 class ChangePasswordSerializer(serializers.Serializer):
     current_password = serializers.CharField(write_only=True)
     new_password = serializers.CharField(write_only=True, validators=[validate_password])
@@ -116,5 +132,5 @@ class ChangePasswordSerializer(serializers.Serializer):
     def save(self, **kwargs):
         user = self.context['request'].user
         user.set_password(self.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         return user
@@ -0,0 +1,38 @@
+"""
+Invalidação do usuário em cache da autenticação JWT (``accounts/authentication.py``)
+e contadores de follows de quem perde um seguidor ou seguido quando um usuário é apagado.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .counters import recount_follows
+from .models import Follow
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_saved_user(sender, instance, **kwargs):
+    # Todo save() passa aqui: perfil, senha, desativação pelo admin. Apaga já e de novo no
+    # commit, para que uma leitura concorrente não guarde no cache a linha de antes
+    invalidate_cached_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_cached_user(instance.pk))
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def collect_follow_counterparts(sender, instance, **kwargs):
+    # O CASCADE apaga os follows sem passar por FollowToggleView: guarda os usuários afetados
+    following = Follow.objects.filter(follower=instance).values_list('following_id', flat=True)
+    followers = Follow.objects.filter(following=instance).values_list('follower_id', flat=True)
+    instance._follow_counterparts = set(following) | set(followers)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def recount_follow_counterparts(sender, instance, **kwargs):
+    user_ids = getattr(instance, '_follow_counterparts', None)
+    if user_ids:
+        recount_follows(user_ids)
+        invalidate_cached_user(*user_ids)
+        transaction.on_commit(lambda: invalidate_cached_user(*user_ids))
@@ -1,3 +1,308 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from posts.tests import make_photo
+from .authentication import CachedJWTAuthentication, user_cache_key
+from .models import Follow, User
+
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def make_user(i):
+    return User.objects.create_user(
+        email=f'user{i}@example.com', username=f'user{i}',
+        password='SenhaSegura123', first_name='Nome', last_name=f'Sobrenome{i}',
+    )
+
+
+def follow(follower, following):
+    Follow.objects.create(follower=follower, following=following)
+    User.objects.filter(pk=follower.pk).update(following_count=F('following_count') + 1)
+    User.objects.filter(pk=following.pk).update(followers_count=F('followers_count') + 1)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class FollowCountersTests(APITestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.client.force_authenticate(self.alice)
+
+    def test_follow_and_unfollow_update_counters(self):
+        response = self.client.post(f'/api/auth/follow/{self.bob.id}/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.post(f'/api/auth/follow/{self.bob.id}/')
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.following_count, self.bob.followers_count), (1, 1))
+
+        response = self.client.delete(f'/api/auth/follow/{self.bob.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.delete(f'/api/auth/follow/{self.bob.id}/')
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.following_count, self.bob.followers_count), (0, 0))
+
+    def test_deleting_a_user_recounts_the_other_side(self):
+        carol = make_user('carol')
+        follow(self.alice, self.bob)
+        follow(self.bob, carol)
+        follow(carol, self.bob)
+
+        # Apaga quem segue (alice) e quem é seguido por carol (bob)
+        self.alice.delete()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.bob.followers_count, self.bob.following_count), (1, 1))
+        self.bob.delete()
+        carol.refresh_from_db()
+        self.assertEqual((carol.followers_count, carol.following_count), (0, 0))
+        self.assertFalse(Follow.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class UserListQueryCountTests(APITestCase):
+    """As listas de usuários devem custar o mesmo número de consultas para qualquer tamanho."""
+
+    def setUp(self):
+        self.viewer = make_user('viewer')
+        self.target = make_user('target')
+        self.client.force_authenticate(self.viewer)
+
+    def add_users(self, count, start):
+        for i in range(start, start + count):
+            user = make_user(i)
+            follow(user, self.target)
+            follow(self.target, user)
+            if i % 2:
+                follow(self.viewer, user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response.json()
+
+    def assert_constant(self, url):
+        self.add_users(3, start=0)
+        small, _ = self.count_queries(url)
+        self.add_users(30, start=3)
+        large, data = self.count_queries(url)
+        self.assertEqual(small, large)
+        return data
+
+    def test_users_list(self):
+        data = self.assert_constant('/api/auth/users/')
+        followed = {u['username'] for u in data if u['followed_by_me']}
+        self.assertEqual(followed, {f'user{i}' for i in range(33) if i % 2})
+
+    def test_followers_list(self):
+        data = self.assert_constant(f'/api/auth/{self.target.id}/followers/')
+        self.assertEqual(len(data), 33)
+        self.assertTrue(all(u['following_count'] == 1 for u in data))
+
+    def test_following_list(self):
+        data = self.assert_constant(f'/api/auth/{self.target.id}/following/')
+        self.assertEqual(len(data), 33)
+        for user in data:
+            i = int(user['username'].removeprefix('user'))
+            self.assertEqual(user['followers_count'], 1 + i % 2)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, IDLE_TIMEOUT_SECONDS=1800, IDLE_TOUCH_GRANULARITY_SECONDS=60)
+class IdleLogoutMiddlewareTests(APITestCase):
+    def setUp(self):
+        self.user = make_user('idle')
+        self.client.force_login(self.user)
+        self.now = time.time()
+        patcher = mock.patch('backend.middleware.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self):
+        return self.client.get('/api/auth/check-auth/', secure=True, HTTP_HOST='localhost')
+
+    def test_activity_is_rewritten_only_after_granularity(self):
+        self.assertIn('sessionid', self.get().cookies)
+        self.now += 30
+        self.assertNotIn('sessionid', self.get().cookies)
+        self.now += 31
+        self.assertIn('sessionid', self.get().cookies)
+
+    def test_idle_session_is_logged_out(self):
+        self.get()
+        self.now += 1801
+        self.assertEqual(self.get().status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('jwt')
+        self.auth = CachedJWTAuthentication()
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.auth.authenticate(request)[0]
+
+    def test_cache_hit_needs_no_queries(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(self.authenticate(token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(token), self.user)
+
+    def test_password_change_invalidates_cache_and_tokens(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.authenticate(token)
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/auth/change-password/', {
+            'current_password': 'SenhaSegura123', 'new_password': 'OutraSenha456', 'confirm_password': 'OutraSenha456',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_profile_update_invalidates_cache(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.authenticate(token)
+        self.client.force_authenticate(self.user)
+        self.client.patch('/api/auth/profile/', {'bio': 'nova bio'}, format='json')
+        self.assertEqual(self.authenticate(token).bio, 'nova bio')
+
+    def test_any_save_invalidates_cache(self):
+        # Ex.: desativação pelo admin, que não passa pelas views da API
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.authenticate(token)
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_saves_from_a_stale_user_keep_counters(self):
+        # request.user em cache com contadores antigos: as gravações só tocam os próprios campos
+        User.objects.filter(pk=self.user.pk).update(followers_count=5)
+        self.client.force_authenticate(self.user)
+        self.client.patch('/api/auth/profile/', {'bio': 'nova bio'}, format='json')
+        self.client.post('/api/auth/change-password/', {
+            'current_password': 'SenhaSegura123', 'new_password': 'OutraSenha456', 'confirm_password': 'OutraSenha456',
+        })
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.bio, self.user.followers_count), ('nova bio', 5))
+        self.assertTrue(self.user.check_password('OutraSenha456'))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, IMAGE_WORKERS=0)
+class ProfilePictureVariantsTests(APITestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = make_user(1)
+        self.client.force_authenticate(self.user)
+
+    def test_upload_generates_avatar_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/auth/profile/', {'profile_picture': make_photo('eu.jpg')},
+                                         format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(set(self.user.profile_picture_variants), {'thumb', 'medium', 'full'})
+
+        data = self.client.get('/api/auth/profile/').json()
+        self.assertTrue(data['profile_picture_variants']['thumb']['webp'].endswith('/thumb.webp'))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ProfileConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = make_user('alice')
+        self.client.force_authenticate(self.user)
+
+    def test_profile_and_check_auth_revalidate(self):
+        for url in ['/api/auth/profile/', '/api/auth/check-auth/']:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with mock.patch('accounts.views.UserProfileSerializer.to_representation') as serialize:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                serialize.assert_not_called()
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_profile_change_and_other_user_get_full_response(self):
+        etag = self.client.get('/api/auth/profile/')['ETag']
+        self.client.patch('/api/auth/profile/', {'bio': 'nova bio'}, format='json')
+        self.user.refresh_from_db()
+        response = self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['bio'], 'nova bio')
+
+        self.client.force_authenticate(make_user('bob'))
+        response = self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class TypeaheadTests(APITestCase):
+    def setUp(self):
+        def user(username, first_name, last_name, **extra):
+            return User.objects.create_user(
+                email=f'{username}@example.com', username=username, password='SenhaSegura123',
+                first_name=first_name, last_name=last_name, **extra,
+            )
+        self.exact = user('silva', 'Pedro', 'Souza')
+        self.prefix = user('silvana', 'Maria', 'Costa')
+        self.ana = user('ana1', 'Ana', 'Silva')
+        self.jose = user('zeca', 'José', 'da Silva')
+        user('silvio', 'Silvio', 'Santos', is_active=False)
+
+    def usernames(self, q, **params):
+        response = self.client.get('/api/auth/users/typeahead/', {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user['username'] for user in response.json()]
+
+    def test_ranking(self):
+        # Exato, prefixo do username e, por fim, qualquer palavra do nome
+        self.assertEqual(self.usernames('silva'), ['silva', 'silvana', 'ana1', 'zeca'])
+        self.assertEqual(self.usernames('SÍLVA', limit=2), ['silva', 'silvana'])
+
+    def test_name_prefixes_start_at_any_word(self):
+        self.assertEqual(self.usernames('ana sil'), ['ana1'])
+        self.assertEqual(self.usernames('da silva'), ['zeca'])
+        self.assertEqual(self.usernames('jose'), ['zeca'])
+        self.assertEqual(self.usernames('ilva'), [])
+        self.assertEqual(self.usernames('  '), [])
+
+    def test_viewer_is_excluded(self):
+        self.client.force_authenticate(self.ana)
+        self.assertNotIn('ana1', self.usernames('silva'))
+
+    def test_keys_follow_name_changes(self):
+        self.client.force_authenticate(self.ana)
+        self.client.patch('/api/auth/profile/', {'last_name': 'Oliveira'}, format='json')
+        self.client.force_authenticate(None)
+        self.assertEqual(self.usernames('oliv'), ['ana1'])
+        self.assertNotIn('ana1', self.usernames('silva'))
+
+    def test_rebuild_command_fixes_bulk_updates(self):
+        User.objects.filter(pk=self.prefix.pk).update(last_name='Barbosa')
+        self.assertEqual(self.usernames('barb'), [])
+        call_command('rebuild_search_keys', stdout=io.StringIO())
+        self.assertEqual(self.usernames('barb'), ['silvana'])
@@ -0,0 +1,59 @@
+"""
+Typeahead de usuários ("encontrar pessoas").
+
+As buscas usam chaves normalizadas: ``username_key`` e, para o nome, as
+linhas de ``UserNameKey`` com o nome a partir de cada palavra ("ana silva",
+"silva"), então "silva" e "ana sil" encontram "Ana Silva". No SQLite o
+prefixo vira uma faixa ``[q, q')`` sobre o índice B-tree (ordem binária); no
+PostgreSQL usa ``LIKE 'q%'`` acelerado pelo índice trigram GIN, que também
+atende correspondências no meio do texto. Cada consulta lê no máximo
+``limit`` linhas, então a latência não cresce com a tabela.
+
+As chaves são mantidas por ``User.save()``. ``bulk_create`` e ``.update()``
+não passam por ele: chame ``refresh_search_keys()`` antes e
+``sync_name_keys()`` depois (como ``backend/dataset.py``), ou rode
+``manage.py rebuild_search_keys``.
+"""
+from django.db import connection
+
+from .models import User, normalize_search_key
+
+EXACT, USERNAME_PREFIX, NAME_PREFIX, INFIX = range(4)
+
+
+def _prefix_filter(field, query):
+    if connection.vendor == 'postgresql':
+        return {f'{field}__startswith': query}
+    upper = query[:-1] + chr(ord(query[-1]) + 1)
+    return {f'{field}__gte': query, f'{field}__lt': upper}
+
+
+def typeahead(query, limit, exclude_id=None):
+    """Até ``limit`` usuários, com correspondência exata e por prefixo primeiro."""
+    query = normalize_search_key(query)
+    if not query:
+        return []
+
+    base = User.objects.filter(is_active=True)
+    if exclude_id is not None:
+        base = base.exclude(id=exclude_id)
+
+    candidates = {}
+
+    def collect(qs, order, rank):
+        for user in qs.order_by(order)[:limit]:
+            user_rank = EXACT if user.username_key == query else rank
+            best = candidates.get(user.id)
+            if best is None or user_rank < best[0]:
+                candidates[user.id] = (user_rank, user)
+
+    collect(base.filter(**_prefix_filter('username_key', query)), 'username_key', USERNAME_PREFIX)
+    collect(base.filter(**_prefix_filter('name_keys__key', query)), 'name_keys__key', NAME_PREFIX)
+    if connection.vendor == 'postgresql' and len(candidates) < limit:
+        collect(base.filter(username_key__contains=query), '-followers_count', INFIX)
+
+    ranked = sorted(
+        candidates.values(),
+        key=lambda item: (item[0], len(item[1].username_key), item[1].username_key),
+    )
+    return [user for _, user in ranked[:limit]]
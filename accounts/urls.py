@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path
-from .views import RegisterView, LoginView, LogoutView, CheckAuthView, UserProfileView, FollowToggleView, FollowersListView, FollowingListView, UsersListView, CsrfTokenView, UserDetailView, ChangePasswordView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .views import RegisterView, LoginView, LogoutView, CheckAuthView, UserProfileView, FollowToggleView, FollowersListView, FollowingListView, UsersListView, CsrfTokenView, UserDetailView, ChangePasswordView, UserTypeaheadView
 
 app_name = 'accounts'
 
@@ -29,8 +31,18 @@ urlpatterns = [
     # Rota para listar os usuários que um usuário está seguindo
     path('<int:user_id>/following/', FollowingListView.as_view(), name='following-list'),
     path('users/', UsersListView.as_view(), name='users-list'),
+
+    # Rota para sugestões de usuários (typeahead)
+    path('users/typeahead/', UserTypeaheadView.as_view(), name='users-typeahead'),
     path('users/<int:user_id>/', UserDetailView.as_view(), name='users-detail'),
 
     # Rota para alterar a senha do usuário
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
-]
\ No newline at end of file
+]
+
+if settings.JWT_AUTH_ENABLED:
+    # Tokens JWT (access/refresh), alternativa sem sessão ao login
+    urlpatterns += [
+        path('token/', TokenObtainPairView.as_view(), name='token-obtain'),
+        path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    ]
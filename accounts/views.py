@@ -11,9 +11,38 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.middleware.csrf import get_token
 from rest_framework import generics
-from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer, UserSerializer, ChangePasswordSerializer
+from django.db import transaction
+from django.db.models import F
+from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer, UserSerializer, ChangePasswordSerializer, UserTypeaheadSerializer, resolve_followed_ids
+from .typeahead import typeahead
+from .authentication import invalidate_cached_user
 from .models import User, Follow
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
+from posts import timeline
+from posts.cache import bump_posts_version
+from backend import images
+from backend.conditional import ConditionalGetMixin
+
+def profile_validators(user):
+    """Valores de que o ``UserProfileSerializer`` depende, para o ETag sem serializar."""
+    return tuple(getattr(user, name) for name in UserProfileSerializer.Meta.fields)
+
+
+def _profile_picture_ready(user_id):
+    invalidate_cached_user(user_id)
+    bump_posts_version()
+
+
+def save_profile(serializer):
+    """Salva o perfil; uma foto nova tem as variantes geradas fora da requisição."""
+    new_picture = 'profile_picture' in serializer.validated_data
+    user = serializer.save(**({'profile_picture_variants': None} if new_picture else {}))
+    if new_picture:
+        images.schedule(user, 'profile_picture', 'profile_picture_variants', images.AVATAR_SIZES,
+                        on_done=_profile_picture_ready)
+    bump_posts_version()
+    return user
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class RegisterView(APIView):
@@ -83,7 +112,7 @@ class CsrfTokenView(APIView):
         token = get_token(request)
         return Response({'csrfToken': token}, status=status.HTTP_200_OK)
 
-class UserDetailView(generics.RetrieveAPIView):
+class UserDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     queryset = User.objects.all()
@@ -91,7 +120,7 @@ class UserDetailView(generics.RetrieveAPIView):
     lookup_url_kwarg = 'user_id'
 
 @method_decorator(ensure_csrf_cookie, name='get')
-class UserProfileView(APIView):
+class UserProfileView(ConditionalGetMixin, APIView):
     """View para visualizar e editar o perfil do usuário."""
     permission_classes = [IsAuthenticated]
     # Aceita JSON, form-urlencoded e multipart (upload)
@@ -99,6 +128,7 @@ class UserProfileView(APIView):
 
     def get(self, request):
         """Retorna os dados do perfil do usuário logado."""
+        self.validate(profile_validators(request.user))
         serializer = UserProfileSerializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -112,7 +142,7 @@ class UserProfileView(APIView):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            save_profile(serializer)
             return Response({
                 'message': 'Perfil atualizado com sucesso!',
                 'user': serializer.data
@@ -128,7 +158,7 @@ class UserProfileView(APIView):
             context={'request': request}
         )
         if serializer.is_valid():
-            serializer.save()
+            save_profile(serializer)
             return Response({
                 'message': 'Perfil atualizado com sucesso!',
                 'user': serializer.data
@@ -138,12 +168,13 @@ class UserProfileView(APIView):
 # View adicional para verificar se o usuário está logado
 # Garante emitir cookie CSRF em GET de check-auth
 @method_decorator(ensure_csrf_cookie, name='get')
-class CheckAuthView(APIView):
+class CheckAuthView(ConditionalGetMixin, APIView):
     """View para verificar se o usuário está autenticado."""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         """Retorna informações do usuário se estiver logado."""
+        self.validate(profile_validators(request.user))
         serializer = UserProfileSerializer(request.user)
         return Response({
             'authenticated': True,
@@ -157,19 +188,42 @@ class FollowToggleView(APIView):
         target = get_object_or_404(User, id=user_id)
         if target == request.user:
             return Response({'detail': 'Você não pode seguir a si mesmo.'}, status=status.HTTP_400_BAD_REQUEST)
-        obj, created = Follow.objects.get_or_create(follower=request.user, following=target)
+        with transaction.atomic():
+            obj, created = Follow.objects.get_or_create(follower=request.user, following=target)
+            if created:
+                User.objects.filter(pk=target.pk).update(followers_count=F('followers_count') + 1)
+                User.objects.filter(pk=request.user.pk).update(following_count=F('following_count') + 1)
         if created:
+            # Os contadores de ambos aparecem em request.user (perfil, check-auth)
+            invalidate_cached_user(request.user.pk, target.pk)
+            timeline.backfill(request.user.id, target.id)
             return Response({'detail': 'Agora você está seguindo este usuário.'}, status=status.HTTP_201_CREATED)
         return Response({'detail': 'Você já segue este usuário.'}, status=status.HTTP_200_OK)
 
     def delete(self, request, user_id):
         target = get_object_or_404(User, id=user_id)
-        deleted, _ = Follow.objects.filter(follower=request.user, following=target).delete()
+        with transaction.atomic():
+            deleted, _ = Follow.objects.filter(follower=request.user, following=target).delete()
+            if deleted:
+                User.objects.filter(pk=target.pk).update(followers_count=F('followers_count') - deleted)
+                User.objects.filter(pk=request.user.pk).update(following_count=F('following_count') - deleted)
         if deleted:
+            invalidate_cached_user(request.user.pk, target.pk)
+            timeline.prune(request.user.id, target.id)
             return Response({'detail': 'Você deixou de seguir este usuário.'}, status=status.HTTP_200_OK)
         return Response({'detail': 'Você não seguia este usuário.'}, status=status.HTTP_404_NOT_FOUND)
 
-class FollowersListView(generics.ListAPIView):
+class FollowStateMixin:
+    """Resolve ``followed_by_me`` da página inteira com uma única consulta IN."""
+
+    def get_serializer(self, *args, **kwargs):
+        if args and kwargs.get('many'):
+            context = self.get_serializer_context()
+            context['followed_ids'] = resolve_followed_ids(self.request.user, args[0])
+            kwargs['context'] = context
+        return super().get_serializer(*args, **kwargs)
+
+class FollowersListView(FollowStateMixin, generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
@@ -177,7 +231,7 @@ class FollowersListView(generics.ListAPIView):
         user_id = self.kwargs['user_id']
         return User.objects.filter(following__following_id=user_id).order_by('-date_joined')
 
-class FollowingListView(generics.ListAPIView):
+class FollowingListView(FollowStateMixin, generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
@@ -185,7 +239,7 @@ class FollowingListView(generics.ListAPIView):
         user_id = self.kwargs['user_id']
         return User.objects.filter(followers__follower_id=user_id).order_by('-date_joined')
 
-class UsersListView(generics.ListAPIView):
+class UsersListView(ConditionalGetMixin, FollowStateMixin, generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -199,6 +253,27 @@ class UsersListView(generics.ListAPIView):
             qs = qs.exclude(id=user.id)
         return qs
 
+class UserTypeaheadView(APIView):
+    """Sugestões de usuários enquanto se digita (?q=termo&limit=K)."""
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    default_limit = 8
+    max_limit = 20
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+        user = request.user
+        users = typeahead(
+            request.query_params.get('q', ''),
+            limit,
+            exclude_id=user.id if user.is_authenticated else None,
+        )
+        serializer = UserTypeaheadSerializer(users, many=True, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 class ChangePasswordView(APIView):
     serializer_class = ChangePasswordSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -0,0 +1,120 @@
+"""
+Apoio às views assíncronas de leitura (``ASYNC_READ_VIEWS``, servidas via ASGI).
+
+O DRF não tem views assíncronas, então as variantes async são views Django
+que reaproveitam as peças síncronas (autenticadores do DRF, paginação,
+montagem do JSON do caminho rápido) e mudam só a forma de falar com o banco:
+consultas independentes rodam ao mesmo tempo com ``parallel()``. Qualquer
+caso fora do caminho feliz (outro método HTTP, API navegável, parâmetros não
+suportados, erro de autenticação ou de cursor) é repassado à view síncrona
+original, que continua sendo a referência de comportamento.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import conditional, querystats
+from .renderers import FastJSONRenderer
+
+
+class Fallback(Exception):
+    """Levantada por uma view async para delegar a requisição à view síncrona."""
+
+
+def _isolated(fn):
+    # Cada thread do executor tem a própria conexão (ConnectionHandler é
+    # thread-critical); close_old_connections aplica CONN_MAX_AGE a ela.
+    @functools.wraps(fn)
+    def run():
+        close_old_connections()
+        querystats.install_all()
+        return fn()
+    return run
+
+
+async def parallel(*calls):
+    """
+    Executa funções síncronas sem argumentos (consultas do ORM) ao mesmo tempo,
+    cada uma numa thread com conexão própria, e devolve os resultados em ordem.
+    Com ``ASYNC_PARALLEL_QUERIES`` desligado (ex.: testes, que rodam dentro
+    de uma transação só visível à conexão principal) elas rodam em sequência
+    na thread do request, como o ORM async do Django.
+    """
+    if not settings.ASYNC_PARALLEL_QUERIES:
+        return [await sync_to_async(call)() for call in calls]
+    return await asyncio.gather(*(sync_to_async(_isolated(call), thread_sensitive=False)() for call in calls))
+
+
+def drf_request(request, authenticate=False):
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES] if authenticate else ()
+    return Request(request, authenticators=authenticators)
+
+
+def resolve_user(request):
+    """O usuário segundo os autenticadores do DRF; credenciais inválidas delegam à view síncrona."""
+    try:
+        return drf_request(request, authenticate=True).user
+    except APIException:
+        raise Fallback()
+
+
+authenticate = sync_to_async(resolve_user)
+
+
+def json_response(data, status=200):
+    response = HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+    response['Vary'] = 'Accept'
+    return response
+
+
+def conditional_json(request, user, parts, build, last_modified=None):
+    """
+    ``json_response(build())`` com ETag (o mesmo de ``ConditionalGetMixin.validate``
+    para as mesmas ``parts``): 304 sem chamar ``build()`` quando o cliente já tem a versão.
+    """
+    tag = conditional.etag(user.pk, 'json', *parts)
+    if conditional.matches(request, tag):
+        response = HttpResponse(status=304)
+        response['Vary'] = 'Accept'
+    else:
+        response = json_response(build())
+    return conditional.stamp(response, tag, last_modified, private=user.is_authenticated)
+
+
+def async_variant(sync_view):
+    """
+    Transforma ``fn(request, ...)`` numa view async que cai em ``sync_view``
+    para métodos diferentes de GET, para a API navegável (Accept HTML) e
+    quando ``fn`` levanta ``Fallback`` ou ``APIException``. A view herda os
+    atributos ``cls``/``actions`` de ``sync_view`` para manter os rótulos de
+    métricas e orçamentos de SQL (``PostViewSet.feed``).
+    """
+    fallback = sync_to_async(sync_view)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def view(request, *args, **kwargs):
+            if request.method == 'GET' and 'text/html' not in request.headers.get('Accept', ''):
+                try:
+                    return await fn(request, *args, **kwargs)
+                except (Fallback, APIException):
+                    # O orçamento de SQL vale para a view que responde; a tentativa
+                    # descartada continua no total da requisição
+                    recorder = getattr(request, '_sql_recorder', None)
+                    if recorder is not None:
+                        request._sql_view_start = recorder.mark()
+            return await fallback(request, *args, **kwargs)
+
+        for attr in ('cls', 'view_class', 'actions', 'initkwargs'):
+            if hasattr(sync_view, attr):
+                setattr(view, attr, getattr(sync_view, attr))
+        return csrf_exempt(view)
+    return decorator
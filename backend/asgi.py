@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Required for the live counters stream (``/api/posts/live/``, ``posts/live.py``):
+gunicorn.conf.py serves it with ``SERVER_MODE=asgi``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
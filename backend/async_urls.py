@@ -0,0 +1,19 @@
+"""
+URLs com as variantes assíncronas de leitura na frente das rotas normais.
+
+Usado como ``ROOT_URLCONF`` quando ``ASYNC_READ_VIEWS`` está ligado (servidor
+ASGI); as demais rotas são as de ``backend/urls.py``.
+"""
+from django.urls import path, re_path
+
+from accounts import async_views as accounts_async
+from posts import async_views as posts_async
+from . import urls
+
+urlpatterns = [
+    path('api/posts/posts/feed/', posts_async.feed),
+    re_path(r'^api/posts/posts/(?P<pk>[^/.]+)/$', posts_async.detail),
+    re_path(r'^api/posts/posts/(?P<pk>[^/.]+)/comments/$', posts_async.comments),
+    path('api/auth/users/', accounts_async.users_list),
+    *urls.urlpatterns,
+]
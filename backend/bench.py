@@ -0,0 +1,66 @@
+"""Utilitários compartilhados pelos comandos de benchmark (``bench_*``)."""
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def scratch_database(keepdb=False, on_disk=False):
+    """
+    Cria um banco descartável, como o test runner, para que os benchmarks
+    não toquem nos dados reais. ``on_disk`` força um arquivo no SQLite (o
+    padrão do teste é em memória, que serializa threads por tabela).
+    """
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    tmpdir = None
+    if on_disk and connection.vendor == 'sqlite' and not old_test_name:
+        tmpdir = tempfile.mkdtemp(prefix='bench-')
+        test_settings['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        if tmpdir:
+            test_settings['NAME'] = old_test_name
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    return {
+        'runs': len(samples_ms),
+        'mean_ms': round(statistics.fmean(samples_ms), 3),
+        'p50_ms': round(percentile(samples_ms, 0.50), 3),
+        'p95_ms': round(percentile(samples_ms, 0.95), 3),
+    }
+
+
+def measure(fn, repeat, warmup=1):
+    """Executa ``fn`` ``repeat`` vezes e resume a latência e as consultas SQL da última execução."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    result = summarize(samples)
+    result['queries'] = len(ctx.captured_queries)
+    return result
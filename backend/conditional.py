@@ -0,0 +1,93 @@
+"""
+GET condicional: ETag fraco, ``Last-Modified`` e ``304 Not Modified``.
+
+O ETag é o hash do que a representação usa, calculado antes de montar o
+corpo: as linhas já buscadas (ids, contadores, ``updated_at``, dados do
+autor), o estado do leitor e os links de paginação, mais o usuário e o
+formato negociado. Quando o ``If-None-Match`` casa, a view responde 304 sem
+renderizar nada. Views que não informam nada antes (``validate()``) ainda
+ganham um ETag do ``response.data``, antes da renderização.
+
+Só o ``If-None-Match`` decide o 304. O ``Last-Modified`` (maior ``updated_at``
+dos posts) é informativo: contadores e dados do autor mudam sem tocar
+``updated_at``, então ``If-Modified-Since`` sozinho poderia esconder mudanças.
+As respostas levam ``Cache-Control: no-cache`` (revalidar sempre) e
+``private`` quando dependem do usuário.
+"""
+import hashlib
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class NotModified(Exception):
+    """Levantada por ``validate()`` quando o cliente já tem a representação atual."""
+
+
+def etag(*parts):
+    """ETag fraco de ``parts`` (valores com ``repr`` estável: linhas, tuplas, ids ordenados)."""
+    return f'W/"{hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()}"'
+
+
+def matches(request, tag):
+    """Se o ``If-None-Match`` de ``request`` casa com ``tag`` (comparação fraca)."""
+    header = request.headers.get('If-None-Match')
+    if not header or request.method not in SAFE_METHODS:
+        return False
+    candidates = parse_etags(header)
+    if '*' in candidates:
+        return True
+    opaque = tag.removeprefix('W/')
+    return any(candidate.removeprefix('W/') == opaque for candidate in candidates)
+
+
+def stamp(response, tag, last_modified=None, private=False):
+    response['ETag'] = tag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True, **({'private': True} if private else {}))
+    return response
+
+
+def latest(rows, field='updated_at'):
+    """Maior ``field`` entre as linhas (para o ``Last-Modified``), ou None."""
+    return max((row[field] for row in rows if row.get(field) is not None), default=None)
+
+
+class ConditionalGetMixin:
+    """
+    Para views do DRF. ``self.validate(*parts, last_modified=...)`` fixa o ETag
+    e interrompe a view com 304 se o cliente já tem essa versão; sem isso, o
+    ETag sai do ``response.data`` das respostas 200 de GET/HEAD.
+    """
+    validators = None
+
+    def conditional_etag(self, *parts):
+        request = self.request
+        renderer = getattr(request, 'accepted_renderer', None)
+        return etag(request.user.pk, renderer.format if renderer else None, *parts)
+
+    def validate(self, *parts, last_modified=None):
+        self.validators = (self.conditional_etag(*parts), last_modified)
+        if matches(self.request, self.validators[0]):
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (self.validators is None and request.method in SAFE_METHODS
+                and response.status_code == status.HTTP_200_OK and getattr(response, 'data', None) is not None):
+            self.validators = (self.conditional_etag(response.data), None)
+            if matches(request, self.validators[0]):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.validators is not None and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            stamp(response, *self.validators, private=request.user.is_authenticated)
+        return response
@@ -0,0 +1,159 @@
+"""
+Gerador de dados sintéticos para desenvolvimento e benchmarks.
+
+Tudo é inserido com ``bulk_create`` em lotes e os campos derivados são
+recalculados no fim: contadores de seguidores e de engajamento, chaves de
+busca dos usuários (os triggers cuidam do índice de posts) e timelines
+materializadas. O grafo de follows segue uma lei de potência: cada usuário
+segue poucos perfis (distribuição exponencial), escolhidos com peso
+``1 / posição ** alpha`` numa ordem de popularidade sorteada, então poucos
+perfis concentram a maior parte dos seguidores, como numa rede real.
+
+As datas se espalham pelos últimos ``days`` dias: cada post nasce num instante
+sorteado da janela, e curtidas, retweets e comentários caem entre o post e
+agora. Com todas as linhas no mesmo segundo, a paginação por keyset, as
+timelines e as tendências seriam medidas num caso que não existe em produção.
+"""
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.counters import recount_follows
+from accounts.models import Follow, User, sync_name_keys
+from posts.counters import recount
+from posts.models import Comment, Like, Post, Retweet
+
+PASSWORD = 'SenhaSegura123'
+BATCH_SIZE = 1000
+# Linhas acumuladas antes de cada bulk_create (limita a memória)
+CHUNK = 20000
+
+WORDS = (
+    'olá mundo café praia futebol música cinema viagem trabalho python django código '
+    'domingo chuva sol feliz cansado amigos família livro série jogo corrida academia '
+    'receita pizza churrasco cidade noite manhã projeto ideia notícia política eleição'
+).split()
+
+
+def _exponential(rng, mean, cap):
+    return min(cap, int(rng.expovariate(1 / mean))) if mean > 0 else 0
+
+
+def _heavy_tail(rng, mean, cap):
+    # Pareto(1.5) tem média 3: poucos posts recebem a maior parte do engajamento
+    return min(cap, int(mean * rng.paretovariate(1.5) / 3)) if mean > 0 else 0
+
+
+def _sentence(rng, words=(4, 14)):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(*words)))
+
+
+def _moment(rng, start, end):
+    return start + (end - start) * rng.random()
+
+
+class _Writer:
+    """
+    Acumula instâncias de um modelo com a data de criação de cada uma e grava
+    em ``bulk_create`` a cada ``CHUNK``. O ``auto_now_add`` troca
+    ``created_at`` por agora no INSERT, então as datas sorteadas vão num
+    ``bulk_update`` logo em seguida.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.pending = []
+        self.created = []
+        self.total = 0
+
+    def add(self, obj, created_at):
+        self.pending.append(obj)
+        self.created.append(created_at)
+        if len(self.pending) >= CHUNK:
+            self.flush()
+
+    def flush(self):
+        self.model.objects.bulk_create(self.pending, batch_size=BATCH_SIZE)
+        for obj, created_at in zip(self.pending, self.created):
+            obj.created_at = created_at
+        self.model.objects.bulk_update(self.pending, ['created_at'], batch_size=BATCH_SIZE)
+        self.total += len(self.pending)
+        self.pending, self.created = [], []
+        return self.total
+
+
+def seed(users=1000, posts_per_user=10, follows_per_user=30, likes_per_post=5, retweets_per_post=1,
+         comments_per_post=2, alpha=1.1, days=30, seed=0, prefix='seed'):
+    """Cria o dataset e devolve quantas linhas de cada tipo foram inseridas."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    start = now - timedelta(days=days)
+    password = make_password(PASSWORD)
+
+    with transaction.atomic():
+        new_users = []
+        for i in range(users):
+            user = User(
+                email=f'{prefix}{i}@example.com', username=f'{prefix}{i}', password=password,
+                first_name=rng.choice(('Ana', 'Bruno', 'Carla', 'Diego', 'Júlia', 'João', 'Luíza', 'Marcos')),
+                last_name=f'Silva {i}', bio=_sentence(rng),
+            )
+            user.refresh_search_keys()
+            new_users.append(user)
+        user_ids = [user.pk for user in User.objects.bulk_create(new_users, batch_size=BATCH_SIZE)]
+        sync_name_keys(new_users)
+
+        popularity = user_ids[:]
+        rng.shuffle(popularity)
+        cum_weights, acc = [], 0.0
+        for rank in range(len(popularity)):
+            acc += 1 / (rank + 1) ** alpha
+            cum_weights.append(acc)
+
+        # Os usuários são novos e os alvos de cada um vêm sem repetição: não há conflito de unicidade
+        follows = _Writer(Follow)
+        for follower_id in user_ids:
+            count = _exponential(rng, follows_per_user, len(user_ids) - 1)
+            targets = set(rng.choices(popularity, cum_weights=cum_weights, k=count))
+            targets.discard(follower_id)
+            for following_id in targets:
+                follows.add(Follow(follower_id=follower_id, following_id=following_id), _moment(rng, start, now))
+        follows.flush()
+        recount_follows()
+
+        last_post_id = Post.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        posts = _Writer(Post)
+        for author_id in user_ids:
+            for _ in range(_exponential(rng, posts_per_user, 10 * posts_per_user)):
+                posts.add(Post(author_id=author_id, content=_sentence(rng)), _moment(rng, start, now))
+        posts.flush()
+        new_posts = list(Post.objects.filter(id__gt=last_post_id).order_by('id').values_list('id', 'created_at'))
+
+        likes = _Writer(Like)
+        retweets = _Writer(Retweet)
+        comments = _Writer(Comment)
+        for post_id, created_at in new_posts:
+            for user_id in rng.sample(user_ids, _heavy_tail(rng, likes_per_post, len(user_ids))):
+                likes.add(Like(user_id=user_id, post_id=post_id), _moment(rng, created_at, now))
+            for user_id in rng.sample(user_ids, _heavy_tail(rng, retweets_per_post, len(user_ids))):
+                retweets.add(Retweet(user_id=user_id, post_id=post_id), _moment(rng, created_at, now))
+            for _ in range(_heavy_tail(rng, comments_per_post, 10 * comments_per_post)):
+                comment = Comment(author_id=rng.choice(user_ids), post_id=post_id, content=_sentence(rng))
+                comments.add(comment, _moment(rng, created_at, now))
+        counts = {
+            'users': len(user_ids),
+            'follows': follows.total,
+            'posts': len(new_posts),
+            'likes': likes.flush(),
+            'retweets': retweets.flush(),
+            'comments': comments.flush(),
+        }
+        recount()
+
+    call_command('rebuild_timelines', stdout=io.StringIO())
+    return counts
@@ -0,0 +1,213 @@
+"""
+Pipeline de imagens enviadas (``Post.image`` e ``User.profile_picture``).
+
+Depois do commit do upload, um pool de threads (``IMAGE_WORKERS``; 0 = na
+própria thread, útil em testes) abre o original e corrige a orientação pelo
+EXIF. Em seguida grava uma cópia do original sem metadados (EXIF/GPS) e gera
+as variantes de tamanho fixo em WebP e JPEG. No JPEG os segmentos de
+metadados são cortados sem recomprimir a imagem; só uma foto girada pelo
+EXIF (ou PNG/WebP com metadados) é recodificada, e um original sem
+metadados fica como está. A cópia limpa é gravada com outro nome, o campo
+passa a apontar para ela e só então o arquivo antigo é apagado: o original
+nunca fica indisponível no meio do caminho. Os nomes das variantes ficam num
+``JSONField`` ao lado do arquivo (``{'thumb': {'webp': ..., 'jpeg': ...}}``),
+que os serializers transformam em URLs com ``variant_urls``. Enquanto as
+variantes não existem o campo é nulo e os clientes usam o original. (Nulo
+também evita que o SQLite recrie as tabelas na migração, o que derrubaria
+os triggers de busca de ``posts_post``.)
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Maior lado, em pixels, de cada variante
+POST_IMAGE_SIZES = {'thumb': 320, 'medium': 720, 'full': 1440}
+AVATAR_SIZES = {'thumb': 64, 'medium': 160, 'full': 400}
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+ORIGINAL_QUALITY = 92
+
+ORIENTATION = 0x0112
+# Chaves de ``Image.info`` com metadados além do EXIF
+METADATA_INFO_KEYS = {'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop'}
+# Segmentos JPEG removidos: APP1 (EXIF/XMP), APP13 (IPTC) e comentários
+JPEG_METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images')
+    return _executor
+
+
+def variant_name(name, label, ext):
+    stem, _ = os.path.splitext(name)
+    return f'variants/{stem}/{label}.{ext}'
+
+
+def variant_urls(variants, storage, request=None):
+    """``{'thumb': {'webp': url, 'jpeg': url}, ...}`` a partir dos nomes guardados (None se ainda não há)."""
+    if variants is None:
+        return None
+    urls = {}
+    for label, names in variants.items():
+        urls[label] = {}
+        for fmt, name in names.items():
+            url = storage.url(name)
+            urls[label][fmt] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def _encode(image, fmt):
+    kind, options = FORMATS[fmt]
+    if kind == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, kind, **options)
+    return buffer.getvalue()
+
+
+def strip_jpeg_metadata(data):
+    """
+    ``data`` (JPEG) sem os segmentos de ``JPEG_METADATA_MARKERS``. Os dados
+    comprimidos a partir do SOS são copiados byte a byte, sem perda.
+    """
+    if data[:2] != b'\xff\xd8':
+        raise ValueError('JPEG sem SOI.')
+    out, pos = bytearray(data[:2]), 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError(f'Marcador inválido na posição {pos}.')
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1  # Bytes de preenchimento entre segmentos
+            continue
+        if marker == 0xDA:
+            out += data[pos:]
+            return bytes(out)
+        length = int.from_bytes(data[pos + 2:pos + 4], 'big')
+        if marker not in JPEG_METADATA_MARKERS:
+            out += data[pos:pos + 2 + length]
+        pos += 2 + length
+    raise ValueError('JPEG sem SOS.')
+
+
+def clean_original(data, image, transposed):
+    """Bytes do original sem metadados, ou None se não há o que remover."""
+    fmt = image.format
+    exif = image.getexif()
+    if fmt not in ('JPEG', 'PNG', 'WEBP') or not (exif or METADATA_INFO_KEYS & image.info.keys()):
+        return None
+    if fmt == 'JPEG' and exif.get(ORIENTATION, 1) == 1:
+        try:
+            return strip_jpeg_metadata(data)
+        except ValueError:
+            logger.warning('JPEG fora do padrão; o original será recodificado.')
+    # Girar pela orientação exige recodificar (o PNG continua sem perdas)
+    options = {'quality': ORIGINAL_QUALITY} if fmt != 'PNG' else {}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    buffer = io.BytesIO()
+    transposed.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def render_variants(image, sizes):
+    """Bytes de cada variante: ``{(label, fmt): bytes}``."""
+    rendered = {}
+    for label, size in sizes.items():
+        copy = image.copy()
+        copy.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for fmt in FORMATS:
+            rendered[label, fmt] = _encode(copy, fmt)
+    return rendered
+
+
+def process(model, pk, field, variants_field, name, sizes, on_done=None):
+    """Grava o original sem metadados e as variantes de ``name``; o campo passa a apontar para a cópia limpa."""
+    storage = model._meta.get_field(field).storage
+    with storage.open(name, 'rb') as original:
+        data = original.read()
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    transposed = ImageOps.exif_transpose(image)
+
+    # Nome novo (o storage evita colisão com o atual); o antigo continua servido até o UPDATE
+    cleaned = clean_original(data, image, transposed)
+    stored = storage.save(name, ContentFile(cleaned)) if cleaned is not None else name
+
+    variants = {}
+    for (label, fmt), content in render_variants(transposed, sizes).items():
+        variants.setdefault(label, {})[fmt] = storage.save(variant_name(name, label, fmt), ContentFile(content))
+
+    # Só grava se o campo ainda aponta para este arquivo (outro upload pode ter chegado)
+    changes = {variants_field: variants} if stored == name else {variants_field: variants, field: stored}
+    updated = model.objects.filter(pk=pk, **{field: name}).update(**changes)
+    written = [names[fmt] for names in variants.values() for fmt in names]
+    if not updated:
+        # Upload substituído no meio: nada do que foi gravado aqui é referenciado
+        for path in written + ([stored] if stored != name else []):
+            storage.delete(path)
+        return None
+    if stored != name:
+        storage.delete(name)
+    if on_done is not None:
+        on_done(pk)
+    return variants
+
+
+def _run(*args, **kwargs):
+    try:
+        return process(*args, **kwargs)
+    except Exception:
+        logger.exception('Falha ao processar a imagem %s.', args[4] if len(args) > 4 else kwargs.get('name'))
+    finally:
+        close_old_connections()
+
+
+def schedule(instance, field, variants_field, sizes, on_done=None):
+    """
+    Agenda o processamento do arquivo atual de ``instance.<field>`` para
+    depois do commit. Chamar logo após salvar um novo upload.
+    """
+    name = getattr(instance, field).name
+    if not name:
+        return
+    args = (type(instance), instance.pk, field, variants_field, name, sizes, on_done)
+
+    def submit():
+        if settings.IMAGE_WORKERS:
+            _get_executor().submit(_run, *args)
+        else:
+            process(*args)
+
+    transaction.on_commit(submit)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Campo somente leitura com o mapa de URLs das variantes (``variant_urls``).
+    ``absolute`` segue o campo irmão: URLs absolutas como o ``ImageField`` do
+    DRF, ou relativas como ``author_profile_picture``.
+    """
+
+    def __init__(self, storage, absolute=True, **kwargs):
+        kwargs['read_only'] = True
+        self.storage = storage
+        self.absolute = absolute
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request') if self.absolute else None
+        return variant_urls(value, self.storage, request)
@@ -0,0 +1,143 @@
+"""
+Métricas de requisições em memória, expostas no formato texto do Prometheus.
+
+``MetricsMiddleware`` registra, por view (``Classe.ação``, o mesmo rótulo
+de ``SQL_QUERY_BUDGETS``): histogramas de latência, tamanho da resposta e
+tempo de SQL (quando ``SQLInstrumentationMiddleware`` está ligado),
+requisições em andamento e total por status. Cada observação é uma busca
+binária nos buckets e algumas somas sob um único lock, o que custa poucos
+microssegundos e é seguro com WSGI multi-thread. O registro é por processo:
+com vários workers, cada um expõe os próprios números (raspe cada worker ou
+some no Prometheus).
+"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+UNRESOLVED = 'unresolved'
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Contagem por faixa (não cumulativa); a última é +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def copy(self):
+        other = Histogram(self.buckets)
+        other.counts = self.counts[:]
+        other.sum = self.sum
+        return other
+
+
+class ViewMetrics:
+    __slots__ = ('duration', 'size', 'db', 'statuses')
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.db = Histogram(DB_BUCKETS)
+        self.statuses = defaultdict(int)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._in_flight = defaultdict(int)
+
+    def started(self, view):
+        with self._lock:
+            self._in_flight[view] += 1
+
+    def finished(self, view, status, duration, size=None, db_seconds=None, started=True):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.duration.observe(duration)
+            if size is not None:
+                metrics.size.observe(size)
+            if db_seconds is not None:
+                metrics.db.observe(db_seconds)
+            metrics.statuses[status] += 1
+            if started:
+                self._in_flight[view] -= 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self._in_flight.clear()
+
+    def snapshot(self):
+        with self._lock:
+            views = {
+                view: (m.duration.copy(), m.size.copy(), m.db.copy(), dict(m.statuses))
+                for view, m in self._views.items()
+            }
+            return views, dict(self._in_flight)
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (0.0.4)."""
+        views, in_flight = self.snapshot()
+        lines = []
+        histograms = (
+            (0, 'http_request_duration_seconds', 'Latência das requisições por view.'),
+            (1, 'http_response_size_bytes', 'Tamanho do corpo das respostas por view.'),
+            (2, 'http_request_db_seconds', 'Tempo de SQL por requisição, por view.'),
+        )
+        for index, name, help_text in histograms:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for view in sorted(views):
+                histogram = views[view][index]
+                total = sum(histogram.counts)
+                if not total:
+                    continue
+                label = f'view="{_escape(view)}"'
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{{label}}} {total}')
+
+        lines += ['# HELP http_requests_total Requisições concluídas por view e status.',
+                  '# TYPE http_requests_total counter']
+        for view in sorted(views):
+            for status, count in sorted(views[view][3].items()):
+                lines.append(f'http_requests_total{{view="{_escape(view)}",status="{status}"}} {count}')
+
+        lines += ['# HELP http_requests_in_flight Requisições em andamento por view.',
+                  '# TYPE http_requests_in_flight gauge']
+        for view, count in sorted(in_flight.items()):
+            lines.append(f'http_requests_in_flight{{view="{_escape(view)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+class MetricsView(APIView):
+    """``GET /metrics/``: só para staff (sessão ou Basic Auth, como o scraper do Prometheus)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,26 +1,347 @@
+import json
+import logging
+import os
 import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
-from django.contrib.auth import logout
+from django.contrib.auth import alogout, logout
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics, routers
+from .querystats import QueryRecorder, QueryTimer
+
+sql_logger = logging.getLogger('backend.sql')
+
+
+class HybridMiddleware:
+    """
+    Base dos middlewares do projeto: rodam nativamente tanto em WSGI quanto em
+    ASGI (``__acall__``), sem a troca de thread que o Django faz para adaptar
+    middlewares só síncronos nas views assíncronas.
+    """
+    sync_capable = True
+    async_capable = True
 
-class IdleLogoutMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            if hasattr(self, 'process_view'):
+                # O handler adapta process_view pelo tipo: a versão async evita a troca de thread
+                sync_process_view = self.process_view
+
+                async def process_view(*args):
+                    return sync_process_view(*args)
+                self.process_view = process_view
 
     def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class StaticFilesMiddleware(HybridMiddleware):
+    """
+    Serve ``STATIC_ROOT`` (admin, API navegável do DRF) com o WhiteNoise, para
+    a imagem Docker funcionar só com o Gunicorn, sem proxy na frente.
+
+    O ``WhiteNoiseMiddleware`` é só síncrono: no ASGI o Django passaria a pilha
+    inteira por ele numa thread, inclusive as views async e o stream de
+    ``/api/posts/live/``. Aqui a busca do arquivo é um lookup em memória; só o
+    envio de um estático troca de thread. Sem ``collectstatic`` (desenvolvimento,
+    testes; o ``runserver`` serve os estáticos sozinho) só repassa a requisição.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        collected = os.path.isdir(settings.STATIC_ROOT)
+        self.static = WhiteNoiseMiddleware(get_response) if collected else None
+
+    def find(self, request):
+        if self.static is None:
+            return None
+        if self.static.autorefresh:
+            return self.static.find_file(request.path_info)
+        return self.static.files.get(request.path_info)
+
+    def handle(self, request):
+        static_file = self.find(request)
+        if static_file is not None:
+            return self.static.serve(static_file, request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        static_file = self.find(request)
+        if static_file is None:
+            return await self.get_response(request)
+        response = await sync_to_async(self.static.serve)(static_file, request)
+        # O ASGI só consome iteradores síncronos com aviso: o arquivo é lido em blocos numa thread
+        response.streaming_content = self.read_in_threads(response.file_to_stream, response.block_size)
+        return response
+
+    @staticmethod
+    async def read_in_threads(file, block_size):
+        if file is None:
+            return
+        try:
+            while chunk := await sync_to_async(file.read)(block_size):
+                yield chunk
+        finally:
+            await sync_to_async(file.close)()
+
+
+class IdleLogoutMiddleware(HybridMiddleware):
+    """
+    Desloga sessões autenticadas inativas há mais de ``IDLE_TIMEOUT_SECONDS``.
+
+    O ``last_activity`` só é regravado quando o valor guardado tem mais de
+    ``IDLE_TOUCH_GRANULARITY_SECONDS``: com sessões em banco, regravá-lo a cada
+    requisição transformaria todo GET num UPDATE da sessão. Em troca, o logout
+    por inatividade pode ocorrer até essa granularidade mais cedo.
+    """
+    @staticmethod
+    def decide(now, last):
+        """'logout', 'touch' (regravar ``last_activity``) ou None."""
+        timeout = getattr(settings, "IDLE_TIMEOUT_SECONDS", 3600)  # 1h por padrão
+        granularity = getattr(settings, "IDLE_TOUCH_GRANULARITY_SECONDS", 60)
+        # Se exceder o tempo de inatividade, desloga
+        if last is not None and now - last > timeout:
+            return 'logout'
+        # Só marca a sessão como modificada quando o timestamp envelheceu
+        if last is None or now - last >= granularity:
+            return 'touch'
+        return None
+
+    def handle(self, request):
         # Só considera sessões autenticadas
         if request.user.is_authenticated:
             now = int(time.time())
-            last = request.session.get("last_activity", now)
-            timeout = getattr(settings, "IDLE_TIMEOUT_SECONDS", 3600)  # 1h por padrão
-
-            # Se exceder o tempo de inatividade, desloga
-            if now - last > timeout:
+            action = self.decide(now, request.session.get("last_activity"))
+            if action == 'logout':
                 logout(request)
                 # Limpamos o last_activity para evitar reaproveitar valor antigo
                 request.session.pop("last_activity", None)
-            else:
-                # Atualiza o timestamp a cada requisição
+            elif action == 'touch':
                 request.session["last_activity"] = now
 
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+    async def __acall__(self, request):
+        user = await request.auser()
+        # O request.user síncrono (autenticadores do DRF) reaproveita o usuário já carregado
+        request.user = user
+        if user.is_authenticated:
+            now = int(time.time())
+            action = self.decide(now, await request.session.aget("last_activity"))
+            if action == 'logout':
+                await alogout(request)
+                await request.session.apop("last_activity", None)
+            elif action == 'touch':
+                await request.session.aset("last_activity", now)
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Libera leituras nas réplicas (``backend/routers.py``) para GET/HEAD/OPTIONS.
+
+    Depois de uma escrita bem-sucedida (outro método, status < 400) o cliente
+    recebe o cookie ``DB_PRIMARY_PIN_COOKIE`` com o instante até o qual suas
+    leituras continuam no primário (``DB_READ_YOUR_WRITES_SECONDS``): quem
+    curtiu, postou ou seguiu alguém vê o resultado mesmo com a réplica
+    atrasada. Cookie em vez de sessão para não transformar toda escrita num
+    UPDATE da sessão e para valer também com JWT.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def use_replicas(self, request):
+        if request.method not in self.SAFE_METHODS:
+            return False
+        try:
+            pinned_until = float(request.COOKIES.get(settings.DB_PRIMARY_PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        return pinned_until <= time.time()
+
+    def pin(self, request, response):
+        if request.method in self.SAFE_METHODS or response.status_code >= 400:
+            return
+        window = settings.DB_READ_YOUR_WRITES_SECONDS
+        response.set_cookie(
+            settings.DB_PRIMARY_PIN_COOKIE, f'{time.time() + window:.0f}', max_age=window,
+            # Mesmo SameSite da sessão: o frontend é de outra origem e só envia cookies SameSite=None
+            secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite=settings.SESSION_COOKIE_SAMESITE,
+        )
+
+    def handle(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        with routers.replica_reads(self.use_replicas(request)):
+            response = self.get_response(request)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        with routers.replica_reads(self.use_replicas(request)):
+            response = await self.get_response(request)
+        self.pin(request, response)
+        return response
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Orçamento de SQL estourado ou N+1 detectado com ``SQL_BUDGET_STRICT`` ligado."""
+
+
+def view_name(request):
+    """``Classe.ação`` da view resolvida (``PostViewSet.feed``, ``UserProfileView.get``)."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if view is None:
+        return match.view_name or match._func_path
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view.__name__}.{actions.get(method, method)}'
+
+
+class SQLInstrumentationMiddleware(HybridMiddleware):
+    """
+    Mede o SQL de cada requisição com um ``execute_wrapper`` (``backend/querystats.py``).
+
+    Devolve ``Server-Timing`` (``db`` = SQL da requisição inteira, ``app`` =
+    tempo total) só com ``DEBUG`` ou para staff, já que o cabeçalho expõe o
+    custo interno de cada endpoint, e registra uma linha JSON no logger ``backend.sql`` com a
+    contagem, o tempo, as instruções mais lentas e as impressões digitais
+    repetidas. O orçamento de ``SQL_QUERY_BUDGETS`` (por ``Classe.ação``) e a
+    detecção de N+1 (``SQL_DUPLICATE_QUERY_THRESHOLD``) olham só as consultas
+    da view, sem a carga da sessão e do usuário feita pelos middlewares (a
+    gravação da sessão, no ``SessionMiddleware`` mais externo, nem é medida). Ao
+    estourar, registram um aviso ou, com ``SQL_BUDGET_STRICT`` (ligado pelo
+    test runner), levantam ``QueryBudgetExceeded``.
+    """
+    def handle(self, request):
+        if not settings.SQL_INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+        recorder = request._sql_recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        self.report(request, response, recorder, (time.perf_counter() - start) * 1000)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.SQL_INSTRUMENTATION_ENABLED:
+            return await self.get_response(request)
+        recorder = request._sql_recorder = QueryRecorder()
+        start = time.perf_counter()
+        # As threads do ORM são novas e recebem o wrapper em connection_created
+        with recorder.record(install=False):
+            response = await self.get_response(request)
+        self.report(request, response, recorder, (time.perf_counter() - start) * 1000)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = getattr(request, '_sql_recorder', None)
+        if recorder is not None:
+            request._sql_view_start = recorder.mark()
+
+    @staticmethod
+    def show_timing(request):
+        if settings.DEBUG:
+            return True
+        # IdleLogoutMiddleware já resolveu request.user: ler is_staff não consulta o banco
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_staff)
+
+    def report(self, request, response, recorder, elapsed_ms):
+        db_ms = recorder.total_ms()
+        if self.show_timing(request):
+            timing = f'db;dur={db_ms:.1f};desc="{recorder.count()} queries", app;dur={elapsed_ms:.1f}'
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        since = getattr(request, '_sql_view_start', 0)
+        name = view_name(request)
+        view_queries = recorder.count(since)
+        budget = settings.SQL_QUERY_BUDGETS.get(name)
+        duplicates = recorder.duplicates(settings.SQL_DUPLICATE_QUERY_THRESHOLD, since)
+        record = {
+            'view': name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count(),
+            'view_queries': view_queries,
+            'sql_ms': round(db_ms, 3),
+            'duration_ms': round(elapsed_ms, 3),
+            'slowest': recorder.slowest(),
+            'duplicates': duplicates,
+        }
+        problems = []
+        if budget is not None and view_queries > budget:
+            record['budget'] = budget
+            problems.append(f'{name}: {view_queries} consultas (orçamento {budget})')
+        if duplicates:
+            problems.append(f'{name}: possível N+1 ({", ".join(f"{n}x {fp[:120]}" for fp, n in duplicates.items())})')
+
+        if not problems:
+            sql_logger.info(json.dumps(record))
+            return
+        sql_logger.warning(json.dumps(record))
+        if settings.SQL_BUDGET_STRICT:
+            raise QueryBudgetExceeded('; '.join(problems))
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Alimenta ``backend.metrics.registry``: latência, tamanho e tempo de SQL por
+    view, e requisições em andamento. Fica antes de ``SQLInstrumentationMiddleware``
+    para ler o tempo de SQL já fechado; com a instrumentação desligada, mede o
+    SQL com um ``QueryTimer`` próprio, que só soma as durações.
+    """
+    def handle(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        start = time.perf_counter()
+        if settings.SQL_INSTRUMENTATION_ENABLED:
+            response = self.get_response(request)
+        else:
+            with self.timer(request).record():
+                response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        if settings.SQL_INSTRUMENTATION_ENABLED:
+            response = await self.get_response(request)
+        else:
+            # As threads do ORM são novas e recebem o wrapper em connection_created
+            with self.timer(request).record(install=False):
+                response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def timer(request):
+        request._sql_timer = QueryTimer()
+        return request._sql_timer
+
+    def observe(self, request, response, duration):
+        started = getattr(request, '_metrics_view', None)
+        view = started or view_name(request) or metrics.UNRESOLVED
+        size = None if response.streaming else len(response.content)
+        recorder = getattr(request, '_sql_recorder', None) or getattr(request, '_sql_timer', None)
+        db_seconds = recorder.total_ms() / 1000 if recorder is not None else None
+        metrics.registry.finished(view, response.status_code, duration, size, db_seconds, started=started is not None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if settings.METRICS_ENABLED:
+            request._metrics_view = view_name(request)
+            metrics.registry.started(request._metrics_view)
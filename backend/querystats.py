@@ -0,0 +1,134 @@
+"""
+Contabilidade de SQL por requisição (usada por ``SQLInstrumentationMiddleware``).
+
+Toda conexão recebe um ``execute_wrapper`` permanente que repassa cada
+instrução ao ``QueryRecorder`` ativo no contexto (um ``ContextVar``), com a
+sua duração e sem os parâmetros. O contexto acompanha o ``sync_to_async``,
+então consultas feitas em outras threads pelas views assíncronas também
+entram na conta da requisição. Controle de transação (SAVEPOINT/RELEASE,
+que os testes e ``atomic()`` geram) não conta.
+
+A impressão digital de uma instrução troca literais e listas ``IN (...)``
+por marcadores; a mesma impressão digital repetida muitas vezes numa
+requisição é o sinal de um N+1.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+TRANSACTION_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT', 'ROLLBACK')
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|\d+)\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Forma normalizada de ``sql``: mesma consulta com outros valores, mesma impressão digital."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+_active = ContextVar('query_recorder', default=None)
+
+
+def _wrapper(execute, sql, params, many, context):
+    recorder = _active.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install(connection):
+    """Garante o wrapper em ``connection`` (idempotente)."""
+    if _wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_wrapper)
+
+
+def install_all():
+    """Instala o wrapper nas conexões da thread atual."""
+    for connection in connections.all():
+        install(connection)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+def _counts(sql):
+    return not sql.lstrip().upper().startswith(TRANSACTION_PREFIXES)
+
+
+class QueryTimer:
+    """
+    Só o tempo total de SQL, sem guardar as instruções: o que as métricas
+    (``METRICS_ENABLED``) usam quando a instrumentação completa está desligada.
+    """
+    def __init__(self):
+        self.elapsed_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if _counts(sql):
+                self.elapsed_ms += (time.perf_counter() - start) * 1000
+
+    @contextmanager
+    def record(self, install=True):
+        """Ativa o recorder no contexto atual enquanto o bloco roda."""
+        if install:
+            install_all()
+        token = _active.set(self)
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    def total_ms(self):
+        return self.elapsed_ms
+
+
+class QueryRecorder(QueryTimer):
+    def __init__(self):
+        # (sql, duração em ms)
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if _counts(sql):
+                self.statements.append((sql, (time.perf_counter() - start) * 1000))
+
+    def mark(self):
+        """Posição atual, para contar só o que vem depois (``since``)."""
+        return len(self.statements)
+
+    def count(self, since=0):
+        return len(self.statements) - since
+
+    def total_ms(self, since=0):
+        return sum(ms for _, ms in self.statements[since:])
+
+    def slowest(self, limit=3, since=0):
+        ranked = sorted(self.statements[since:], key=lambda item: item[1], reverse=True)
+        return [{'ms': round(ms, 3), 'sql': sql[:300]} for sql, ms in ranked[:limit]]
+
+    def duplicates(self, threshold, since=0):
+        """Impressões digitais executadas ``threshold`` vezes ou mais: ``{fingerprint: vezes}``."""
+        counts = Counter(fingerprint(sql) for sql, _ in self.statements[since:])
+        return {fp: n for fp, n in counts.most_common() if n >= threshold}
@@ -0,0 +1,35 @@
+"""Renderer JSON rápido, com saída byte a byte igual à do JSONRenderer do DRF."""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, usa o renderer padrão
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Usa orjson quando disponível. Só assume o caso compacto e sem indentação
+    (o padrão da API); qualquer outra configuração cai no renderer do DRF.
+
+    Datas e horas passam pelo encoder do DRF (UTC vira ``Z``, não ``+00:00``)
+    e chaves não-string viram string, como no ``json``. O que o orjson recusa
+    (inteiros acima de 64 bits...) também cai no renderer do DRF.
+    """
+    _default = staticmethod(encoders.JSONEncoder().default)
+    _options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self._default, option=self._options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Mesmo escape do DRF para U+2028/U+2029 (JSON válido como JavaScript)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
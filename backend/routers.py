@@ -0,0 +1,53 @@
+"""
+Roteamento entre o banco primário (``default``) e as réplicas de leitura.
+
+Leituras vão para uma réplica de ``DATABASE_REPLICAS`` só quando o contexto
+atual libera (``replica_reads()``), o que ``ReplicaRoutingMiddleware`` faz
+para requisições de métodos seguros de quem não escreveu há pouco. Fora
+disso (escritas, comandos, threads de apoio) tudo vai para o primário. O
+estado fica num ``ContextVar``, então acompanha o ``sync_to_async`` das views
+assíncronas. Leituras dentro de uma transação do primário também ficam nele,
+para enxergar o que a própria transação gravou.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Libera (ou bloqueia) leituras em réplica enquanto o bloco roda."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_alias():
+    """Alias usado para a próxima leitura no contexto atual."""
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or not _replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return replicas[0] if len(replicas) == 1 else random.choice(replicas)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # O esquema chega às réplicas pela replicação
+        return db == DEFAULT_DB_ALIAS
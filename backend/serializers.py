@@ -0,0 +1,17 @@
+"""Base compartilhada dos serializers de escrita."""
+
+
+class UpdateFieldsMixin:
+    """
+    ``update()`` grava só os campos recebidos (mais os ``auto_now``) com
+    ``save(update_fields=...)``. Um ``save()`` completo regravaria os
+    contadores desnormalizados com o valor lido no início da requisição,
+    desfazendo incrementos ``F()`` feitos por outras requisições no meio.
+    """
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        auto_now = [f.name for f in instance._meta.concrete_fields if getattr(f, 'auto_now', False)]
+        instance.save(update_fields=[*validated_data, *auto_now])
+        return instance
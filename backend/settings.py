@@ -1,5 +1,6 @@
+from datetime import timedelta
 from pathlib import Path
-from decouple import AutoConfig
+from decouple import AutoConfig, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -15,6 +16,28 @@ DEFAULT_DB_SQLITE = {
     'NAME': BASE_DIR / 'db.sqlite3',
 }
 
+# Modo SQLite de produção: WAL (leitores não bloqueiam o escritor), fsync só nos
+# checkpoints, mmap e cache maiores, espera pelo lock em vez de "database is
+# locked" e BEGIN IMMEDIATE nas transações (evita o deadlock de quem lê e depois
+# tenta escrever). Os PRAGMAs rodam a cada conexão nova. Não use WAL em sistemas
+# de arquivos de rede. Manutenção periódica: `manage.py sqlite_maintenance`.
+SQLITE_TUNED = config('SQLITE_TUNED', default=False, cast=bool)
+SQLITE_TUNED_OPTIONS = {
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA mmap_size={config('SQLITE_MMAP_SIZE_MB', default=256, cast=int) * 1024 * 1024}",
+        # Negativo = KiB
+        f"PRAGMA cache_size=-{config('SQLITE_CACHE_SIZE_MB', default=64, cast=int) * 1024}",
+        'PRAGMA temp_store=MEMORY',
+    ]),
+    'transaction_mode': 'IMMEDIATE',
+    # Segundos esperando o lock de escrita (busy timeout)
+    'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+}
+if SQLITE_TUNED:
+    DEFAULT_DB_SQLITE['OPTIONS'] = SQLITE_TUNED_OPTIONS
+
 USE_POSTGRES = config('USE_POSTGRES', default=False, cast=bool)
 PA_USE_SQLITE = config('PA_USE_SQLITE', default=True, cast=bool)
 
@@ -36,6 +59,24 @@ else:
 
 CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
 
+# Réplicas de leitura (backend/routers.py): caminhos de arquivos no SQLite (cópias
+# atualizadas com `manage.py sync_sqlite_replicas`) ou hosts[:porta] no PostgreSQL
+DATABASE_REPLICAS = []
+for index, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+    alias = f'replica{index}'
+    if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        DATABASES[alias] = {**DATABASES['default'], 'NAME': replica}
+    else:
+        host, _, port = replica.partition(':')
+        DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    # Nos testes a réplica é o próprio banco de teste
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['backend.routers.PrimaryReplicaRouter'] if DATABASE_REPLICAS else []
+# Depois de uma escrita, as leituras do cliente ficam no primário por esta janela (cookie)
+DB_READ_YOUR_WRITES_SECONDS = config('DB_READ_YOUR_WRITES_SECONDS', default=10, cast=int)
+DB_PRIMARY_PIN_COOKIE = 'db_primary_until'
+
 PA_HOST = config('PA_HOST', default='')
 ALLOW_PYTHONANYWHERE_WILDCARD = config('ALLOW_PYTHONANYWHERE_WILDCARD', default=False, cast=bool)
 ALLOWED_HOSTS = ['localhost', '127.0.0.1']
@@ -59,16 +100,27 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Estáticos (collectstatic) servidos pelo próprio processo, antes de sessão e SQL
+    'backend.middleware.StaticFilesMiddleware',
+    'backend.middleware.ReplicaRoutingMiddleware',
+    'backend.middleware.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Depois da sessão: a regravação dela (last_activity) não entra na conta da view
+    'backend.middleware.SQLInstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backend.middleware.IdleLogoutMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'backend.urls'
+# Variantes async do feed, detalhe, comentários e lista de usuários (servir via ASGI; backend/aio.py)
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+# Consultas independentes das views async em paralelo, cada uma com a própria conexão
+ASYNC_PARALLEL_QUERIES = config('ASYNC_PARALLEL_QUERIES', default=True, cast=bool)
+ROOT_URLCONF = 'backend.async_urls' if ASYNC_READ_VIEWS else 'backend.urls'
 WSGI_APPLICATION = 'backend.wsgi.application'
 
 TEMPLATES = [
@@ -99,6 +151,8 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Threads que geram as variantes de imagens enviadas (backend/images.py); 0 = na própria requisição
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
 
 CSRF_TRUSTED_ORIGINS = []
 if PA_HOST:
@@ -141,5 +195,132 @@ SESSION_COOKIE_SAMESITE = 'None'
 CSRF_COOKIE_SAMESITE = 'None'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# JWT opcional (accounts/authentication.py): /api/auth/token/ e /api/auth/token/refresh/
+JWT_AUTH_ENABLED = config('JWT_AUTH_ENABLED', default=False, cast=bool)
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=300, cast=int)
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=config('JWT_ACCESS_MINUTES', default=15, cast=int)),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=config('JWT_REFRESH_DAYS', default=7, cast=int)),
+    # Trocar a senha invalida os tokens emitidos antes
+    'CHECK_REVOKE_TOKEN': True,
+    'UPDATE_LAST_LOGIN': False,
+}
+if JWT_AUTH_ENABLED:
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = [
+        'accounts.authentication.CachedJWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ]
+
+# Paginação por cursor dos posts (feed e listagem)
+POSTS_PAGE_SIZE = config('POSTS_PAGE_SIZE', default=20, cast=int)
+POSTS_MAX_PAGE_SIZE = config('POSTS_MAX_PAGE_SIZE', default=100, cast=int)
+
+# Teto do "N posts novos" de /api/posts/posts/feed/new_count/ (acima dele, has_more)
+FEED_NEW_COUNT_LIMIT = config('FEED_NEW_COUNT_LIMIT', default=99, cast=int)
+
+# Timeline materializada: autores com mais seguidores que o limite são mesclados na leitura
+TIMELINE_FANOUT_LIMIT = config('TIMELINE_FANOUT_LIMIT', default=10000, cast=int)
+TIMELINE_BACKFILL_SIZE = config('TIMELINE_BACKFILL_SIZE', default=200, cast=int)
+
+# Busca de posts: vazio escolhe pelo banco (FTS5 no SQLite, tsvector no PostgreSQL)
+POSTS_SEARCH_BACKEND = config('POSTS_SEARCH_BACKEND', default='')
+
+# Cache (locmem por padrão; troque por Redis/Memcached em produção via CACHE_BACKEND/CACHE_LOCATION)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='clone-x'),
+    }
+}
+# locmem e dummy são por processo: com vários workers, cada um teria a sua versão dos dados
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Cache de respostas de posts versionado; LAG > 0 deixa contadores defasarem até LAG segundos.
+# Ligado por padrão só com cache compartilhado: com locmem, a versão incrementada num worker
+# não invalida as páginas guardadas nos outros
+POSTS_CACHE_ENABLED = config('POSTS_CACHE_ENABLED', default=SHARED_CACHE, cast=bool)
+POSTS_CACHE_TTL = config('POSTS_CACHE_TTL', default=300, cast=int)
+POSTS_CACHE_ENGAGEMENT_LAG = config('POSTS_CACHE_ENGAGEMENT_LAG', default=0, cast=int)
+
+# Buffer write-behind de curtidas/retweets (posts/buffer.py); desligado por padrão
+ENGAGEMENT_BUFFER_ENABLED = config('ENGAGEMENT_BUFFER_ENABLED', default=False, cast=bool)
+ENGAGEMENT_BUFFER_FLUSH_INTERVAL = config('ENGAGEMENT_BUFFER_FLUSH_INTERVAL', default=1.0, cast=float)
+ENGAGEMENT_BUFFER_MAX_PENDING = config('ENGAGEMENT_BUFFER_MAX_PENDING', default=1000, cast=int)
+
+# Tendências com decaimento no tempo (posts/trending.py; GET /api/posts/posts/trending/)
+TRENDING_ENABLED = config('TRENDING_ENABLED', default=True, cast=bool)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=6, cast=float)
+TRENDING_WINDOW_HOURS = config('TRENDING_WINDOW_HOURS', default=24, cast=float)
+# Eventos somados em memória e gravados uma vez por intervalo, uma escrita por post (0 = na hora)
+TRENDING_FLUSH_INTERVAL = config('TRENDING_FLUSH_INTERVAL', default=2.0, cast=float)
+# Peso de cada engajamento na pontuação, por contador
+TRENDING_WEIGHTS = {'likes_count': 1, 'comments_count': 2, 'retweets_count': 3}
+# Pontuação decaída abaixo da qual compact_trending descarta o post
+TRENDING_MIN_SCORE = config('TRENDING_MIN_SCORE', default=0.5, cast=float)
+
+# Contadores ao vivo por SSE em /api/posts/live/ (servidor ASGI; posts/live.py)
+LIVE_UPDATES_ENABLED = config('LIVE_UPDATES_ENABLED', default=False, cast=bool)
+# Classe do broker; o LocalBroker só entrega no próprio processo (um worker)
+LIVE_BROKER = config('LIVE_BROKER', default='posts.live.LocalBroker')
+# Variações somadas e enviadas uma vez por tick (0 = na hora)
+LIVE_TICK_SECONDS = config('LIVE_TICK_SECONDS', default=1.0, cast=float)
+LIVE_HEARTBEAT_SECONDS = config('LIVE_HEARTBEAT_SECONDS', default=15, cast=float)
+LIVE_STREAM_SECONDS = config('LIVE_STREAM_SECONDS', default=300, cast=float)
+LIVE_MAX_POSTS = config('LIVE_MAX_POSTS', default=100, cast=int)
+
+# Listagens de posts/comentários montadas a partir de .values() em vez dos serializers DRF
+POSTS_FAST_READ_PATH = config('POSTS_FAST_READ_PATH', default=True, cast=bool)
+
 IDLE_TIMEOUT_SECONDS = config('IDLE_TIMEOUT_SECONDS', default=1800, cast=int)
+# Intervalo mínimo entre regravações de last_activity na sessão (0 = a cada requisição)
+IDLE_TOUCH_GRANULARITY_SECONDS = config('IDLE_TOUCH_GRANULARITY_SECONDS', default=60, cast=int)
+# cached_db: leituras da sessão vêm do cache, só com cache compartilhado (com locmem, um logout
+# num worker deixaria a sessão viva no cache dos outros); 'django.contrib.sessions.backends.signed_cookies'
+# dispensa o banco
+SESSION_ENGINE = config(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if SHARED_CACHE else 'django.contrib.sessions.backends.db',
+)
 SESSION_COOKIE_AGE = config('SESSION_COOKIE_AGE', default=1800, cast=int)
+
+# Instrumentação de SQL por requisição (backend/middleware.py): Server-Timing (só DEBUG/staff) + log JSON
+# em 'backend.sql'. Mede toda consulta, então fica desligada em produção salvo pedido (o test runner liga)
+SQL_INSTRUMENTATION_ENABLED = config('SQL_INSTRUMENTATION_ENABLED', default=DEBUG, cast=bool)
+# Máximo de consultas da view (sem sessão/autenticação dos middlewares), por "Classe.ação"
+SQL_QUERY_BUDGETS = {
+    'PostViewSet.feed': 7,
+    'PostViewSet.new_count': 4,
+    'PostViewSet.trending': 4,
+    'PostViewSet.list': 5,
+    'PostViewSet.retrieve': 4,
+    'PostViewSet.comments': 3,
+    'PostViewSet.like': 3,
+    'PostViewSet.unlike': 3,
+    'PostViewSet.retweet': 3,
+    'CommentViewSet.list': 3,
+    'UsersListView.get': 3,
+    'FollowersListView.get': 3,
+    'FollowingListView.get': 3,
+    'UserTypeaheadView.get': 4,
+    'UserProfileView.get': 1,
+}
+# Mesma consulta (com outros valores) repetida tantas vezes numa requisição = N+1
+SQL_DUPLICATE_QUERY_THRESHOLD = config('SQL_DUPLICATE_QUERY_THRESHOLD', default=5, cast=int)
+# Estourar o orçamento ou repetir consultas levanta QueryBudgetExceeded (o test runner liga)
+SQL_BUDGET_STRICT = config('SQL_BUDGET_STRICT', default=False, cast=bool)
+TEST_RUNNER = 'backend.testrunner.QueryBudgetTestRunner'
+
+# Métricas em memória no formato do Prometheus em /metrics/ (staff; backend/metrics.py)
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """
+    Roda os testes com a instrumentação de SQL ligada e ``SQL_BUDGET_STRICT``:
+    orçamento estourado ou N+1 falha o teste.
+    As tendências ficam desligadas (a thread de gravação escreveria no banco de
+    teste fora da transação de cada teste); os testes delas as ligam.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.SQL_INSTRUMENTATION_ENABLED = True
+        settings.SQL_BUDGET_STRICT = True
+        settings.TRENDING_ENABLED = False
@@ -3,10 +3,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/posts/', include('posts.urls')),
+    # Métricas no formato do Prometheus (apenas staff)
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 # Configuração para servir arquivos de mídia durante o desenvolvimento
@@ -0,0 +1,55 @@
+"""
+Configuração do Gunicorn para produção: ``gunicorn -c gunicorn.conf.py``.
+
+``SERVER_MODE=wsgi`` (padrão) serve ``backend.wsgi`` com workers de threads
+(``gthread``); ``SERVER_MODE=asgi`` serve ``backend.asgi`` com workers do
+Uvicorn, para as views async de leitura (ligue ``ASYNC_READ_VIEWS``). Os
+números de workers partem dos núcleos da máquina e podem ser sobrescritos
+com ``WEB_CONCURRENCY`` / ``GUNICORN_THREADS``.
+
+Vários workers exigem um cache compartilhado (``CACHE_BACKEND`` fora do
+locmem, ``SHARED_CACHE``): o usuário autenticado fica em cache e a
+invalidação feita num processo não chegaria aos outros, que continuariam
+vendo contadores e perfil antigos. Sem ele, sobe um único processo (com mais
+threads) e pedir mais workers falha na subida.
+"""
+import multiprocessing
+import os
+
+from django.conf import settings
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+cores = multiprocessing.cpu_count()
+mode = os.environ.get('SERVER_MODE', 'wsgi')
+shared_cache = settings.SHARED_CACHE
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+if mode == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Um event loop por núcleo; a concorrência vem do loop e do pool de threads do ORM
+    workers = int(os.environ.get('WEB_CONCURRENCY', cores if shared_cache else 1))
+else:
+    wsgi_app = 'backend.wsgi:application'
+    worker_class = 'gthread'
+    # Regra clássica do Gunicorn (2 x núcleos + 1), com threads para cobrir a espera pelo banco;
+    # num processo só, as threads fazem o papel dos workers
+    workers = int(os.environ.get('WEB_CONCURRENCY', 2 * cores + 1 if shared_cache else 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', 4 if shared_cache else 2 * cores + 1))
+
+if workers > 1 and not shared_cache:
+    raise RuntimeError(
+        f'{workers} workers com cache local ({settings.CACHES["default"]["BACKEND"]}): configure um '
+        'CACHE_BACKEND compartilhado (Redis, Memcached, banco) ou use WEB_CONCURRENCY=1.'
+    )
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recicla workers aos poucos (vazamentos de memória), com jitter para não reiniciarem juntos
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,93 @@
+"""
+Variantes assíncronas das leituras mais quentes de posts (``ASYNC_READ_VIEWS``).
+
+Mesma saída, byte a byte, do caminho rápido síncrono (``posts/fastpath.py``),
+mas as consultas independentes de cada página (linhas dos posts, curtidas e
+retweets do leitor) rodam ao mesmo tempo com ``backend.aio.parallel``. O que
+não é caminho feliz fica com as views do ``PostViewSet`` (ver ``backend/aio.py``).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from backend import aio
+from backend.conditional import latest
+from .fastpath import COMMENT_COLUMNS, POST_COLUMNS, render_comments, render_posts
+from .models import Comment, Like, Post, Retweet
+from .pagination import KeysetPagination, rows_by_pk
+from .timeline import POST_FIELDS, timeline_keys
+from .urls import router
+from .viewer import EMPTY_STATE, ViewerState, engaged_ids, with_pending
+from .views import feed_since, page_validators, post_pk
+
+
+def _route(name):
+    return next(url.callback for url in router.urls if url.name == name)
+
+
+def read_queryset():
+    # Como PostViewSet.get_read_queryset() no caminho rápido
+    return Post.objects.select_related('author').values(*POST_COLUMNS)
+
+
+async def page_with_state(user, post_ids):
+    """Linhas de ``post_ids`` e o estado do leitor, em paralelo."""
+    calls = [lambda: rows_by_pk(read_queryset(), post_ids)]
+    if user.is_authenticated and post_ids:
+        calls += [lambda: engaged_ids(Like, user, post_ids), lambda: engaged_ids(Retweet, user, post_ids)]
+    rows, *engaged = await aio.parallel(*calls)
+    state = with_pending(user, post_ids, ViewerState(*engaged)) if engaged else EMPTY_STATE
+    return [rows[post_id] for post_id in post_ids if post_id in rows], state
+
+
+@aio.async_variant(_route('post-feed'))
+async def feed(request):
+    if not settings.POSTS_FAST_READ_PATH or 'comments_preview' in request.GET:
+        raise aio.Fallback()
+    paginator = KeysetPagination()
+
+    def keys():
+        user = aio.resolve_user(request)
+        if not user.is_authenticated:
+            # Feed público: página anônima em cache da view síncrona
+            raise aio.Fallback()
+        drf_request = aio.drf_request(request)
+        return user, paginator.paginate_rows(timeline_keys(user), drf_request, POST_FIELDS, feed_since(drf_request))
+
+    user, page = await sync_to_async(keys)()
+    rows, state = await page_with_state(user, [key['id'] for key in page])
+    links = paginator.get_next_link(), paginator.get_previous_link()
+    # Mesmas partes do ETag de PostViewSet.render_page (sem comments_preview)
+    return aio.conditional_json(request, user, (page_validators(rows, state), None, *links), lambda: {
+        'next': links[0],
+        'previous': links[1],
+        'results': render_posts(rows, request, state),
+    }, last_modified=latest(rows))
+
+
+@aio.async_variant(_route('post-detail'))
+async def detail(request, pk):
+    if not settings.POSTS_FAST_READ_PATH:
+        raise aio.Fallback()
+    post_id = post_pk(pk)
+    user = await aio.authenticate(request)
+    rows, state = await page_with_state(user, [post_id])
+    if not rows:
+        raise aio.Fallback()  # 404 da view síncrona
+    return aio.conditional_json(request, user, (page_validators(rows, state),),
+                                lambda: render_posts(rows, request, state)[0], last_modified=latest(rows))
+
+
+@aio.async_variant(_route('post-comments'))
+async def comments(request, pk):
+    if not settings.POSTS_FAST_READ_PATH:
+        raise aio.Fallback()
+    post_id = post_pk(pk)
+    user = await aio.authenticate(request)
+    if not user.is_authenticated:
+        raise aio.Fallback()  # 401/403 da view síncrona
+    queryset = Comment.objects.filter(post_id=post_id).select_related('author').order_by('-created_at')
+    rows = [row async for row in queryset.values(*COMMENT_COLUMNS)]
+    # Lista vazia: distinguir post sem comentários de post inexistente
+    if not rows and not await Post.objects.filter(pk=post_id).aexists():
+        raise aio.Fallback()
+    return aio.conditional_json(request, user, (rows,), lambda: render_comments(rows))
@@ -0,0 +1,223 @@
+"""
+Buffer write-behind de curtidas e retweets (opcional, ``ENGAGEMENT_BUFFER_ENABLED``).
+
+Em posts virais, milhares de curtidas simultâneas disputam a mesma linha de
+``Post`` e o índice único de ``Like``. Com o buffer ligado, as ações só
+registram a intenção em memória, deduplicada por ``(tipo, usuário, post)``
+(a última vence), e um flush periódico grava tudo de uma vez: um
+``bulk_create(ignore_conflicts=True)`` por tipo só com os pares que ainda
+não existem, um DELETE por post para as remoções e um UPDATE ``F()`` por
+post com a variação líquida do que de fato entrou e saiu. Recontar com
+``COUNT(*)`` custaria mais justamente nos posts virais; o recálculo
+absoluto fica para o ``recount_engagement``.
+
+Leituras do próprio usuário continuam consistentes: ``resolve_viewer_state``
+e os contadores devolvidos pelas ações sobrepõem as intenções pendentes. O
+buffer é por processo; com vários workers, cada flush soma só o que ele
+gravou, então os contadores continuam corretos, mas a sobreposição só vale
+no worker que recebeu a ação até o próximo flush
+(``ENGAGEMENT_BUFFER_FLUSH_INTERVAL``).
+
+Intenções sobre posts ou usuários apagados desde a ação são descartadas no
+flush. Se a gravação falhar, o lote volta para a fila e é tentado de novo no
+próximo flush; uma intenção que falhou ``MAX_ATTEMPTS`` vezes é descartada
+(e registrada no log) para não travar a fila.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from accounts.models import User
+from . import cache
+from .counters import KINDS
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+
+class EngagementBuffer:
+    def __init__(self, interval, max_pending):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (tipo, user_id, post_id) -> True (engajar) / False (desfazer)
+        self._intents = {}
+        # (tipo, post_id) -> variação ainda não gravada do contador
+        self._deltas = defaultdict(int)
+        # Lote em gravação: continua visível até o commit do flush
+        self._flushing = {}
+        self._flushing_deltas = {}
+        # (tipo, user_id, post_id) -> gravações que já falharam com a intenção
+        self._attempts = {}
+        self._thread = None
+
+    def _state(self, key, stored):
+        if key in self._intents:
+            return self._intents[key]
+        return self._flushing.get(key, stored)
+
+    def record(self, kind, user_id, post_id, engaged, stored):
+        """
+        Registra a intenção de ``user_id`` sobre ``post_id``; ``stored`` diz
+        se a linha existe no banco. Devolve True se muda o estado efetivo.
+        """
+        key = (kind, user_id, post_id)
+        with self._lock:
+            if self._state(key, stored) == engaged:
+                return False
+            self._intents[key] = engaged
+            self._deltas[kind, post_id] += 1 if engaged else -1
+            full = len(self._intents) >= self.max_pending
+        self._ensure_thread()
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                # A ação já está no buffer: a requisição não falha por causa do flush
+                logger.exception('Falha ao gravar o buffer de engajamento cheio.')
+        return True
+
+    def pending_delta(self, kind, post_id):
+        with self._lock:
+            return self._deltas.get((kind, post_id), 0) + self._flushing_deltas.get((kind, post_id), 0)
+
+    def overlay(self, kind, user_id, post_ids, stored):
+        """``stored`` (ids engajados segundo o banco) com as intenções pendentes aplicadas."""
+        with self._lock:
+            if not self._intents and not self._flushing:
+                return stored
+            return frozenset(
+                post_id for post_id in post_ids
+                if self._state((kind, user_id, post_id), post_id in stored)
+            )
+
+    def flush(self):
+        """Grava as intenções pendentes; devolve quantas foram aplicadas."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._intents:
+                    return 0
+                batch, self._intents = self._intents, {}
+                self._flushing, self._flushing_deltas = batch, dict(self._deltas)
+                self._deltas = defaultdict(int)
+            try:
+                written = self._write(batch)
+            except Exception:
+                self._requeue(batch)
+                raise
+            with self._lock:
+                self._flushing, self._flushing_deltas = {}, {}
+                for key in batch:
+                    self._attempts.pop(key, None)
+            return written
+
+    def _requeue(self, batch):
+        """Devolve à fila um lote que falhou, menos as intenções que esgotaram as tentativas."""
+        dropped = []
+        with self._lock:
+            for key, engaged in batch.items():
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts >= MAX_ATTEMPTS:
+                    self._attempts.pop(key, None)
+                    dropped.append(key)
+                    continue
+                self._attempts[key] = attempts
+                # Uma ação mais nova sobre o mesmo par já está na fila e vence
+                self._intents.setdefault(key, engaged)
+            for key, delta in self._flushing_deltas.items():
+                self._deltas[key] += delta
+            # Variações só valem para posts que ainda têm intenções na fila
+            queued = {(kind, post_id) for kind, _, post_id in self._intents}
+            self._deltas = defaultdict(int, {key: delta for key, delta in self._deltas.items() if key in queued})
+            self._flushing, self._flushing_deltas = {}, {}
+        if dropped:
+            logger.error('%d intenções de engajamento descartadas após %d falhas: %s',
+                         len(dropped), MAX_ATTEMPTS, dropped[:10])
+
+    def _write(self, batch):
+        """Grava ``batch`` numa transação; devolve quantas intenções foram aplicadas."""
+        with transaction.atomic():
+            # Post ou usuário apagado desde a ação: a FK derrubaria o lote inteiro no commit
+            posts = set(Post.objects.filter(pk__in={key[2] for key in batch}).values_list('id', flat=True))
+            users = set(User.objects.filter(pk__in={key[1] for key in batch}).values_list('id', flat=True))
+            batch = {key: engaged for key, engaged in batch.items() if key[2] in posts and key[1] in users}
+            if not batch:
+                return 0
+
+            adds = defaultdict(list)
+            removes = defaultdict(lambda: defaultdict(list))
+            for (kind, user_id, post_id), engaged in batch.items():
+                if engaged:
+                    adds[kind].append((user_id, post_id))
+                else:
+                    removes[kind][post_id].append(user_id)
+
+            # post_id -> {contador: variação líquida gravada}
+            deltas = defaultdict(lambda: defaultdict(int))
+            for kind, (model, field) in KINDS.items():
+                if adds[kind]:
+                    existing = set(
+                        model.objects.filter(
+                            user_id__in={user_id for user_id, _ in adds[kind]},
+                            post_id__in={post_id for _, post_id in adds[kind]},
+                        ).values_list('user_id', 'post_id')
+                    )
+                    new = [pair for pair in adds[kind] if pair not in existing]
+                    model.objects.bulk_create(
+                        [model(user_id=user_id, post_id=post_id) for user_id, post_id in new],
+                        batch_size=1000, ignore_conflicts=True,
+                    )
+                    for _, post_id in new:
+                        deltas[post_id][field] += 1
+                for post_id, user_ids in removes[kind].items():
+                    deleted, _ = model.objects.filter(post_id=post_id, user_id__in=user_ids).delete()
+                    deltas[post_id][field] -= deleted
+
+            # Ordem fixa: flushes de workers diferentes travam as linhas na mesma ordem
+            for post_id in sorted(deltas):
+                changes = {field: F(field) + delta for field, delta in deltas[post_id].items() if delta}
+                if changes:
+                    Post.objects.filter(pk=post_id).update(**changes)
+            transaction.on_commit(cache.bump_for_engagement)
+        return len(batch)
+
+    def _ensure_thread(self):
+        if not self.interval or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='engagement-buffer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Falha ao gravar o buffer de engajamento; nova tentativa em %ss.', self.interval)
+            finally:
+                close_old_connections()
+
+
+_buffer = None
+
+
+def get_buffer():
+    """O buffer do processo, ou None se desligado."""
+    global _buffer
+    if not settings.ENGAGEMENT_BUFFER_ENABLED:
+        return None
+    if _buffer is None:
+        _buffer = EngagementBuffer(settings.ENGAGEMENT_BUFFER_FLUSH_INTERVAL, settings.ENGAGEMENT_BUFFER_MAX_PENDING)
+        atexit.register(_buffer.flush)
+    return _buffer
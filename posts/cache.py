@@ -0,0 +1,86 @@
+"""
+Cache de respostas de leitura de posts.
+
+As chaves embutem um contador global de versão (``posts:version``); criar,
+editar ou apagar posts incrementa a versão e torna obsoletas todas as
+páginas de uma vez, sem varrer chaves. O payload guardado é sempre o da
+visão anônima; usuários autenticados reaproveitam o mesmo payload e só as
+flags ``liked_by_me``/``retweeted_by_me`` são sobrepostas.
+
+Com ``POSTS_CACHE_ENGAGEMENT_LAG`` > 0, curtidas, retweets e comentários não
+incrementam a versão: as páginas expiram nesse intervalo, então os contadores
+podem ficar defasados por até esse tempo.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import viewer
+
+VERSION_KEY = 'posts:version'
+
+
+def posts_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Começa de um valor novo para não colidir com chaves de antes da perda da versão
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_posts_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_for_engagement():
+    """Incrementa a versão em escritas de engajamento, salvo no modo com defasagem."""
+    if not settings.POSTS_CACHE_ENGAGEMENT_LAG:
+        bump_posts_version()
+
+
+def page_timeout():
+    return settings.POSTS_CACHE_ENGAGEMENT_LAG or settings.POSTS_CACHE_TTL
+
+
+def page_key(request):
+    digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f'posts:page:{posts_version()}:{digest}'
+
+
+def cached_response(view, request, build):
+    """
+    Responde com o payload anônimo em cache, calculando-o com ``build()``
+    (com ``view.anonymous = True``) quando não houver.
+    """
+    if not settings.POSTS_CACHE_ENABLED:
+        return build()
+
+    key = page_key(request)
+    data = cache.get(key)
+    if data is None:
+        view.anonymous = True
+        try:
+            response = build()
+        finally:
+            view.anonymous = False
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        data = response.data
+        cache.set(key, data, page_timeout())
+
+    if request.user.is_authenticated:
+        if isinstance(data, dict) and 'results' in data:
+            viewer.overlay_viewer_state(data['results'], request.user)
+        elif isinstance(data, dict):
+            viewer.overlay_viewer_state([data], request.user)
+        else:
+            viewer.overlay_viewer_state(data, request.user)
+    return Response(data)
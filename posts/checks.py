@@ -0,0 +1,41 @@
+"""Verificações de sistema do app (``manage.py check --database default``)."""
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+
+SEARCH_MIGRATION = ('posts', '0008_post_search_index')
+
+# Triggers que mantêm o índice de busca, por banco
+SEARCH_TRIGGERS = {
+    'sqlite': ('posts_post_fts_ai', 'posts_post_fts_au', 'posts_post_fts_ad', 'accounts_user_fts_au'),
+    'postgresql': ('posts_post_search_vector_trg', 'accounts_user_search_vector_trg'),
+}
+
+
+def installed_triggers(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        else:
+            cursor.execute('SELECT tgname FROM pg_trigger WHERE NOT tgisinternal')
+        return {name for name, in cursor.fetchall()}
+
+
+@register(Tags.database)
+def check_search_triggers(app_configs, databases=None, **kwargs):
+    """Sem os triggers, o índice de busca para de acompanhar os posts e a busca fica desatualizada em silêncio."""
+    errors = []
+    for alias in databases or ():
+        connection = connections[alias]
+        expected = SEARCH_TRIGGERS.get(connection.vendor)
+        # Banco ainda sem a migração do índice: nada a verificar
+        if not expected or SEARCH_MIGRATION not in MigrationRecorder(connection).applied_migrations():
+            continue
+        missing = sorted(set(expected) - installed_triggers(connection))
+        if missing:
+            errors.append(Warning(
+                f'Triggers do índice de busca ausentes em "{alias}": {", ".join(missing)}.',
+                hint='Recrie-os revertendo e reaplicando a migração posts 0008_post_search_index.',
+                id='posts.W001',
+            ))
+    return errors
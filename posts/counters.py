@@ -0,0 +1,35 @@
+"""Contadores desnormalizados de ``Post`` (curtidas, comentários e retweets)."""
+from typing import NamedTuple
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Like, Post, Retweet
+
+COUNTER_FIELDS = ('likes_count', 'comments_count', 'retweets_count')
+
+# Tipo de engajamento -> (modelo, contador)
+KINDS = {
+    'like': (Like, 'likes_count'),
+    'retweet': (Retweet, 'retweets_count'),
+}
+SOURCES = {'likes_count': Like, 'comments_count': Comment, 'retweets_count': Retweet}
+
+
+class Counts(NamedTuple):
+    likes_count: int
+    comments_count: int
+    retweets_count: int
+
+
+def _total(model):
+    rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('id')).values('n')
+    return Coalesce(Subquery(rows), 0)
+
+
+def recount(post_ids=None, fields=COUNTER_FIELDS):
+    """Recalcula ``fields`` a partir das tabelas de origem num único UPDATE; devolve o nº de posts."""
+    qs = Post.objects.all()
+    if post_ids is not None:
+        qs = qs.filter(pk__in=post_ids)
+    return qs.update(**{field: _total(SOURCES[field]) for field in fields})
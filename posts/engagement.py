@@ -0,0 +1,186 @@
+"""
+Escritas de engajamento (curtidas, retweets e comentários).
+
+Cada ação custa no máximo duas consultas e não carrega o post: a inserção
+usa ``INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING`` (a existência
+do post e a unicidade por usuário são verificadas pelo próprio banco) e o
+contador é atualizado com ``UPDATE ... RETURNING``, que já devolve os
+contadores frescos para a resposta. Bancos sem ``RETURNING`` caem no ORM.
+Com ``ENGAGEMENT_BUFFER_ENABLED``, curtidas e retweets vão para o buffer
+write-behind (``posts/buffer.py``) e custam uma única leitura.
+
+Todas as mudanças de engajamento passam por aqui, então é aqui que ficam os
+efeitos colaterais (invalidação do cache), disparados só após o commit para
+que nenhuma leitura concorrente guarde em cache a versão anterior, e o
+repasse das variações dos contadores ao stream ao vivo (``posts/live.py``)
+e à pontuação de tendências (``posts/trending.py``), ambos somados em
+memória e entregues fora da requisição.
+"""
+from typing import NamedTuple
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import live, trending
+from .buffer import get_buffer
+from .cache import bump_for_engagement
+from .counters import COUNTER_FIELDS, KINDS, Counts
+from .models import Comment, Post
+
+
+class Result(NamedTuple):
+    """``changed`` é falso quando a ação já estava (ou não estava) feita; ``counts`` é None se o post não existe."""
+    changed: bool
+    counts: Counts | None
+
+
+def _uses_returning():
+    # ON CONFLICT e UPDATE/DELETE ... RETURNING: SQLite >= 3.35 e PostgreSQL
+    return connection.vendor in ('sqlite', 'postgresql') and connection.features.can_return_columns_from_insert
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def _returning_counts():
+    return 'RETURNING ' + ', '.join(_qn(f) for f in COUNTER_FIELDS)
+
+
+def fetch_counts(post_id):
+    row = Post.objects.filter(pk=post_id).values_list(*COUNTER_FIELDS).first()
+    return Counts(*row) if row else None
+
+
+def adjust_counter(post_id, field, delta):
+    """Soma ``delta`` ao contador ``field`` e devolve os contadores (None se o post não existe)."""
+    if not _uses_returning():
+        if not Post.objects.filter(pk=post_id).update(**{field: F(field) + delta}):
+            return None
+        return fetch_counts(post_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {_qn(Post._meta.db_table)} SET {_qn(field)} = {_qn(field)} + %s '
+            f'WHERE {_qn("id")} = %s {_returning_counts()}',
+            [delta, post_id],
+        )
+        row = cursor.fetchone()
+    return Counts(*row) if row else None
+
+
+def _notify(post_id, field, delta):
+    """Repassa a variação de um contador ao stream ao vivo e às tendências."""
+    live.publish(post_id, field, delta)
+    trending.record(post_id, field, delta)
+
+
+def _counter_changed(post_id, field, delta):
+    """Efeitos colaterais de uma mudança de contador, depois do commit."""
+    transaction.on_commit(bump_for_engagement)
+    transaction.on_commit(lambda: _notify(post_id, field, delta))
+
+
+def _insert(model, user_id, post_id):
+    """Insere ``model(user, post)`` se o post existir e o par for inédito; True se inseriu."""
+    if not _uses_returning():
+        if not Post.objects.filter(pk=post_id).exists():
+            return False
+        _, created = model.objects.get_or_create(user_id=user_id, post_id=post_id)
+        return created
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {_qn(model._meta.db_table)} ({_qn("user_id")}, {_qn("post_id")}, {_qn("created_at")}) '
+            f'SELECT %s, {_qn("id")}, %s FROM {_qn(Post._meta.db_table)} WHERE {_qn("id")} = %s '
+            f'ON CONFLICT DO NOTHING RETURNING {_qn("id")}',
+            [user_id, now, post_id],
+        )
+        return cursor.fetchone() is not None
+
+
+def _delete(model, user_id, post_id):
+    """Apaga ``model(user, post)``; True se havia linha."""
+    if not _uses_returning():
+        deleted, _ = model.objects.filter(user_id=user_id, post_id=post_id).delete()
+        return bool(deleted)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {_qn(model._meta.db_table)} WHERE {_qn("user_id")} = %s AND {_qn("post_id")} = %s '
+            f'RETURNING {_qn("id")}',
+            [user_id, post_id],
+        )
+        return cursor.fetchone() is not None
+
+
+def _buffered(buffer, kind, user_id, post_id, engaged):
+    """Uma leitura (contadores + linha do usuário) e a intenção fica no buffer."""
+    model, field = KINDS[kind]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {", ".join(_qn(f) for f in COUNTER_FIELDS)}, EXISTS('
+            f'SELECT 1 FROM {_qn(model._meta.db_table)} WHERE {_qn("user_id")} = %s AND {_qn("post_id")} = %s'
+            f') FROM {_qn(Post._meta.db_table)} WHERE {_qn("id")} = %s',
+            [user_id, post_id, post_id],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return Result(False, None)
+    *counts, stored = row
+    stored = bool(stored)
+    changed = buffer.record(kind, user_id, post_id, engaged, stored)
+    if changed:
+        # O contador devolvido já soma o pendente; o stream acompanha a resposta, não o flush
+        _notify(post_id, field, 1 if engaged else -1)
+    counts = Counts(*counts)
+    counts = counts._replace(**{field: getattr(counts, field) + buffer.pending_delta(kind, post_id)})
+    return Result(changed, counts)
+
+
+def engage(kind, user_id, post_id):
+    """Curtida/retweet idempotente de ``user_id`` em ``post_id``."""
+    buffer = get_buffer()
+    if buffer is not None:
+        return _buffered(buffer, kind, user_id, post_id, True)
+    model, field = KINDS[kind]
+    with transaction.atomic():
+        if not _insert(model, user_id, post_id):
+            return Result(False, fetch_counts(post_id))
+        _counter_changed(post_id, field, 1)
+        return Result(True, adjust_counter(post_id, field, 1))
+
+
+def disengage(kind, user_id, post_id):
+    """Desfaz a curtida/retweet de ``user_id`` em ``post_id``."""
+    buffer = get_buffer()
+    if buffer is not None:
+        return _buffered(buffer, kind, user_id, post_id, False)
+    model, field = KINDS[kind]
+    with transaction.atomic():
+        if not _delete(model, user_id, post_id):
+            return Result(False, fetch_counts(post_id))
+        _counter_changed(post_id, field, -1)
+        return Result(True, adjust_counter(post_id, field, -1))
+
+
+def add_comment(author, post_id, content):
+    """Cria o comentário; devolve ``(comment, counts)`` ou ``(None, None)`` se o post não existe."""
+    with transaction.atomic():
+        counts = adjust_counter(post_id, 'comments_count', 1)
+        if counts is None:
+            return None, None
+        comment = Comment.objects.create(author=author, post_id=post_id, content=content)
+        _counter_changed(post_id, 'comments_count', 1)
+    return comment, counts
+
+
+def comment_created(comment):
+    """Contabiliza um comentário salvo fora de ``add_comment`` (chamar na mesma transação)."""
+    adjust_counter(comment.post_id, 'comments_count', 1)
+    _counter_changed(comment.post_id, 'comments_count', 1)
+
+
+def comment_deleted(comment):
+    """Descontabiliza um comentário apagado (chamar na mesma transação)."""
+    adjust_counter(comment.post_id, 'comments_count', -1)
+    _counter_changed(comment.post_id, 'comments_count', -1)
@@ -0,0 +1,147 @@
+"""
+Caminho rápido de leitura para listagens de posts e comentários.
+
+Em vez de instanciar modelos e passar cada objeto pela maquinaria de campos
+do DRF, as listagens buscam ``.values()`` só com as colunas necessárias e
+montam os dicts com um plano de campos calculado uma vez por requisição. A
+saída é idêntica à de ``PostSerializer``/``CommentSerializer``; o plano é
+derivado de ``Meta.fields`` deles, então um campo novo sem entrada aqui
+falha na importação em vez de divergir em silêncio.
+"""
+from django.utils import timezone
+from rest_framework import serializers
+
+from accounts.models import User
+from backend.images import variant_urls
+from .models import Post
+from .serializers import CommentSerializer, PostSerializer
+from .viewer import EMPTY_STATE
+
+POST_COLUMNS = (
+    'id', 'author_id', 'author__username', 'author__profile_picture', 'author__profile_picture_variants',
+    'content', 'image', 'image_variants', 'created_at', 'updated_at', 'likes_count', 'comments_count',
+    'retweets_count',
+)
+COMMENT_COLUMNS = (
+    'id', 'author_id', 'author__username', 'author__profile_picture', 'author__profile_picture_variants',
+    'post_id', 'content', 'created_at',
+)
+
+_image_storage = Post._meta.get_field('image').storage
+_picture_storage = User._meta.get_field('profile_picture').storage
+
+
+def _datetime():
+    # Fuso resolvido uma vez por plano, não a cada valor
+    return serializers.DateTimeField(default_timezone=timezone.get_current_timezone()).to_representation
+
+
+def _picture_url():
+    # Igual a get_author_profile_picture: URL relativa ou None; memorizada por autor
+    urls = {}
+
+    def url(name):
+        if not name:
+            return None
+        if name not in urls:
+            try:
+                urls[name] = _picture_storage.url(name)
+            except Exception:
+                urls[name] = None
+        return urls[name]
+    return url
+
+
+def _image_url(request):
+    # Igual ao ImageField do DRF: URL absoluta quando há request
+    def url(name):
+        if not name:
+            return None
+        value = _image_storage.url(name)
+        return request.build_absolute_uri(value) if request is not None else value
+    return url
+
+
+def _picture_variants(variants):
+    # Como author_profile_picture: URLs relativas
+    return variant_urls(variants, _picture_storage)
+
+
+def _image_variants(request):
+    return lambda variants: variant_urls(variants, _image_storage, request)
+
+
+def _column(name, convert=None):
+    if convert is None:
+        return lambda row: row[name]
+    return lambda row: convert(row[name])
+
+
+def _plan(fields, getters):
+    return [(name, getters[name]) for name in fields]
+
+
+def comment_plan():
+    datetime = _datetime()
+    return _plan(CommentSerializer.Meta.fields, {
+        'id': _column('id'),
+        'author': _column('author_id'),
+        'author_username': _column('author__username'),
+        'author_profile_picture': _column('author__profile_picture', _picture_url()),
+        'author_profile_picture_variants': _column('author__profile_picture_variants', _picture_variants),
+        'post': _column('post_id'),
+        'content': _column('content'),
+        'created_at': _column('created_at', datetime),
+    })
+
+
+def post_plan(request, viewer_state):
+    liked, retweeted = viewer_state.liked, viewer_state.retweeted
+    datetime = _datetime()
+    return _plan(PostSerializer.Meta.fields, {
+        'id': _column('id'),
+        'author': _column('author_id'),
+        'author_username': _column('author__username'),
+        'content': _column('content'),
+        'image': _column('image', _image_url(request)),
+        'image_variants': _column('image_variants', _image_variants(request)),
+        'created_at': _column('created_at', datetime),
+        'updated_at': _column('updated_at', datetime),
+        'likes_count': _column('likes_count'),
+        'comments_count': _column('comments_count'),
+        'retweeted_by_me': lambda row: row['id'] in retweeted,
+        'liked_by_me': lambda row: row['id'] in liked,
+        'retweets_count': _column('retweets_count'),
+        'author_profile_picture': _column('author__profile_picture', _picture_url()),
+        'author_profile_picture_variants': _column('author__profile_picture_variants', _picture_variants),
+    })
+
+
+# Falha cedo se os serializers ganharem campos que o plano não cobre
+post_plan(None, EMPTY_STATE)
+comment_plan()
+
+
+def render_comments(rows):
+    plan = comment_plan()
+    return [{name: get(row) for name, get in plan} for row in rows]
+
+
+def render_posts(rows, request, viewer_state, comments_preview=None):
+    """
+    Dicts no formato de ``PostSerializer`` para ``rows`` (de ``.values(*POST_COLUMNS)``).
+    ``comments_preview`` mapeia post id -> linhas de ``COMMENT_COLUMNS``.
+    """
+    plan = post_plan(request, viewer_state)
+    if comments_preview is None:
+        return [{name: get(row) for name, get in plan} for row in rows]
+    cplan = comment_plan()
+    result = []
+    for row in rows:
+        item = {name: get(row) for name, get in plan}
+        item['comments_preview'] = [
+            {name: get(comment) for name, get in cplan}
+            for comment in comments_preview.get(row['id'], [])
+        ]
+        result.append(item)
+    return result
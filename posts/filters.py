@@ -0,0 +1,21 @@
+from rest_framework.filters import BaseFilterBackend
+
+from .search import get_search_backend, tokenize
+
+
+class PostSearchFilter(BaseFilterBackend):
+    """
+    Filtra por ``?search=`` usando o backend de busca indexado. A ordenação
+    por relevância fica a cargo de ``PostViewSet.list``; aqui só restringimos
+    o queryset (usado quando o cliente pede uma ``ordering`` explícita).
+    """
+    search_param = 'search'
+
+    def get_search_term(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        term = self.get_search_term(request)
+        if not tokenize(term):
+            return queryset
+        return get_search_backend().filter(queryset, term)
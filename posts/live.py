@@ -0,0 +1,249 @@
+"""
+Contadores de engajamento ao vivo por server-sent events (``LIVE_UPDATES_ENABLED``).
+
+O cliente abre ``GET /api/posts/live/?ids=1,2,3`` com os posts visíveis na
+tela e recebe eventos ``counts`` com as variações dos contadores desde o
+evento anterior (``{"12": {"likes_count": 3}}``), para somar aos números que
+já tem. Substitui o polling do detalhe dos posts.
+
+Curtidas, retweets e comentários (``posts/engagement.py``) chamam
+``publish()`` depois do commit. As variações são somadas por post e campo
+num ``Publisher`` por processo e entregues ao broker uma vez por tick
+(``LIVE_TICK_SECONDS``): mil curtidas num post viral viram uma mensagem com
+``+1000``. Do lado de quem assina, o que chega entre dois eventos também é
+somado, então um cliente lento nunca acumula fila, só um dicionário.
+
+O broker é plugável (``LIVE_BROKER``, caminho de uma classe com
+``publish(deltas)``, ``subscribe(post_ids)`` e ``unsubscribe(subscription)``).
+O ``LocalBroker`` padrão só entrega dentro do processo: serve para
+desenvolvimento, testes e um único worker; com vários workers, use um broker
+compartilhado (ex.: pub/sub do Redis) com a mesma interface.
+
+O stream só funciona sob ASGI (``SERVER_MODE=asgi``): sob WSGI cada conexão
+prenderia uma thread, então a view responde 501. Cada conexão dura até
+``LIVE_STREAM_SECONDS`` e termina; o ``EventSource`` reconecta sozinho, o que
+redistribui as conexões entre workers e não segura um deploy.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import Http404, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from backend.aio import json_response
+
+logger = logging.getLogger(__name__)
+
+
+def nonzero(deltas):
+    """``deltas`` sem as variações que se anularam (curtiu e descurtiu no mesmo tick)."""
+    deltas = {post_id: {field: delta for field, delta in fields.items() if delta} for post_id, fields in deltas.items()}
+    return {post_id: fields for post_id, fields in deltas.items() if fields}
+
+
+class Subscription:
+    """
+    Um cliente do stream: variações de ``post_ids`` acumuladas até o próximo
+    ``get()``. ``deliver()`` pode ser chamado de qualquer thread.
+    """
+
+    def __init__(self, broker, post_ids, loop):
+        self.broker = broker
+        self.post_ids = frozenset(post_ids)
+        self._loop = loop
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def deliver(self, deltas):
+        try:
+            self._loop.call_soon_threadsafe(self._merge, deltas)
+        except RuntimeError:
+            pass  # Loop já encerrado: o cliente foi embora
+
+    def _merge(self, deltas):
+        for post_id, fields in deltas.items():
+            pending = self._pending.setdefault(post_id, {})
+            for field, delta in fields.items():
+                pending[field] = pending.get(field, 0) + delta
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        """Variações acumuladas (sem as que se anularam); ``{}`` se nada chegou em ``timeout``."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self._ready.clear()
+        batch, self._pending = self._pending, {}
+        return nonzero(batch)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Broker em memória: entrega só às assinaturas deste processo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # post_id -> assinaturas interessadas
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, post_ids):
+        subscription = Subscription(self, post_ids, asyncio.get_running_loop())
+        with self._lock:
+            for post_id in subscription.post_ids:
+                self._subscribers[post_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for post_id in subscription.post_ids:
+                subscribers = self._subscribers.get(post_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[post_id]
+
+    def publish(self, deltas):
+        """``deltas``: ``{post_id: {campo: variação}}``; cada assinatura recebe só os seus posts."""
+        targets = defaultdict(dict)
+        with self._lock:
+            for post_id, fields in deltas.items():
+                for subscription in self._subscribers.get(post_id, ()):
+                    targets[subscription][post_id] = fields
+        for subscription, part in targets.items():
+            subscription.deliver(part)
+
+
+class Publisher:
+    """
+    Soma as variações do processo e as entrega a ``broker.publish()`` a cada
+    ``interval`` segundos (0: na hora). Também serve a outros destinos com
+    ``publish(deltas)``, como a gravação das tendências.
+    """
+
+    def __init__(self, broker, interval):
+        self.broker = broker
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: defaultdict(int))
+        self._thread = None
+
+    def add(self, post_id, field, delta):
+        with self._lock:
+            self._pending[post_id][field] += delta
+        if not self.interval:
+            self.flush()
+        else:
+            self._ensure_thread()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        batch = nonzero(batch)
+        if batch:
+            self.broker.publish(batch)
+        return len(batch)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-publisher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Falha ao entregar as variações de %s.', type(self.broker).__name__)
+            finally:
+                close_old_connections()
+
+
+_broker = None
+_publisher = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.LIVE_BROKER)()
+    return _broker
+
+
+def get_publisher():
+    """O publisher do processo, ou None se desligado."""
+    global _publisher
+    if not settings.LIVE_UPDATES_ENABLED:
+        return None
+    if _publisher is None:
+        _publisher = Publisher(get_broker(), settings.LIVE_TICK_SECONDS)
+    return _publisher
+
+
+def publish(post_id, field, delta):
+    """Registra a variação de um contador (chamar depois do commit)."""
+    publisher = get_publisher()
+    if publisher is not None:
+        publisher.add(post_id, field, delta)
+
+
+def parse_ids(raw):
+    """ids de ``?ids=1,2,3`` (sem repetição, na ordem), ou None se inválidos."""
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw.split(',') if part.strip()))
+    except ValueError:
+        return None
+    if not ids or len(ids) > settings.LIVE_MAX_POSTS:
+        return None
+    return ids
+
+
+def event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+async def events(post_ids):
+    """Eventos SSE para ``post_ids``: no máximo um ``counts`` por tick, com comentários de heartbeat."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.LIVE_STREAM_SECONDS
+    # Assina só quando o stream começa: o finally sempre desfaz a assinatura
+    subscription = get_broker().subscribe(post_ids)
+    try:
+        yield 'retry: 3000\n\n'
+        while loop.time() < deadline:
+            batch = await subscription.get(timeout=min(settings.LIVE_HEARTBEAT_SECONDS, deadline - loop.time()))
+            # Comentário SSE: mantém proxies e balanceadores com a conexão aberta
+            yield event('counts', {str(post_id): fields for post_id, fields in batch.items()}) if batch else ': ping\n\n'
+            if settings.LIVE_TICK_SECONDS:
+                await asyncio.sleep(settings.LIVE_TICK_SECONDS)
+    finally:
+        subscription.close()
+
+
+async def stream(request):
+    if not settings.LIVE_UPDATES_ENABLED:
+        raise Http404()
+    if not isinstance(request, ASGIRequest):
+        return json_response({'detail': 'Atualizações ao vivo exigem o servidor ASGI (SERVER_MODE=asgi).'}, status=501)
+    post_ids = parse_ids(request.GET.get('ids', ''))
+    if post_ids is None:
+        return json_response({'ids': [f'Informe de 1 a {settings.LIVE_MAX_POSTS} ids separados por vírgula.']},
+                             status=400)
+    response = StreamingHttpResponse(events(post_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx: não segurar os eventos no buffer do proxy
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,117 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from accounts.models import User
+from backend.bench import scratch_database, summarize
+from backend.dataset import seed
+from posts.models import Post
+from .seed_dataset import add_dataset_arguments, dataset_options
+
+HEADERS = {'Accept': 'application/json'}
+
+
+class Command(BaseCommand):
+    help = ('Vazão com muitas requisições simultâneas nas rotas de leitura: views síncronas (WSGI, '
+            'um pool de threads) x variantes async (ASGI, um event loop), num banco descartável em disco.')
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--requests', type=int, default=400, help='Requisições por endpoint e modo.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--output', help='Grava o relatório neste arquivo além de imprimi-lo.')
+
+    def handle(self, *args, **options):
+        # Cache de respostas desligado para medir o caminho até o banco; o AsyncClient
+        # sempre manda Host: testserver, então o liberamos como o test runner faz
+        overrides = override_settings(POSTS_CACHE_ENABLED=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+        with scratch_database(on_disk=True), overrides:
+            report = {'dataset': seed(**dataset_options(options)), 'concurrency': options['concurrency']}
+            urls = self.urls()
+            viewer = self.viewer()
+            report['sync'] = self.run_sync(urls, viewer, options['requests'], options['concurrency'])
+            with override_settings(ROOT_URLCONF='backend.async_urls', ASYNC_PARALLEL_QUERIES=True):
+                report['async'] = asyncio.run(self.run_async(urls, viewer, options['requests'], options['concurrency']))
+            connections.close_all()
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+
+    def viewer(self):
+        following = sorted(User.objects.values_list('following_count', 'id'))
+        return User.objects.get(pk=following[len(following) // 2][1])
+
+    def urls(self):
+        posts = list(Post.objects.order_by('-likes_count').values_list('id', flat=True)[:20])
+        return {
+            'feed': ['/api/posts/posts/feed/'],
+            'post_detail': [f'/api/posts/posts/{pk}/' for pk in posts],
+            'post_comments': [f'/api/posts/posts/{pk}/comments/' for pk in posts],
+            'users_list': ['/api/auth/users/'],
+        }
+
+    @staticmethod
+    def result(samples, elapsed):
+        result = summarize(samples)
+        result['requests_per_s'] = round(len(samples) / elapsed, 1)
+        return result
+
+    @staticmethod
+    def ensure_ok(response, url):
+        if response.status_code >= 400:
+            raise CommandError(f'{url}: HTTP {response.status_code}')
+
+    def run_sync(self, urls, viewer, total, concurrency):
+        local = threading.local()
+
+        def client():
+            # Um client (e uma conexão) por thread, como num worker gthread
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(viewer)
+            return local.client
+
+        def fetch(url):
+            start = time.perf_counter()
+            self.ensure_ok(client().get(url, headers=HEADERS), url)
+            return (time.perf_counter() - start) * 1000
+
+        report = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for name, paths in urls.items():
+                list(pool.map(fetch, paths * 2))  # aquecimento
+                start = time.perf_counter()
+                samples = list(pool.map(fetch, itertools.islice(itertools.cycle(paths), total)))
+                report[name] = self.result(samples, time.perf_counter() - start)
+            for _ in range(concurrency):
+                pool.submit(connections.close_all)
+        return report
+
+    async def run_async(self, urls, viewer, total, concurrency):
+        client = AsyncClient()
+        await client.aforce_login(viewer)
+        limit = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with limit:
+                start = time.perf_counter()
+                self.ensure_ok(await client.get(url, headers=HEADERS), url)
+                return (time.perf_counter() - start) * 1000
+
+        report = {}
+        for name, paths in urls.items():
+            await asyncio.gather(*(fetch(url) for url in paths * 2))
+            start = time.perf_counter()
+            samples = await asyncio.gather(*(fetch(url) for url in itertools.islice(itertools.cycle(paths), total)))
+            report[name] = self.result(samples, time.perf_counter() - start)
+        return report
@@ -0,0 +1,72 @@
+import itertools
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import Follow, User
+from backend.bench import measure, scratch_database
+from backend.dataset import WORDS, seed
+from posts.models import Post
+from .seed_dataset import add_dataset_arguments, dataset_options
+
+
+class Command(BaseCommand):
+    help = ('Semeia um dataset sintético num banco descartável e mede os principais endpoints pelo '
+            'test client: p50/p95 e consultas SQL por endpoint, em JSON (para comparar entre commits).')
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--with-cache', action='store_true', help='Mantém o cache de respostas ligado.')
+        parser.add_argument('--output', help='Grava o relatório neste arquivo além de imprimi-lo.')
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(POSTS_CACHE_ENABLED=options['with_cache']):
+            report = {'dataset': seed(**dataset_options(options)), 'endpoints': self.run(options['repeat'])}
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+
+    def run(self, repeat):
+        # Leitor típico: quem segue perto da mediana de perfis
+        following = sorted(User.objects.values_list('following_count', 'id'))
+        _, viewer_id = following[len(following) // 2]
+        viewer = User.objects.get(pk=viewer_id)
+        celebrity = User.objects.order_by('-followers_count').first()
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(viewer)
+
+        # Alvos inéditos para as escritas, uma por execução enquanto houver; depois repetem
+        # (curtir ou seguir de novo responde 200 sem gravar nada)
+        post_ids = list(Post.objects.exclude(likes__user=viewer).values_list('id', flat=True)[:repeat + 5])
+        followed = Follow.objects.filter(follower=viewer).values('following_id')
+        target_ids = list(User.objects.exclude(pk=viewer.pk).exclude(pk__in=followed)
+                          .values_list('id', flat=True)[:repeat + 5])
+        if not post_ids or not target_ids:
+            raise CommandError('Dataset pequeno demais: sem posts para curtir ou perfis para seguir.')
+        posts, targets = itertools.cycle(post_ids), itertools.cycle(target_ids)
+
+        def get(url):
+            return lambda: check(client.get(url, HTTP_ACCEPT='application/json'))
+
+        def check(response):
+            if response.status_code >= 400:
+                raise CommandError(f'{response.request["PATH_INFO"]}: HTTP {response.status_code}')
+            return response
+
+        endpoints = {
+            'feed': get('/api/posts/posts/feed/'),
+            'posts_list': get('/api/posts/posts/'),
+            'posts_ordering_likes': get('/api/posts/posts/?ordering=-likes_count'),
+            'posts_search': get(f'/api/posts/posts/?search={WORDS[0]}'),
+            'post_comments': get(f'/api/posts/posts/{Post.objects.order_by("-comments_count").first().pk}/comments/'),
+            'like': lambda: check(client.post(f'/api/posts/posts/{next(posts)}/like/')),
+            'follow': lambda: check(client.post(f'/api/auth/follow/{next(targets)}/')),
+            'users_list': get('/api/auth/users/'),
+            'followers': get(f'/api/auth/{celebrity.pk}/followers/'),
+        }
+        return {name: measure(fn, repeat) for name, fn in endpoints.items()}
@@ -0,0 +1,77 @@
+import io
+import json
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from backend import images
+from backend.bench import scratch_database, summarize
+from posts.models import Post
+
+
+def make_photo(name, size):
+    """JPEG com ruído (comprime como uma foto de verdade) e EXIF."""
+    image = Image.frombytes('RGB', (size[0] // 4, size[1] // 4), random.randbytes(size[0] * size[1] * 3 // 16))
+    image = image.resize(size, Image.Resampling.BILINEAR)
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90, exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class Command(BaseCommand):
+    help = ('Latência do upload com as variantes geradas na requisição e no pool, e bytes de imagem '
+            'por página do feed (originais x miniaturas WebP), num banco descartável.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=20)
+        parser.add_argument('--workers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        media = tempfile.mkdtemp(prefix='bench-media-')
+        report = {'uploads': options['uploads']}
+        try:
+            with scratch_database(on_disk=True), override_settings(MEDIA_ROOT=media, POSTS_CACHE_ENABLED=False):
+                user = User.objects.create(email='autor@example.com', username='autor')
+                client = APIClient(SERVER_NAME='localhost')
+                client.force_authenticate(user)
+                for mode, workers in (('inline', 0), ('pool', options['workers'])):
+                    with override_settings(IMAGE_WORKERS=workers):
+                        images._executor = None
+                        report[mode] = self.upload(client, options['uploads'])
+                        if images._executor is not None:
+                            images._executor.shutdown(wait=True)
+                            images._executor = None
+                report['feed_page'] = self.page_bytes(client)
+        finally:
+            shutil.rmtree(media, ignore_errors=True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def upload(self, client, count):
+        samples = []
+        for i in range(count):
+            photo = make_photo(f'bench{i}.jpg', size=(3000, 2250))
+            start = time.perf_counter()
+            response = client.post('/api/posts/posts/', {'content': f'foto {i}', 'image': photo})
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 201, response.content
+        return summarize(samples)
+
+    def page_bytes(self, client):
+        results = client.get('/api/posts/posts/').json()['results']
+        posts = Post.objects.in_bulk([post['id'] for post in results])
+        original = thumb = 0
+        for post in posts.values():
+            storage = post.image.storage
+            original += storage.size(post.image.name)
+            thumb += storage.size(post.image_variants['thumb']['webp'])
+        return {'posts': len(posts), 'original_bytes': original, 'thumb_webp_bytes': thumb}
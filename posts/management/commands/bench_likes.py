@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+from django.test import override_settings
+
+from accounts.models import User
+from backend.bench import scratch_database
+from posts import buffer as engagement_buffer
+from posts import engagement
+from posts.models import Like, Post
+
+
+class Command(BaseCommand):
+    help = 'Carga de curtidas num post "viral", com e sem o buffer write-behind, num banco descartável.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--hot-posts', type=int, default=1, help='Posts entre os quais as curtidas se dividem.')
+        parser.add_argument('--max-pending', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        report = {'users': options['users'], 'threads': options['threads'], 'hot_posts': options['hot_posts']}
+        with scratch_database(on_disk=True):
+            author = User.objects.create(email='autor@example.com', username='autor')
+            user_ids = [
+                user.pk for user in User.objects.bulk_create([
+                    User(email=f'bench{i}@example.com', username=f'bench{i}') for i in range(options['users'])
+                ])
+            ]
+            for mode, enabled in (('direct', False), ('buffered', True)):
+                posts = Post.objects.bulk_create([Post(author=author, content=mode) for _ in range(options['hot_posts'])])
+                with override_settings(ENGAGEMENT_BUFFER_ENABLED=enabled, ENGAGEMENT_BUFFER_FLUSH_INTERVAL=0.5,
+                                       ENGAGEMENT_BUFFER_MAX_PENDING=options['max_pending']):
+                    engagement_buffer._buffer = None
+                    report[mode] = self.run(user_ids, [post.pk for post in posts], options['threads'])
+                    engagement_buffer._buffer = None
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, user_ids, post_ids, threads):
+        errors = []
+        lock = threading.Lock()
+
+        def like(i):
+            try:
+                engagement.engage('like', user_ids[i], post_ids[i % len(post_ids)])
+            except OperationalError as exc:
+                with lock:
+                    errors.append(str(exc))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(like, range(len(user_ids))))
+        accepted = time.perf_counter() - start
+        buffer = engagement_buffer.get_buffer()
+        if buffer is not None:
+            buffer.flush()
+        total = time.perf_counter() - start
+
+        stored = Like.objects.filter(post_id__in=post_ids).count()
+        counted = sum(Post.objects.filter(pk__in=post_ids).values_list('likes_count', flat=True))
+        return {
+            'likes_per_sec': round(len(user_ids) / total, 1),
+            'accept_ms_p_like': round(accepted * 1000 / len(user_ids), 3),
+            'total_s': round(total, 3),
+            'errors': len(errors),
+            'likes_stored': stored,
+            'likes_count': counted,
+        }
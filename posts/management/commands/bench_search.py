@@ -0,0 +1,77 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts.models import User
+from backend.bench import measure, scratch_database
+from posts.models import Post
+from posts.search import ContainsSearchBackend, get_search_backend
+
+WORDS = (
+    'hoje amanhã feliz triste café código python django banco dados rede social '
+    'praia sol chuva futebol música filme livro viagem trabalho festa amigo cidade '
+    'noite manhã tarde semana projeto deploy servidor cliente api teste bug'
+).split()
+SYLLABLES = 'ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo fu la le li lo lu ma me mi mo mu'.split()
+
+
+def vocabulary(size):
+    """Palavras reais seguidas de uma cauda longa sintética, com pesos de Zipf."""
+    words = list(WORDS)
+    for a in SYLLABLES:
+        for b in SYLLABLES:
+            for c in SYLLABLES:
+                words.append(a + b + c)
+                if len(words) >= size:
+                    return words, [1 / (rank + 1) for rank in range(size)]
+    return words, [1 / (rank + 1) for rank in range(len(words))]
+
+
+class Command(BaseCommand):
+    help = 'Compara a busca indexada de posts com o filtro icontains original, num banco descartável.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--terms', nargs='*', help='Padrão: uma palavra comum, uma média, uma rara, duas palavras e uma inexistente.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        limit = options['page_size'] + 1
+        words, weights = vocabulary(options['vocabulary'])
+        terms = options['terms'] or [
+            words[0], words[100], words[len(words) // 2], f'{words[1]} {words[2]}', 'inexistente',
+        ]
+        with scratch_database():
+            users = User.objects.bulk_create([
+                User(email=f'bench{i}@example.com', username=f'bench{i}', first_name='B', last_name=str(i))
+                for i in range(200)
+            ])
+            Post.objects.bulk_create(
+                [
+                    Post(author=rng.choice(users), content=' '.join(rng.choices(words, weights, k=rng.randint(4, 30))))
+                    for _ in range(options['posts'])
+                ],
+                batch_size=2000,
+            )
+
+            backend = get_search_backend()
+            report = {'posts': options['posts'], 'backend': type(backend).__name__, 'terms': {}}
+            for term in terms:
+                def search_filter():
+                    condition = Q()
+                    for token in term.split():
+                        condition &= Q(content__icontains=token) | Q(author__username__icontains=token)
+                    return list(Post.objects.filter(condition).order_by('-created_at')[:limit])
+
+                report['terms'][term] = {
+                    'search_filter': measure(search_filter, options['repeat']),
+                    'contains_backend': measure(lambda: ContainsSearchBackend().ranked(term, None, False, limit), options['repeat']),
+                    'indexed': measure(lambda: backend.ranked(term, None, False, limit), options['repeat']),
+                }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import User
+from backend.bench import measure, scratch_database
+from backend.renderers import FastJSONRenderer
+from posts.fastpath import POST_COLUMNS, render_posts
+from posts.models import Post
+from posts.serializers import PostSerializer
+from posts.viewer import resolve_viewer_state
+
+
+class Command(BaseCommand):
+    help = 'Compara PostSerializer + JSONRenderer com o caminho rápido (.values() + FastJSONRenderer), num banco descartável.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            users = User.objects.bulk_create([
+                User(email=f'bench{i}@example.com', username=f'bench{i}', first_name='B', last_name=str(i),
+                     profile_picture=f'profile_pics/bench{i}.png' if i % 2 else '')
+                for i in range(50)
+            ])
+            Post.objects.bulk_create(
+                [
+                    Post(author=users[i % len(users)], content=f'Post de benchmark nº {i} — olá, mundo!',
+                         image=f'post_images/bench{i}.jpg' if i % 3 == 0 else '', likes_count=i % 17)
+                    for i in range(options['posts'])
+                ],
+                batch_size=1000,
+            )
+            request = APIRequestFactory().get('/api/posts/posts/', SERVER_NAME='localhost')
+            request.user = users[0]
+            queryset = Post.objects.select_related('author').order_by('-created_at', '-id')
+
+            def serializer_path():
+                posts = list(queryset)
+                data = PostSerializer(posts, many=True, context={'request': request}).data
+                return JSONRenderer().render(data)
+
+            def fast_path():
+                rows = list(queryset.values(*POST_COLUMNS))
+                state = resolve_viewer_state(request.user, [row['id'] for row in rows])
+                return FastJSONRenderer().render(render_posts(rows, request, state))
+
+            if serializer_path() != fast_path():
+                raise CommandError('Os dois caminhos produziram JSON diferente.')
+
+            report = {
+                'posts': options['posts'],
+                'serializer': measure(serializer_path, options['repeat']),
+                'fast_path': measure(fast_path, options['repeat']),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
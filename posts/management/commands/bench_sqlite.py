@@ -0,0 +1,102 @@
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from backend.bench import scratch_database, summarize
+from backend.dataset import WORDS, seed
+from posts.models import Post
+from .seed_dataset import add_dataset_arguments, dataset_options
+
+
+class Command(BaseCommand):
+    help = ('Tráfego misto (feed, curtidas e posts novos) de várias threads num SQLite em disco, com os '
+            'PRAGMAs padrão e com o modo SQLITE_TUNED: vazão, p50/p95 por tipo e erros "database is locked".')
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.set_defaults(users=300, posts_per_user=5)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=60, help='Requisições por thread.')
+        parser.add_argument('--write-ratio', type=float, default=0.3,
+                            help='Fração de escritas (metade curtidas, metade posts novos).')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Só se aplica ao SQLite.')
+        original = connection.settings_dict.get('OPTIONS', {})
+        report = {'threads': options['threads'], 'requests_per_thread': options['requests'],
+                  'write_ratio': options['write_ratio']}
+        try:
+            for mode, db_options in (('default', {}), ('tuned', settings.SQLITE_TUNED_OPTIONS)):
+                # Conexões novas (inclusive as das threads) leem OPTIONS deste dict
+                connection.close()
+                connection.settings_dict['OPTIONS'] = dict(db_options)
+                with scratch_database(on_disk=True), \
+                        override_settings(POSTS_CACHE_ENABLED=False, ENGAGEMENT_BUFFER_ENABLED=False):
+                    seed(**dataset_options(options))
+                    report[mode] = self.run(options['threads'], options['requests'], options['write_ratio'])
+        finally:
+            connection.close()
+            connection.settings_dict['OPTIONS'] = original
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, threads, requests, write_ratio):
+        user_ids = list(User.objects.order_by('?').values_list('id', flat=True)[:threads])
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        samples = defaultdict(list)
+        errors = Counter()
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(user_ids))
+
+        def worker(user_id, seed):
+            rng = random.Random(seed)
+            client = APIClient(SERVER_NAME='localhost')
+            client.force_authenticate(User.objects.get(pk=user_id))
+            barrier.wait()
+            try:
+                for _ in range(requests):
+                    roll = rng.random()
+                    if roll >= write_ratio:
+                        kind, call = 'feed', lambda: client.get('/api/posts/posts/feed/', HTTP_ACCEPT='application/json')
+                    elif roll < write_ratio / 2:
+                        post_id = rng.choice(post_ids)
+                        kind, call = 'like', lambda: client.post(f'/api/posts/posts/{post_id}/like/')
+                    else:
+                        content = ' '.join(rng.choice(WORDS) for _ in range(8))
+                        kind, call = 'post', lambda: client.post('/api/posts/posts/', {'content': content})
+                    start = time.perf_counter()
+                    try:
+                        response = call()
+                        failed = 'http_5xx' if response.status_code >= 500 else None
+                    except OperationalError as exc:
+                        failed = 'locked' if 'locked' in str(exc) else 'operational'
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        if failed:
+                            errors[failed] += 1
+                        else:
+                            samples[kind].append(elapsed)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker, args=(user_id, i)) for i, user_id in enumerate(user_ids)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        result = {kind: summarize(values) for kind, values in sorted(samples.items())}
+        result['ok_per_s'] = round(sum(len(values) for values in samples.values()) / elapsed, 1)
+        result['errors'] = dict(errors)
+        return result
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Compactação periódica das tendências (rodar pelo cron, ex.: a cada 15 minutos): apaga os posts sem '
+            'engajamento em TRENDING_WINDOW_HOURS ou com pontuação decaída abaixo de TRENDING_MIN_SCORE. '
+            '--rebuild recalcula tudo a partir das curtidas, retweets e comentários da janela.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Depois de mudar TRENDING_HALF_LIFE_HOURS/TRENDING_WEIGHTS ou ao ativar as tendências.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write(f'Pontuações recalculadas para {trending.rebuild()} posts.')
+        removed = trending.compact()
+        self.stdout.write(self.style.SUCCESS(f'{removed} posts frios removidos das tendências.'))
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import Follow
+from posts.models import Post, TimelineEntry
+from posts.timeline import POST_FIELDS, high_fanout_authors
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as timelines materializadas a partir de Follow e Post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        author_ids = list(Post.objects.order_by().values_list('author_id', flat=True).distinct())
+        pulled = high_fanout_authors(author_ids)
+        total = 0
+
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+            for author_id in author_ids:
+                recent = list(
+                    Post.objects.filter(author_id=author_id)
+                    .order_by(*POST_FIELDS)
+                    .values_list('id', 'created_at')[:settings.TIMELINE_BACKFILL_SIZE]
+                )
+                readers = [author_id]
+                if author_id not in pulled:
+                    readers += Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+                entries = [
+                    TimelineEntry(user_id=user_id, post_id=post_id, author_id=author_id, created_at=created_at)
+                    for user_id in readers
+                    for post_id, created_at in recent
+                ]
+                TimelineEntry.objects.bulk_create(entries, batch_size=batch_size, ignore_conflicts=True)
+                total += len(entries)
+
+        self.stdout.write(self.style.SUCCESS(f'Timelines reconstruídas: {total} entradas.'))
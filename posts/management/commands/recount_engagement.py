@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Recalcula em lote os contadores de curtidas, comentários e retweets dos posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_ids', nargs='*', type=int, help='Restringe a estes posts (padrão: todos).')
+
+    def handle(self, *args, **options):
+        updated = recount(options['post_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Contadores recalculados para {updated} posts.'))
@@ -0,0 +1,45 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from backend.dataset import PASSWORD, seed
+
+
+def add_dataset_arguments(parser):
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts-per-user', type=float, default=10)
+    parser.add_argument('--follows-per-user', type=float, default=30)
+    parser.add_argument('--likes-per-post', type=float, default=5)
+    parser.add_argument('--retweets-per-post', type=float, default=1)
+    parser.add_argument('--comments-per-post', type=float, default=2)
+    parser.add_argument('--alpha', type=float, default=1.1, help='Expoente da lei de potência dos follows.')
+    parser.add_argument('--days', type=int, default=30, help='Janela (em dias) em que as datas de criação se espalham.')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do gerador (mesmo valor, mesmo dataset).')
+
+
+def dataset_options(options):
+    return {
+        name: options[name]
+        for name in ('users', 'posts_per_user', 'follows_per_user', 'likes_per_post', 'retweets_per_post',
+                     'comments_per_post', 'alpha', 'days', 'seed')
+    }
+
+
+class Command(BaseCommand):
+    help = 'Popula o banco atual com usuários, follows (lei de potência), posts e engajamento sintéticos.'
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--prefix', default='seed', help='Prefixo de username/email dos usuários criados.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Já existem usuários com o prefixo "{prefix}"; use outro --prefix.')
+        start = time.perf_counter()
+        counts = seed(prefix=prefix, **dataset_options(options))
+        counts['seconds'] = round(time.perf_counter() - start, 1)
+        self.stdout.write(json.dumps(counts, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Login: {prefix}0@example.com / {PASSWORD}'))
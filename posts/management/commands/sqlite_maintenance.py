@@ -0,0 +1,45 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+class Command(BaseCommand):
+    help = ('Manutenção periódica do SQLite (rodar pelo cron, ex.: de hora em hora): checkpoint do WAL, '
+            'PRAGMA optimize e compactação do índice FTS5 de posts. --vacuum reescreve o arquivo inteiro '
+            '(bloqueia escritas; deixe para janelas de manutenção).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkpoint', choices=CHECKPOINT_MODES, default='TRUNCATE',
+                            help='TRUNCATE (padrão) devolve o espaço do -wal; PASSIVE não espera leitores.')
+        parser.add_argument('--vacuum', action='store_true')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Só se aplica ao SQLite.')
+        wal = f'{connection.settings_dict["NAME"]}-wal'
+
+        with connection.cursor() as cursor:
+            journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+            if journal_mode == 'wal':
+                before = os.path.getsize(wal) if os.path.exists(wal) else 0
+                busy, frames, checkpointed = cursor.execute(f'PRAGMA wal_checkpoint({options["checkpoint"]})').fetchone()
+                after = os.path.getsize(wal) if os.path.exists(wal) else 0
+                self.stdout.write(f'Checkpoint {options["checkpoint"]}: {checkpointed}/{frames} páginas, '
+                                  f'-wal {before} -> {after} bytes' + (' (leitores ativos, incompleto)' if busy else '') + '.')
+            else:
+                self.stdout.write(f'journal_mode={journal_mode}: sem WAL para checkpoint (SQLITE_TUNED desligado?).')
+
+            if 'posts_post_fts' in connection.introspection.table_names(cursor):
+                # Junta os segmentos do índice, que crescem a cada post novo
+                cursor.execute("INSERT INTO posts_post_fts (posts_post_fts) VALUES ('optimize')")
+                self.stdout.write('Índice FTS5 de posts compactado.')
+            if options['vacuum']:
+                cursor.execute('VACUUM')
+                self.stdout.write('VACUUM concluído.')
+            # Atualiza estatísticas só das tabelas que precisam (barato o bastante para rodar sempre)
+            cursor.execute('PRAGMA optimize')
+
+        self.stdout.write(self.style.SUCCESS('Manutenção concluída.'))
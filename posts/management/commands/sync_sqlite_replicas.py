@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Copia o banco SQLite primário sobre cada réplica de DB_REPLICAS (API de backup do SQLite), '
+            'fazendo o papel da replicação em desenvolvimento. Rode de novo para simular o atraso da réplica.')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Nenhuma réplica configurada (DB_REPLICAS).')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Só se aplica ao SQLite; no PostgreSQL use a replicação do próprio banco.')
+
+        source = sqlite3.connect(primary.settings_dict['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                connections[alias].close()
+                target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f'{alias}: {connections[alias].settings_dict["NAME"]} atualizada.'))
+        finally:
+            source.close()
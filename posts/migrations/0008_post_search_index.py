@@ -0,0 +1,95 @@
+from django.db import migrations
+
+# Índice de busca textual dos posts, mantido por triggers no próprio banco.
+# SQLite: tabela FTS5 (rowid = id do post). PostgreSQL: coluna tsvector + GIN.
+
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        content, username, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER posts_post_fts_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts (rowid, content, username)
+        VALUES (new.id, new.content, (SELECT username FROM accounts_user WHERE id = new.author_id));
+    END""",
+    """CREATE TRIGGER posts_post_fts_au AFTER UPDATE OF content, author_id ON posts_post BEGIN
+        UPDATE posts_post_fts
+        SET content = new.content,
+            username = (SELECT username FROM accounts_user WHERE id = new.author_id)
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER posts_post_fts_ad AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_post_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER accounts_user_fts_au AFTER UPDATE OF username ON accounts_user BEGIN
+        UPDATE posts_post_fts SET username = new.username
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = new.id);
+    END""",
+    """INSERT INTO posts_post_fts (rowid, content, username)
+        SELECT p.id, p.content, u.username FROM posts_post p JOIN accounts_user u ON u.id = p.author_id""",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS accounts_user_fts_au',
+    'DROP TRIGGER IF EXISTS posts_post_fts_ad',
+    'DROP TRIGGER IF EXISTS posts_post_fts_au',
+    'DROP TRIGGER IF EXISTS posts_post_fts_ai',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+POSTGRES_FORWARD = [
+    'ALTER TABLE posts_post ADD COLUMN search_vector tsvector',
+    'CREATE INDEX posts_post_search_gin ON posts_post USING gin (search_vector)',
+    """CREATE FUNCTION posts_post_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.content, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT username FROM accounts_user WHERE id = NEW.author_id), '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER posts_post_search_vector_trg
+        BEFORE INSERT OR UPDATE OF content, author_id ON posts_post
+        FOR EACH ROW EXECUTE FUNCTION posts_post_search_vector()""",
+    """CREATE FUNCTION accounts_user_search_vector() RETURNS trigger AS $$
+    BEGIN
+        UPDATE posts_post SET content = content WHERE author_id = NEW.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER accounts_user_search_vector_trg
+        AFTER UPDATE OF username ON accounts_user
+        FOR EACH ROW EXECUTE FUNCTION accounts_user_search_vector()""",
+    'UPDATE posts_post SET content = content',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP TRIGGER IF EXISTS accounts_user_search_vector_trg ON accounts_user',
+    'DROP FUNCTION IF EXISTS accounts_user_search_vector()',
+    'DROP TRIGGER IF EXISTS posts_post_search_vector_trg ON posts_post',
+    'DROP FUNCTION IF EXISTS posts_post_search_vector()',
+    'DROP INDEX IF EXISTS posts_post_search_gin',
+    'ALTER TABLE posts_post DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_follow_counters'),
+        ('posts', '0007_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
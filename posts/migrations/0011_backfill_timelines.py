@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import migrations
+
+POST_FIELDS = ['-created_at', '-id']
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+    Preenche as timelines a partir de Follow e Post, como ``rebuild_timelines``:
+    o feed só lê ``TimelineEntry``, e sem isso ficaria vazio para quem já existia.
+    Idempotente (``ignore_conflicts``): completa o que faltar sem apagar nada.
+    """
+    Follow = apps.get_model('accounts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    User = apps.get_model('accounts', 'User')
+
+    author_ids = list(Post.objects.order_by().values_list('author_id', flat=True).distinct())
+    # Autores muito seguidos são mesclados na leitura (posts/timeline.py)
+    pulled = set(
+        User.objects.filter(id__in=author_ids, followers_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+        .values_list('id', flat=True)
+    )
+    for author_id in author_ids:
+        recent = list(
+            Post.objects.filter(author_id=author_id)
+            .order_by(*POST_FIELDS)
+            .values_list('id', 'created_at')[:settings.TIMELINE_BACKFILL_SIZE]
+        )
+        readers = [author_id]
+        if author_id not in pulled:
+            readers += Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+        entries = [
+            TimelineEntry(user_id=user_id, post_id=post_id, author_id=author_id, created_at=created_at)
+            for user_id in readers
+            for post_id, created_at in recent
+        ]
+        TimelineEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_follow_counters'),
+        ('posts', '0010_trendingpost'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -5,11 +5,22 @@ class Post(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     content = models.CharField(max_length=280)
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Nomes das variantes geradas por backend.images ({'thumb': {'webp': ..., 'jpeg': ...}});
+    # nulo até o processamento terminar
+    image_variants = models.JSONField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Contadores desnormalizados, mantidos pelas ações de engajamento
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    retweets_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset da paginação: (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.author.username}: {self.content[:50]}..."
@@ -56,4 +67,45 @@ class Comment(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"Comentario de {self.author.username} no Post {self.post_id}"
\ No newline at end of file
+        return f"Comentario de {self.author.username} no Post {self.post_id}"
+
+class TimelineEntry(models.Model):
+    """Linha da timeline materializada de um usuário (fan-out na escrita)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey('Post', on_delete=models.CASCADE, related_name='timeline_entries')
+    # Desnormalizados do post: ordenação e poda por autor sem JOIN
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_user_timeline_post'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_created_idx'),
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"Timeline de {self.user_id}: Post {self.post_id}"
+
+
+class TrendingPost(models.Model):
+    """
+    Pontuação de tendência de um post com decaimento no tempo (``posts/trending.py``).
+
+    ``score`` é log2 da soma dos pesos dos engajamentos, cada um multiplicado
+    por 2^(idade em meias-vidas desde uma época fixa): ordenar pela coluna é
+    ordenar pela pontuação decaída de agora, sem recalcular nada.
+    """
+    post = models.OneToOneField('Post', on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField()
+    last_event_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id}: {self.score:.2f}"
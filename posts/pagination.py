@@ -0,0 +1,183 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def rows_by_pk(queryset, pks):
+    """Como ``in_bulk()``, mas também aceita querysets de ``.values()`` (linhas dict com 'id')."""
+    rows = queryset.order_by().filter(pk__in=pks)
+    return {(row['id'] if isinstance(row, dict) else row.pk): row for row in rows}
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre (campo de ordenação, id).
+
+    Em vez de OFFSET, cada página filtra a partir da última posição vista,
+    então a página N custa o mesmo que a primeira. O cursor é opaco
+    (base64 de JSON) e carrega a posição e o sentido da navegação.
+    """
+    cursor_query_param = 'cursor'
+    # Âncoras de "só o que veio depois" (ver ``paginate_rows``); os links usam só o cursor
+    since_query_params = ('since_id', 'since')
+    page_size_query_param = 'page_size'
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_page_size(self, request):
+        max_size = settings.POSTS_MAX_PAGE_SIZE
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return min(settings.POSTS_PAGE_SIZE, max_size)
+        if size <= 0:
+            return min(settings.POSTS_PAGE_SIZE, max_size)
+        return min(size, max_size)
+
+    def get_fields(self, queryset):
+        """Campos do keyset: o primeiro da ordenação atual + id como desempate."""
+        first = next(
+            (f for f in queryset.query.order_by if isinstance(f, str) and f.lstrip('-') != '?'),
+            self.default_ordering,
+        )
+        descending = first.startswith('-')
+        name = first.lstrip('-')
+        if name in ('id', 'pk'):
+            return ['-id' if descending else 'id']
+        return [first, '-id' if descending else 'id']
+
+    def paginate_queryset(self, queryset, request, view=None, since=None):
+        fields = self.get_fields(queryset)
+
+        def fetch(position, reverse, limit):
+            qs = queryset
+            if position is not None:
+                qs = qs.filter(self.position_filter(fields, position, reverse))
+            return list(qs.order_by(*self.order_by(fields, reverse))[:limit])
+
+        return self.paginate_rows(fetch, request, fields, since)
+
+    def paginate_rows(self, fetch, request, fields, since=None):
+        """
+        Pagina a partir de ``fetch(position, reverse, limit)``, que deve
+        devolver até ``limit`` linhas já filtradas e ordenadas no sentido
+        pedido. Permite paginar fontes que não são um único queryset.
+
+        ``since`` (uma posição), sem cursor na requisição, devolve só as linhas
+        anteriores a ela na ordem de exibição (as mais novas, no feed): a
+        página "previous" a partir de ``since``, com ``previous`` apontando
+        para as seguintes se houver mais de uma página.
+        """
+        self.request = request
+        self.fields = fields
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, len(fields))
+        if position is None and since is not None:
+            position, reverse = since, True
+
+        try:
+            rows = fetch(position, reverse, self.page_size + 1)
+        except (ValidationError, ValueError, TypeError):
+            # Posição adulterada que não casa com o tipo dos campos
+            if position is None:
+                raise
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, position is not None
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.first_position = self.row_position(rows[0]) if rows else None
+        self.last_position = self.row_position(rows[-1]) if rows else None
+        # Página vazia ao voltar: o link "next" deve reapontar para a posição usada
+        if not rows and position is not None:
+            self.first_position = self.last_position = position
+        return rows
+
+    @staticmethod
+    def order_by(fields, reverse=False):
+        if not reverse:
+            return list(fields)
+        return [f[1:] if f.startswith('-') else f'-{f}' for f in fields]
+
+    @staticmethod
+    def position_filter(fields, position, reverse=False):
+        """Filtro "depois de ``position``" na ordem de exibição (ou antes, se ``reverse``)."""
+        condition = Q()
+        for i, field in enumerate(fields):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            clause = Q(**{f'{name}__{lookup}': position[i]})
+            for prev, value in zip(fields[:i], position[:i]):
+                clause &= Q(**{prev.lstrip('-'): value})
+            condition |= clause
+        return condition
+
+    def row_position(self, row):
+        values = []
+        for field in self.fields:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        return values
+
+    def decode_cursor(self, request, length):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = payload['p'], bool(payload.get('r'))
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != length:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        for param in self.since_query_params:
+            url = remove_query_param(url, param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
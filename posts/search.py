@@ -0,0 +1,145 @@
+"""
+Busca textual de posts com backends plugáveis.
+
+Cada backend expõe ``matches(term)``, um SELECT com as colunas ``id`` e
+``score`` (maior = mais relevante). A partir dele a busca pode tanto filtrar
+um queryset (quando o cliente pede outra ordenação) quanto paginar por
+relevância com keyset sobre ``(score, id)``.
+
+O backend padrão depende do banco: FTS5 no SQLite, tsvector + GIN no
+PostgreSQL e ``icontains`` nos demais. ``POSTS_SEARCH_BACKEND`` força um
+backend específico (caminho pontilhado).
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, connections, router
+from django.db.models.expressions import RawSQL
+from django.db.models import Q, Value, FloatField
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .pagination import rows_by_pk
+
+SEARCH_FIELDS = ['-search_rank', '-id']
+
+_TOKEN = re.compile(r'\w+')
+NO_MATCHES = ('SELECT 0 AS id, 0.0 AS score WHERE 1 = 0', [])
+
+
+def tokenize(term):
+    return _TOKEN.findall(term.lower())
+
+
+class SearchBackend:
+    def matches(self, term):
+        """(sql, params) de um SELECT ``id, score`` com os posts que casam com ``term``."""
+        raise NotImplementedError
+
+    def filter(self, queryset, term):
+        sql, params = self.matches(term)
+        return queryset.filter(id__in=RawSQL(f'SELECT id FROM ({sql}) AS m', params))
+
+    def ranked(self, term, position, reverse, limit):
+        """Até ``limit`` pares ``(id, score)`` após ``position``, do mais ao menos relevante."""
+        sql, params = self.matches(term)
+        op, order = ('>', 'ASC') if reverse else ('<', 'DESC')
+        where = ''
+        if position is not None:
+            where = f'WHERE score {op} %s OR (score = %s AND id {op} %s)'
+            params = [*params, position[0], position[0], position[1]]
+        # Leitura como as do ORM: vai para a réplica quando o roteador mandar
+        with connections[router.db_for_read(Post)].cursor() as cursor:
+            cursor.execute(
+                f'SELECT id, score FROM ({sql}) AS m {where} ORDER BY score {order}, id {order} LIMIT %s',
+                [*params, limit],
+            )
+            return cursor.fetchall()
+
+
+class ContainsSearchBackend(SearchBackend):
+    """Equivalente ao SearchFilter original (``icontains``); sem ranking."""
+
+    def matches(self, term):
+        condition = Q()
+        for token in tokenize(term):
+            condition &= Q(content__icontains=token) | Q(author__username__icontains=token)
+        if not condition:
+            return NO_MATCHES
+        qs = Post.objects.order_by().filter(condition).annotate(
+            score=Value(0.0, output_field=FloatField())
+        ).values('id', 'score')
+        return qs.query.sql_with_params()
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """Tabela FTS5 ``posts_post_fts``, ranqueada por bm25."""
+
+    def matches(self, term):
+        tokens = tokenize(term)
+        if not tokens:
+            return NO_MATCHES
+        query = ' '.join(f'"{token}"*' for token in tokens)
+        return (
+            'SELECT rowid AS id, -bm25(posts_post_fts) AS score '
+            'FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+            [query],
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Coluna ``search_vector`` (tsvector) com índice GIN, ranqueada por ts_rank."""
+
+    def matches(self, term):
+        tokens = tokenize(term)
+        if not tokens:
+            return NO_MATCHES
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        return (
+            "SELECT p.id AS id, ts_rank(p.search_vector, q) AS score "
+            "FROM posts_post p, to_tsquery('simple', %s) q WHERE p.search_vector @@ q",
+            [query],
+        )
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'POSTS_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        elif connection.vendor == 'sqlite' and 'posts_post_fts' in connection.introspection.table_names():
+            _backend = SQLiteFTSSearchBackend()
+        else:
+            _backend = ContainsSearchBackend()
+    return _backend
+
+
+def ranked_search(term, queryset, backend=None):
+    """
+    ``fetch(position, reverse, limit)`` para ``KeysetPagination.paginate_rows``
+    com os posts que casam com ``term`` em ordem de relevância. As linhas vêm
+    de ``queryset`` (modelos ou ``.values()``) e recebem ``search_rank``.
+    """
+    backend = backend or get_search_backend()
+
+    def fetch(position, reverse, limit):
+        rows = backend.ranked(term, position, reverse, limit)
+        posts = rows_by_pk(queryset, [pk for pk, _ in rows])
+        page = []
+        for pk, score in rows:
+            if pk in posts:
+                post = posts[pk]
+                if isinstance(post, dict):
+                    post['search_rank'] = score
+                else:
+                    post.search_rank = score
+                page.append(post)
+        return page
+
+    return fetch
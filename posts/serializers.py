@@ -1,55 +1,79 @@
 from rest_framework import serializers
+from accounts.models import User
+from backend.images import ImageVariantsField
+from backend.serializers import UpdateFieldsMixin
 from .models import Post, Comment
+from .viewer import resolve_viewer_state
 
-class PostSerializer(serializers.ModelSerializer):
+
+def _viewer(context):
+    request = context.get('request')
+    return getattr(request, 'user', None)
+
+
+_picture_storage = User._meta.get_field('profile_picture').storage
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """Resolve liked_by_me/retweeted_by_me da página inteira de uma vez."""
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        if 'viewer_state' not in self.context:
+            self.context['viewer_state'] = resolve_viewer_state(_viewer(self.context), [post.pk for post in posts])
+        return super().to_representation(posts)
+
+
+class PostSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(source='author.username', read_only=True)
     liked_by_me = serializers.SerializerMethodField()
-    likes_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
     retweeted_by_me = serializers.SerializerMethodField()
     author_profile_picture = serializers.SerializerMethodField()
-    retweets_count = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField(Post._meta.get_field('image').storage)
+    author_profile_picture_variants = ImageVariantsField(
+        _picture_storage, absolute=False, source='author.profile_picture_variants',
+    )
 
     class Meta:
         model = Post
         fields = (
             'id', 'author', 'author_username',
-            'content', 'image',
+            'content', 'image', 'image_variants',
             'created_at', 'updated_at',
             'likes_count', 'comments_count',
             'retweeted_by_me', 'liked_by_me', 'retweets_count',
-            'author_profile_picture',
+            'author_profile_picture', 'author_profile_picture_variants',
+        )
+        read_only_fields = (
+            'author', 'created_at', 'updated_at',
+            'likes_count', 'comments_count', 'retweets_count',
         )
-        read_only_fields = ('author', 'created_at', 'updated_at')
+        list_serializer_class = PostListSerializer
+
+    def to_representation(self, instance):
+        state = self.context.get('viewer_state')
+        if state is None:
+            # Objeto isolado (detalhe, criação): resolve apenas este post
+            state = resolve_viewer_state(_viewer(self.context), [instance.pk])
+        self._viewer_state = state
+        return super().to_representation(instance)
 
-    def get_likes_count(self, obj):
-        return getattr(obj, 'likes_count', obj.likes.count())
+    def get_fields(self):
+        fields = super().get_fields()
+        # Prévia de comentários só quando a view a carregou (?comments_preview=N)
+        if 'comments_preview' in self.context:
+            fields['comments_preview'] = serializers.SerializerMethodField()
+        return fields
 
-    def get_comments_count(self, obj):
-        return getattr(obj, 'comments_count', obj.comments.count())
+    def get_comments_preview(self, obj):
+        comments = self.context['comments_preview'].get(obj.id, [])
+        return CommentSerializer(comments, many=True, context=self.context).data
 
     def get_liked_by_me(self, obj):
-        request = self.context.get('request')
-        user = getattr(request, 'user', None)
-        if user and user.is_authenticated:
-            annotated = getattr(obj, 'liked_by_me', None)
-            if annotated is not None:
-                return bool(annotated)
-            return obj.likes.filter(user=user).exists()
-        return False
-
-    def get_retweets_count(self, obj):
-        return getattr(obj, 'retweets_count', obj.retweets.count())
+        return obj.pk in self._viewer_state.liked
 
     def get_retweeted_by_me(self, obj):
-        request = self.context.get('request')
-        user = getattr(request, 'user', None)
-        if user and user.is_authenticated:
-            annotated = getattr(obj, 'retweeted_by_me', None)
-            if annotated is not None:
-                return bool(annotated)
-            return obj.retweets.filter(user=user).exists()
-        return False
+        return obj.pk in self._viewer_state.retweeted
 
     def get_author_profile_picture(self, obj):
         pic = getattr(obj.author, 'profile_picture', None)
@@ -60,15 +84,28 @@ class PostSerializer(serializers.ModelSerializer):
                 return None
         return None
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(source='author.username', read_only=True)
     author_profile_picture = serializers.SerializerMethodField()
+    author_profile_picture_variants = ImageVariantsField(
+        _picture_storage, absolute=False, source='author.profile_picture_variants',
+    )
 
     class Meta:
         model = Comment
-        fields = ('id', 'author', 'author_username', 'author_profile_picture', 'post', 'content', 'created_at')
+        fields = (
+            'id', 'author', 'author_username', 'author_profile_picture', 'author_profile_picture_variants',
+            'post', 'content', 'created_at',
+        )
         read_only_fields = ('author', 'created_at')
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # Mudar o post na edição deixaria o comments_count dos dois posts errado
+            fields['post'].read_only = True
+        return fields
+
     def get_author_profile_picture(self, obj):
         pic = getattr(obj.author, 'profile_picture', None)
         if pic:
@@ -0,0 +1,34 @@
+"""Mantém os contadores de ``Post`` quando um usuário é apagado."""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_posts_version
+from .counters import SOURCES, recount
+from .models import Comment
+
+
+def _engaged_post_ids(user):
+    """Posts de outros autores com curtidas, comentários ou retweets de ``user``."""
+    post_ids = set()
+    for model in SOURCES.values():
+        # Comment chama o dono de ``author``; Like e Retweet, de ``user``
+        owner = 'author' if model is Comment else 'user'
+        rows = model.objects.filter(**{owner: user}).exclude(post__author=user)
+        post_ids.update(rows.values_list('post_id', flat=True).distinct())
+    return post_ids
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def collect_engaged_posts(sender, instance, **kwargs):
+    # O CASCADE apaga as linhas sem passar por posts/engagement.py: guarda os posts afetados
+    instance._engaged_post_ids = _engaged_post_ids(instance)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def recount_engaged_posts(sender, instance, **kwargs):
+    post_ids = getattr(instance, '_engaged_post_ids', None)
+    if post_ids:
+        recount(post_ids)
+        transaction.on_commit(bump_posts_version)
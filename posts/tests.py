@@ -1,3 +1,1391 @@
-from django.test import TestCase
+import base64
+import importlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, Max, Min
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from accounts.models import Follow, User
+from backend import images, metrics, routers
+from backend.dataset import seed
+from backend.renderers import FastJSONRenderer
+from backend.middleware import QueryBudgetExceeded, ReplicaRoutingMiddleware
+from backend.querystats import fingerprint
+from . import buffer as engagement_buffer, checks, live, search, timeline, trending, viewer
+from .models import Comment, Like, Post, Retweet, TimelineEntry, TrendingPost
+from .serializers import CommentSerializer, PostSerializer
+from .views import PostViewSet
+
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def make_photo(name='foto.jpg', size=(2000, 1500)):
+    """JPEG com EXIF (inclui um campo de GPS), como sai de um celular."""
+    image = Image.new('RGB', size, (200, 80, 40))
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    exif[0x8825] = {1: 'S'}
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+def make_user(i):
+    return User.objects.create_user(
+        email=f'user{i}@example.com', username=f'user{i}',
+        password='SenhaSegura123', first_name='Nome', last_name=f'Sobrenome{i}',
+    )
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_same_bytes_as_drf(self):
+        now = timezone.now()
+        payload = {
+            'created_at': now,
+            'naive': now.replace(tzinfo=None),
+            'day': now.date(),
+            'at': now.time(),
+            'counts': {1: 'um', 2: ['dois', None]},
+            'price': Decimal('1.50'),
+            'text': 'olá \u2028 mundo',
+            'huge': 2 ** 70,
+            'nested': [{'id': 1, 'when': now}],
+        }
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertIn(b'Z"', FastJSONRenderer().render({'created_at': now}))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class FastReadPathTests(APITestCase):
+    """O caminho rápido deve produzir exatamente o mesmo JSON que os serializers."""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        User.objects.filter(pk=self.author.pk).update(profile_picture='profile_pics/author.png')
+        Follow.objects.create(follower=self.reader, following=self.author)
+        for i in range(5):
+            post = Post.objects.create(
+                author=self.author if i % 2 else self.reader,
+                content=f'olá, mundo — post {i}',
+                image='post_images/foto.jpg' if i % 3 == 0 else '',
+            )
+            timeline.fan_out_post(post)
+            for j in range(i % 3):
+                Comment.objects.create(author=self.reader, post=post, content=f'comentário {j}')
+        self.post = post
+        Like.objects.create(user=self.reader, post=post)
+
+    def assert_same_output(self, url):
+        outputs = []
+        for fast in (True, False):
+            with override_settings(POSTS_FAST_READ_PATH=fast):
+                response = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200)
+            outputs.append(response.content)
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_anonymous_listings(self):
+        for url in ['/api/posts/posts/', '/api/posts/posts/feed/', '/api/posts/posts/?search=mundo',
+                    '/api/posts/posts/?comments_preview=2', f'/api/posts/comments/?post={self.post.id}',
+                    f'/api/posts/posts/{self.post.id}/']:
+            with self.subTest(url=url):
+                self.assert_same_output(url)
+
+    def test_authenticated_listings(self):
+        self.client.force_authenticate(self.reader)
+        for url in ['/api/posts/posts/', '/api/posts/posts/feed/', '/api/posts/posts/?ordering=-likes_count',
+                    f'/api/posts/posts/{self.post.id}/comments/', f'/api/posts/posts/{self.post.id}/']:
+            with self.subTest(url=url):
+                self.assert_same_output(url)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class EngagementActionTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.post = Post.objects.create(author=self.author, content='post')
+        self.client.force_authenticate(self.reader)
+
+    def statements(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **kwargs)
+        # Ignora o controle de transação (SAVEPOINT/RELEASE nos testes)
+        sql = [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK'))]
+        return response, sql
+
+    def test_like_and_unlike_return_counts_in_two_statements(self):
+        url = f'/api/posts/posts/{self.post.id}/'
+        response, sql = self.statements('post', url + 'like/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['likes_count'], 1)
+        self.assertLessEqual(len(sql), 2)
+
+        response, sql = self.statements('post', url + 'like/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['likes_count'], 1)
+        self.assertLessEqual(len(sql), 2)
+
+        response, sql = self.statements('delete', url + 'unlike/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['likes_count'], 0)
+        self.assertLessEqual(len(sql), 2)
+
+        response, _ = self.statements('delete', url + 'unlike/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Like.objects.count(), 0)
+
+    def test_retweet_counts(self):
+        response = self.client.post(f'/api/posts/posts/{self.post.id}/retweet/')
+        self.assertEqual(response.json()['retweets_count'], 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.retweets_count, 1)
+
+    def test_missing_post(self):
+        for method, action in [('post', 'like'), ('delete', 'unlike'), ('post', 'retweet'), ('get', 'comments')]:
+            with self.subTest(action=action):
+                response = getattr(self.client, method)(f'/api/posts/posts/999/{action}/')
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post('/api/posts/posts/999/comments/', {'content': 'oi'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Comment.objects.count(), 0)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class EngagementCounterTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.post = Post.objects.create(author=self.author, content='post')
+        self.url = f'/api/posts/posts/{self.post.id}/'
+        self.client.force_authenticate(self.reader)
+
+    def counts(self):
+        self.post.refresh_from_db()
+        return self.post.likes_count, self.post.comments_count, self.post.retweets_count
+
+    def test_actions_increment_and_decrement(self):
+        self.client.post(self.url + 'like/')
+        self.client.post(self.url + 'retweet/')
+        self.client.post(self.url + 'comments/', {'content': 'pela ação'})
+        response = self.client.post('/api/posts/comments/', {'post': self.post.id, 'content': 'pelo viewset'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.counts(), (1, 2, 1))
+
+        self.client.delete(self.url + 'unlike/')
+        self.client.delete(self.url + 'unretweet/')
+        self.client.delete(f'/api/posts/comments/{response.json()["id"]}/')
+        self.assertEqual(self.counts(), (0, 1, 0))
+
+    def test_edit_does_not_write_counters(self):
+        self.client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(self.url, {'content': 'editado'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('likes_count', updates[0])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content, 'editado')
+
+    def test_comment_cannot_move_to_another_post(self):
+        other = Post.objects.create(author=self.author, content='outro')
+        response = self.client.post('/api/posts/comments/', {'post': self.post.id, 'content': 'oi'})
+        comment_id = response.json()['id']
+        response = self.client.patch(f'/api/posts/comments/{comment_id}/', {'post': other.id, 'content': 'editado'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Comment.objects.get(pk=comment_id).post_id, self.post.id)
+        self.assertEqual(self.counts(), (0, 1, 0))
+
+    def test_deleting_a_user_recounts_their_engagement(self):
+        self.client.post(self.url + 'like/')
+        self.client.post(self.url + 'comments/', {'content': 'oi'})
+        own = Post.objects.create(author=self.reader, content='próprio')
+        Like.objects.create(user=self.reader, post=own)
+        self.reader.delete()
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_recount_command(self):
+        Like.objects.create(user=self.reader, post=self.post)
+        Comment.objects.create(author=self.reader, post=self.post, content='oi')
+        Post.objects.filter(pk=self.post.pk).update(retweets_count=5)
+        call_command('recount_engagement', stdout=io.StringIO())
+        self.assertEqual(self.counts(), (1, 1, 0))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class CommentsPreviewTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.posts = [Post.objects.create(author=self.author, content=f'post {i}') for i in range(3)]
+        # Post 0: 12 comentários; post 1: 1; post 2: nenhum
+        self.comments = [Comment.objects.create(author=self.author, post=self.posts[0], content=f'c{i}') for i in range(12)]
+        self.lone = Comment.objects.create(author=self.author, post=self.posts[1], content='único')
+
+    def previews(self, query):
+        results = {}
+        for fast in (True, False):
+            with override_settings(POSTS_FAST_READ_PATH=fast):
+                response = self.client.get(f'/api/posts/posts/{query}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            page = response.json()['results']
+            results[fast] = {
+                post['id']: [c['id'] for c in post['comments_preview']] if 'comments_preview' in post else None
+                for post in page
+            }
+        self.assertEqual(results[True], results[False])
+        return results[True]
+
+    def test_newest_comments_per_post(self):
+        previews = self.previews('?comments_preview=3')
+        self.assertEqual(previews[self.posts[0].id], [c.id for c in reversed(self.comments[-3:])])
+        self.assertEqual(previews[self.posts[1].id], [self.lone.id])
+        self.assertEqual(previews[self.posts[2].id], [])
+
+    def test_limit_is_clamped_and_optional(self):
+        previews = self.previews('?comments_preview=50')
+        self.assertEqual(len(previews[self.posts[0].id]), PostViewSet.max_comments_preview)
+        for query in ('', '?comments_preview=0', '?comments_preview=abc'):
+            with self.subTest(query=query):
+                self.assertEqual(list(self.previews(query).values()), [None] * 3)
+
+    def test_preview_is_a_single_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/posts/posts/?comments_preview=5')
+        windowed = [q['sql'] for q in ctx.captured_queries if 'ROW_NUMBER' in q['sql']]
+        self.assertEqual(len(windowed), 1)
+        self.assertFalse(any('posts_comment' in q['sql'] for q in ctx.captured_queries if q['sql'] not in windowed))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class ViewerStateTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.posts = [Post.objects.create(author=self.author, content=f'post {i}') for i in range(4)]
+        Like.objects.create(user=self.reader, post=self.posts[0])
+        Retweet.objects.create(user=self.reader, post=self.posts[1])
+        # Engajamento de outro usuário não aparece para o leitor
+        Like.objects.create(user=self.author, post=self.posts[2])
+
+    def test_resolves_the_page_in_two_queries(self):
+        post_ids = [post.id for post in self.posts]
+        with self.assertNumQueries(2):
+            state = viewer.resolve_viewer_state(self.reader, post_ids)
+        self.assertEqual(state, viewer.ViewerState(frozenset({self.posts[0].id}), frozenset({self.posts[1].id})))
+
+    def test_anonymous_and_empty_pages_need_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertIs(viewer.resolve_viewer_state(AnonymousUser(), [self.posts[0].id]), viewer.EMPTY_STATE)
+            self.assertIs(viewer.resolve_viewer_state(None, [self.posts[0].id]), viewer.EMPTY_STATE)
+            self.assertIs(viewer.resolve_viewer_state(self.reader, []), viewer.EMPTY_STATE)
+
+    def test_overlay_sets_flags_on_serialized_posts(self):
+        posts = [{'id': post.id, 'liked_by_me': True, 'retweeted_by_me': True} for post in self.posts]
+        viewer.overlay_viewer_state(posts, self.reader)
+        self.assertEqual(
+            [(post['liked_by_me'], post['retweeted_by_me']) for post in posts],
+            [(True, False), (False, True), (False, False), (False, False)],
+        )
+
+    def test_listing_queries_do_not_grow_with_the_page(self):
+        self.client.force_authenticate(self.reader)
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(POSTS_FAST_READ_PATH=fast):
+                with CaptureQueriesContext(connection) as small:
+                    self.client.get('/api/posts/posts/?page_size=2')
+                with CaptureQueriesContext(connection) as large:
+                    response = self.client.get('/api/posts/posts/?page_size=4')
+                self.assertEqual(len(small), len(large))
+                flags = {post['id']: (post['liked_by_me'], post['retweeted_by_me']) for post in response.json()['results']}
+                self.assertEqual(flags[self.posts[0].id], (True, False))
+                self.assertEqual(flags[self.posts[1].id], (False, True))
+                self.assertEqual(flags[self.posts[2].id], (False, False))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=True, POSTS_CACHE_ENGAGEMENT_LAG=0)
+class PostsCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.post = Post.objects.create(author=self.author, content='primeiro')
+        self.client.force_authenticate(self.author)
+
+    def listing(self):
+        return {post['id']: post for post in self.client.get('/api/posts/posts/').json()['results']}
+
+    def test_pages_are_served_from_cache(self):
+        self.listing()
+        # Escrita sem passar pela API: nada incrementa a versão
+        Post.objects.filter(pk=self.post.pk).update(content='mudado por fora')
+        self.assertEqual(self.listing()[self.post.id]['content'], 'primeiro')
+
+    def test_post_writes_bump_the_version(self):
+        self.listing()
+        response = self.client.post('/api/posts/posts/', {'content': 'segundo'})
+        self.assertIn(response.json()['id'], self.listing())
+
+        self.client.patch(f'/api/posts/posts/{self.post.id}/', {'content': 'editado'})
+        self.assertEqual(self.listing()[self.post.id]['content'], 'editado')
+
+        self.client.delete(f'/api/posts/posts/{self.post.id}/')
+        self.assertNotIn(self.post.id, self.listing())
+
+    def test_engagement_bumps_unless_lagging(self):
+        self.listing()
+        self.client.force_authenticate(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/posts/posts/{self.post.id}/like/')
+        post = self.listing()[self.post.id]
+        self.assertEqual((post['likes_count'], post['liked_by_me']), (1, True))
+
+        with override_settings(POSTS_CACHE_ENGAGEMENT_LAG=60), self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/posts/posts/{self.post.id}/retweet/')
+            post = self.listing()[self.post.id]
+        # Contador defasado até a página expirar; o estado do leitor nunca
+        self.assertEqual((post['retweets_count'], post['retweeted_by_me']), (0, True))
+
+    def test_profile_edit_bumps_the_version(self):
+        self.listing()
+        self.client.patch('/api/auth/profile/', {'username': 'renomeado'}, format='json')
+        self.assertEqual(self.listing()[self.post.id]['author_username'], 'renomeado')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ENGAGEMENT_BUFFER_ENABLED=True, ENGAGEMENT_BUFFER_FLUSH_INTERVAL=0)
+class EngagementBufferTests(APITestCase):
+    def setUp(self):
+        engagement_buffer._buffer = None
+        self.addCleanup(setattr, engagement_buffer, '_buffer', None)
+        # Esvazia o buffer ainda dentro da transação do teste (senão o flush do atexit falha)
+        self.addCleanup(lambda: engagement_buffer.get_buffer().flush())
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.post = Post.objects.create(author=self.author, content='post')
+        self.client.force_authenticate(self.reader)
+
+    def test_own_like_is_visible_before_flush(self):
+        response = self.client.post(f'/api/posts/posts/{self.post.id}/like/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['likes_count'], 1)
+        self.assertFalse(Like.objects.exists())
+        post = self.client.get('/api/posts/posts/').json()['results'][0]
+        self.assertTrue(post['liked_by_me'])
+
+        response = self.client.post(f'/api/posts/posts/{self.post.id}/like/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_flush_deduplicates_and_recounts(self):
+        url = f'/api/posts/posts/{self.post.id}/'
+        self.client.post(url + 'like/')
+        self.client.delete(url + 'unlike/')
+        self.client.post(url + 'like/')
+        self.client.post(url + 'retweet/')
+        self.assertEqual(engagement_buffer.get_buffer().flush(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.retweets_count), (1, 1))
+        self.assertEqual(Like.objects.filter(user=self.reader, post=self.post).count(), 1)
+
+        self.client.delete(url + 'unlike/')
+        engagement_buffer.get_buffer().flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_flush_applies_net_deltas_without_counting(self):
+        others = [make_user(f'other{i}') for i in range(3)]
+        # Curtida já gravada fora do buffer (outro worker): o flush não soma de novo
+        Like.objects.create(user=others[0], post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=1)
+        buffer = engagement_buffer.get_buffer()
+        for user in others:
+            buffer.record('like', user.pk, self.post.pk, True, False)
+        buffer.record('retweet', self.reader.pk, self.post.pk, False, True)  # Linha que não existe
+        with CaptureQueriesContext(connection) as ctx:
+            buffer.flush()
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql'].upper()])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.retweets_count), (3, 0))
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 3)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class EngagementBufferFailureTests(TransactionTestCase):
+    """Flush de verdade (com commit), onde a FK de um post apagado derrubaria o lote."""
+
+    def setUp(self):
+        self.buffer = engagement_buffer.EngagementBuffer(interval=0, max_pending=100)
+        self.author, self.reader = make_user('author'), make_user('reader')
+        self.post = Post.objects.create(author=self.author, content='post')
+
+    def test_intents_for_deleted_posts_and_users_are_dropped(self):
+        gone = Post.objects.create(author=self.author, content='apagado')
+        leaving = make_user('leaving')
+        self.buffer.record('like', self.reader.pk, self.post.pk, True, False)
+        self.buffer.record('like', self.reader.pk, gone.pk, True, False)
+        self.buffer.record('retweet', leaving.pk, self.post.pk, True, False)
+        gone.delete()
+        leaving.delete()
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(Like.objects.values_list('post_id', flat=True)), [self.post.pk])
+        self.assertFalse(Retweet.objects.exists())
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failing_intents_are_retried_then_dropped(self):
+        self.buffer.record('like', self.reader.pk, self.post.pk, True, False)
+        with mock.patch.object(self.buffer, '_write', side_effect=RuntimeError('banco fora')):
+            for _ in range(engagement_buffer.MAX_ATTEMPTS - 1):
+                with self.assertRaises(RuntimeError):
+                    self.buffer.flush()
+                self.assertEqual(self.buffer.pending_delta('like', self.post.pk), 1)
+            with self.assertLogs('posts.buffer', 'ERROR'), self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.pending_delta('like', self.post.pk), 0)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_full_buffer_flush_failure_does_not_fail_the_action(self):
+        self.buffer.max_pending = 1
+        with mock.patch.object(self.buffer, '_write', side_effect=RuntimeError('banco fora')), \
+                self.assertLogs('posts.buffer', 'ERROR'):
+            self.assertTrue(self.buffer.record('like', self.reader.pk, self.post.pk, True, False))
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertTrue(Like.objects.filter(user=self.reader, post=self.post).exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, IMAGE_WORKERS=0, POSTS_CACHE_ENABLED=False)
+class ImagePipelineTests(APITestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.author = make_user('author')
+        self.client.force_authenticate(self.author)
+
+    def create_post(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/posts/posts/', {'content': 'foto', 'image': make_photo()})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Variantes ainda não existiam quando a resposta saiu
+        self.assertIsNone(response.json()['image_variants'])
+        return Post.objects.get(pk=response.json()['id'])
+
+    def test_variants_are_generated_and_exif_removed(self):
+        post = self.create_post()
+        self.assertEqual(set(post.image_variants), {'thumb', 'medium', 'full'})
+        with Image.open(post.image.path) as original:
+            self.assertFalse(original.getexif())
+        storage = post.image.storage
+        with storage.open(post.image_variants['thumb']['webp']) as thumb:
+            image = Image.open(thumb)
+            self.assertEqual((image.format, max(image.size)), ('WEBP', 320))
+        with storage.open(post.image_variants['full']['jpeg']) as full:
+            self.assertEqual(max(Image.open(full).size), 1440)
+
+    def test_listing_exposes_variant_urls(self):
+        post = self.create_post()
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(POSTS_FAST_READ_PATH=fast):
+                data = self.client.get('/api/posts/posts/').json()['results'][0]
+                self.assertTrue(data['image_variants']['thumb']['webp'].startswith('http://testserver/media/'))
+                self.assertTrue(data['image_variants']['medium']['jpeg'].endswith(
+                    post.image_variants['medium']['jpeg']))
+
+    def test_new_image_replaces_variants(self):
+        post = self.create_post()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/posts/posts/{post.id}/', {'image': make_photo('outra.jpg')},
+                                         format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        post.refresh_from_db()
+        self.assertIn('outra', post.image_variants['thumb']['webp'])
+
+    def upload(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/posts/posts/', {
+                'content': 'foto', 'image': SimpleUploadedFile('foto.jpg', content, content_type='image/jpeg'),
+            })
+        return response.json()['image'], Post.objects.get(pk=response.json()['id'])
+
+    def test_exif_is_cut_without_recompressing(self):
+        photo = make_photo().read()
+        uploaded_url, post = self.upload(photo)
+        # Cópia limpa com outro nome; o upload com EXIF não fica para trás
+        self.assertFalse(uploaded_url.endswith(post.image.name))
+        self.assertFalse(post.image.storage.exists(uploaded_url.split('/media/')[1]))
+        with Image.open(post.image.path) as original, Image.open(io.BytesIO(photo)) as source:
+            self.assertFalse(original.getexif())
+            self.assertEqual(original.tobytes(), source.tobytes())
+
+    def test_original_without_metadata_is_kept(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (50, 40), (10, 20, 30)).save(buffer, 'JPEG')
+        uploaded_url, post = self.upload(buffer.getvalue())
+        self.assertTrue(uploaded_url.endswith(post.image.name))
+        with open(post.image.path, 'rb') as stored:
+            self.assertEqual(stored.read(), buffer.getvalue())
+
+    def test_rotated_photo_is_reencoded_upright(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Girar 90°
+        buffer = io.BytesIO()
+        Image.new('RGB', (60, 30), (200, 80, 40)).save(buffer, 'JPEG', exif=exif)
+        _, post = self.upload(buffer.getvalue())
+        with Image.open(post.image.path) as original:
+            self.assertEqual(original.size, (30, 60))
+            self.assertFalse(original.getexif())
+
+    def test_superseded_upload_leaves_no_files(self):
+        _, post = self.upload(make_photo().read())
+        name = post.image.storage.save('posts/substituida.jpg', make_photo())
+
+        def files():
+            return {os.path.join(root, f) for root, _, names in os.walk(settings.MEDIA_ROOT) for f in names}
+
+        before = files()
+        # O campo já aponta para outro arquivo: este upload foi substituído antes do processamento
+        self.assertIsNone(images.process(Post, post.pk, 'image', 'image_variants', name, images.POST_IMAGE_SIZES))
+        self.assertEqual(files(), before)
+
+
+class SeedDatasetTests(APITestCase):
+    def test_derived_fields_match_source_rows(self):
+        counts = seed(users=40, posts_per_user=3, follows_per_user=5)
+        self.assertEqual(User.objects.count(), counts['users'])
+        self.assertEqual(Follow.objects.count(), counts['follows'])
+        self.assertEqual(Post.objects.count(), counts['posts'])
+        for user in User.objects.all():
+            self.assertEqual(user.followers_count, Follow.objects.filter(following=user).count())
+            self.assertEqual(user.following_count, Follow.objects.filter(follower=user).count())
+            self.assertTrue(user.username_key)
+            self.assertIn(user.last_name.split()[-1], user.name_keys.values_list('key', flat=True))
+        for post in Post.objects.all():
+            self.assertEqual(
+                (post.likes_count, post.comments_count, post.retweets_count),
+                (Like.objects.filter(post=post).count(), Comment.objects.filter(post=post).count(),
+                 Retweet.objects.filter(post=post).count()),
+            )
+        self.assertTrue(TimelineEntry.objects.exists())
+
+        # Datas espalhadas pela janela, e nenhum engajamento antes do próprio post
+        first, last = Post.objects.aggregate(first=Min('created_at'), last=Max('created_at')).values()
+        self.assertGreater(last - first, timedelta(days=7))
+        self.assertGreater(Post.objects.values('created_at').distinct().count(), counts['posts'] // 2)
+        for model in (Like, Retweet, Comment):
+            self.assertFalse(model.objects.filter(created_at__lt=F('post__created_at')).exists())
+
+        # Mesma semente, mesmo dataset
+        again = seed(users=40, posts_per_user=3, follows_per_user=5, prefix='again')
+        self.assertEqual(again, counts)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class SQLInstrumentationTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        for i in range(3):
+            Post.objects.create(author=self.author, content=f'post {i}')
+
+    def test_server_timing_header_is_for_staff_or_debug(self):
+        # O custo interno dos endpoints não vai para qualquer cliente
+        self.assertNotIn('Server-Timing', self.client.get('/api/posts/posts/'))
+        self.client.force_authenticate(self.author)
+        self.assertNotIn('Server-Timing', self.client.get('/api/posts/posts/'))
+
+        self.author.is_staff = True
+        response = self.client.get('/api/posts/posts/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+
+        self.client.force_authenticate(None)
+        with override_settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get('/api/posts/posts/'))
+
+    def test_budget_is_enforced(self):
+        with override_settings(SQL_QUERY_BUDGETS={'PostViewSet.list': 0}), self.assertLogs('backend.sql', 'WARNING'):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'PostViewSet.list'):
+                self.client.get('/api/posts/posts/')
+        with override_settings(SQL_QUERY_BUDGETS={'PostViewSet.list': 0}, SQL_BUDGET_STRICT=False):
+            with self.assertLogs('backend.sql', 'WARNING'):
+                self.assertEqual(self.client.get('/api/posts/posts/').status_code, 200)
+
+    def test_serializer_fallback_n_plus_one_is_detected(self):
+        # Sem o caminho rápido nem select_related, author_username consulta o autor post a post
+        with override_settings(POSTS_FAST_READ_PATH=False, SQL_DUPLICATE_QUERY_THRESHOLD=2), \
+                mock.patch('posts.views.PostViewSet.get_read_queryset', lambda view: Post.objects.order_by('-created_at')), \
+                self.assertLogs('backend.sql', 'WARNING'):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'N+1'):
+                self.client.get('/api/posts/posts/')
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = \'x\' LIMIT 20'),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False, METRICS_ENABLED=True)
+class MetricsTests(APITestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.reader = make_user('reader')
+
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.reader)
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.force_authenticate(self.reader)
+        self.client.get('/api/posts/posts/feed/')
+        self.client.post('/api/posts/posts/999/like/')
+        User.objects.filter(pk=self.reader.pk).update(is_staff=True)
+        self.reader.is_staff = True
+
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="PostViewSet.feed"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="PostViewSet.feed",le="+Inf"} 1', body)
+        self.assertIn('http_response_size_bytes_count{view="PostViewSet.feed"} 1', body)
+        self.assertIn('http_request_db_seconds_count{view="PostViewSet.feed"} 1', body)
+        self.assertIn('http_requests_total{view="PostViewSet.like",status="404"} 1', body)
+        self.assertIn('http_requests_in_flight{view="PostViewSet.feed"} 0', body)
+        # A própria requisição de métricas ainda está em andamento
+        self.assertIn('http_requests_in_flight{view="MetricsView.get"} 1', body)
+
+    @override_settings(SQL_INSTRUMENTATION_ENABLED=False)
+    def test_db_time_without_sql_instrumentation(self):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get('/api/posts/posts/feed/')
+        self.assertNotIn('Server-Timing', response)
+        User.objects.filter(pk=self.reader.pk).update(is_staff=True)
+        self.reader.is_staff = True
+
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('http_request_db_seconds_count{view="PostViewSet.feed"} 1', body)
+        db_sum = re.search(r'^http_request_db_seconds_sum\{view="PostViewSet.feed"\} (\S+)$', body, re.MULTILINE)
+        self.assertGreater(float(db_sum.group(1)), 0)
+
+    def test_registry_is_thread_safe(self):
+        registry = metrics.Registry()
+
+        def work():
+            for _ in range(2000):
+                registry.started('v')
+                registry.finished('v', 200, 0.01, 100, 0.001)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        views, in_flight = registry.snapshot()
+        duration, _, _, statuses = views['v']
+        self.assertEqual((sum(duration.counts), statuses[200], in_flight['v']), (16000, 16000, 0))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False, ASYNC_PARALLEL_QUERIES=False)
+class AsyncReadViewsTests(APITestCase):
+    """As variantes async devem responder exatamente como as views síncronas."""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        Follow.objects.create(follower=self.reader, following=self.author)
+        for i in range(4):
+            post = Post.objects.create(author=self.author, content=f'post {i}',
+                                       image='post_images/foto.jpg' if i % 2 else '')
+            timeline.fan_out_post(post)
+            Comment.objects.create(author=self.reader, post=post, content=f'comentário {i}')
+        self.post = post
+        Like.objects.create(user=self.reader, post=post)
+
+    async def fetch(self, url, login):
+        with override_settings(ROOT_URLCONF='backend.async_urls'):
+            if login:
+                await self.async_client.aforce_login(self.reader)
+            return await self.async_client.get(url, headers={'Accept': 'application/json'})
+
+    def assert_same(self, url, login=True):
+        if login:
+            self.client.force_login(self.reader)
+        expected = self.client.get(url, HTTP_ACCEPT='application/json')
+        response = async_to_sync(self.fetch)(url, login)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_same_output(self):
+        for url in ['/api/posts/posts/feed/', '/api/posts/posts/feed/?page_size=2', f'/api/posts/posts/{self.post.id}/',
+                    f'/api/posts/posts/{self.post.id}/comments/', '/api/auth/users/']:
+            with self.subTest(url=url):
+                self.assert_same(url)
+
+    def test_users_list_resolves_follows_for_listed_users_only(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = async_to_sync(self.fetch)('/api/auth/users/', True)
+        self.assertEqual([user['followed_by_me'] for user in response.json()], [True])
+        follows = [q['sql'] for q in ctx.captured_queries if 'accounts_follow' in q['sql']]
+        self.assertEqual(len(follows), 1)
+        self.assertIn('"following_id" IN', follows[0])
+
+    def test_fallbacks(self):
+        for url in [f'/api/posts/posts/{self.post.id}/', '/api/auth/users/', '/api/posts/posts/feed/']:
+            with self.subTest(url=url):
+                self.assert_same(url, login=False)
+        for url in ['/api/posts/posts/999/', '/api/posts/posts/x/comments/', '/api/posts/posts/999/comments/',
+                    '/api/posts/posts/feed/?cursor=lixo', '/api/auth/users/?search=reader']:
+            with self.subTest(url=url):
+                self.assert_same(url)
+
+    def test_etag_matches_sync_view(self):
+        self.client.force_login(self.reader)
+        for url in ['/api/posts/posts/feed/', f'/api/posts/posts/{self.post.id}/comments/']:
+            with self.subTest(url=url):
+                etag = self.client.get(url, HTTP_ACCEPT='application/json')['ETag']
+
+                async def revalidate():
+                    with override_settings(ROOT_URLCONF='backend.async_urls'):
+                        await self.async_client.aforce_login(self.reader)
+                        return await self.async_client.get(url, headers={'Accept': 'application/json',
+                                                                         'If-None-Match': etag})
+
+                response = async_to_sync(revalidate)()
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response['ETag'], etag)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_metrics_label_follows_sync_view(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        async_to_sync(self.fetch)('/api/posts/posts/feed/', True)
+        views, _ = metrics.registry.snapshot()
+        self.assertIn('PostViewSet.feed', views)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False, ROOT_URLCONF='backend.async_urls',
+                   ASYNC_PARALLEL_QUERIES=True)
+class AsyncParallelQueriesTests(TransactionTestCase):
+    """Consultas em paralelo (threads com conexão própria) exigem dados já commitados."""
+    # Com DB_REPLICAS configurado, as leituras fora de transação vão para a réplica (espelho do default)
+    databases = '__all__'
+
+    def test_parallel_feed(self):
+        author, reader = make_user('author'), make_user('reader')
+        # Staff recebe o Server-Timing
+        User.objects.filter(pk=reader.pk).update(is_staff=True)
+        Follow.objects.create(follower=reader, following=author)
+        posts = [Post.objects.create(author=author, content=f'post {i}') for i in range(3)]
+        for post in posts:
+            timeline.fan_out_post(post)
+        Like.objects.create(user=reader, post=posts[0])
+
+        async def fetch():
+            await self.async_client.aforce_login(reader)
+            return await self.async_client.get('/api/posts/posts/feed/')
+
+        response = async_to_sync(fetch)()
+        results = response.json()['results']
+        self.assertEqual([post['id'] for post in results], [post.id for post in reversed(posts)])
+        self.assertEqual([post['liked_by_me'] for post in results], [False, False, True])
+        # As consultas das threads de apoio entram na conta da requisição
+        self.assertRegex(response['Server-Timing'], r'desc="([5-9]|\d\d+) queries"')
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(root, 'admin', 'css'))
+        with open(os.path.join(root, 'admin', 'css', 'base.css'), 'w') as fh:
+            fh.write('body { margin: 0; }')
+        settings_override = override_settings(STATIC_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_collected_files_are_served_sync_and_async(self):
+        # Clientes novos: o middleware lê STATIC_ROOT ao ser montado
+        response = self.client_class().get('/static/admin/css/base.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'body { margin: 0; }')
+
+        async def fetch():
+            response = await self.async_client_class().get('/static/admin/css/base.css')
+            return response.status_code, b''.join([chunk async for chunk in response])
+
+        self.assertEqual(async_to_sync(fetch)(), (200, b'body { margin: 0; }'))
+        self.assertEqual(self.client_class().get('/static/admin/css/missing.css').status_code, 404)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DB_READ_YOUR_WRITES_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    def request(self, method, status_code=200, cookies=None):
+        """Alias de leitura visto pela "view" e a resposta do middleware."""
+        seen = []
+
+        def view(request):
+            seen.append(routers.read_alias())
+            return HttpResponse(status=status_code)
+
+        request = RequestFactory().generic(method, '/api/posts/posts/')
+        request.COOKIES.update(cookies or {})
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen[0], response
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        router = routers.PrimaryReplicaRouter()
+        self.assertEqual(self.request('GET')[0], 'replica1')
+        self.assertEqual(self.request('POST')[0], 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+        # Fora de uma requisição (comandos, threads de apoio) tudo vai para o primário
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'posts'))
+
+    def test_writes_pin_reads_to_primary(self):
+        _, response = self.request('POST', status_code=201)
+        cookie = response.cookies['db_primary_until']
+        self.assertEqual(cookie['max-age'], 10)
+        # Vai junto nas requisições do frontend de outra origem, como o cookie da sessão
+        self.assertEqual(cookie['samesite'], settings.SESSION_COOKIE_SAMESITE)
+        self.assertEqual(bool(cookie['secure']), settings.SESSION_COOKIE_SECURE)
+        self.assertTrue(cookie['httponly'])
+        self.assertEqual(self.request('GET', cookies={'db_primary_until': cookie.value})[0], 'default')
+        self.assertEqual(self.request('GET', cookies={'db_primary_until': '1'})[0], 'replica1')
+        self.assertEqual(self.request('GET', cookies={'db_primary_until': 'lixo'})[0], 'replica1')
+        # Escrita recusada não fixa
+        self.assertNotIn('db_primary_until', self.request('POST', status_code=400)[1].cookies)
+        self.assertNotIn('db_primary_until', self.request('GET')[1].cookies)
+
+    def test_without_replicas_nothing_changes(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            alias, response = self.request('POST', status_code=201)
+        self.assertEqual(alias, 'default')
+        self.assertNotIn('db_primary_until', response.cookies)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class PostSearchTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.backend = search.SQLiteFTSSearchBackend()
+
+    def found(self, term):
+        return {pk for pk, _ in self.backend.ranked(term, None, False, 100)}
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        post = Post.objects.create(author=self.author, content='Olá, mundo')
+        self.assertEqual(self.found('mundo'), {post.id})
+        # Prefixo e acentos: "ola mund" casa com "Olá, mundo"
+        self.assertEqual(self.found('ola mund'), {post.id})
+
+        Post.objects.filter(pk=post.pk).update(content='até logo')
+        self.assertEqual(self.found('mundo'), set())
+        self.assertEqual(self.found('logo'), {post.id})
+
+        User.objects.filter(pk=self.author.pk).update(username='renomeado')
+        self.assertEqual(self.found('renomeado'), {post.id})
+
+        post.delete()
+        self.assertEqual(self.found('logo'), set())
+
+    def test_results_are_ranked_by_relevance(self):
+        once = Post.objects.create(author=self.author, content='café com pão e um longo texto sobre outra coisa')
+        twice = Post.objects.create(author=self.author, content='café, café')
+        Post.objects.create(author=self.author, content='chá')
+        response = self.client.get('/api/posts/posts/?search=café')
+        self.assertEqual([post['id'] for post in response.json()['results']], [twice.id, once.id])
+
+    def test_missing_triggers_are_reported(self):
+        self.assertEqual(checks.check_search_triggers(None, databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_au')
+        errors = checks.check_search_triggers(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['posts.W001'])
+        self.assertIn('posts_post_fts_au', errors[0].msg)
+
+
+class SQLiteTuningTests(APITestCase):
+    def test_tuned_options_apply_on_new_connections(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        db = SQLiteWrapper({**connection.settings_dict, 'NAME': f'{tmpdir}/db.sqlite3',
+                            'OPTIONS': settings.SQLITE_TUNED_OPTIONS}, alias='tuned')
+        self.addCleanup(db.close)
+        with db.cursor() as cursor:
+            pragmas = {name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                       for name in ('journal_mode', 'synchronous', 'busy_timeout')}
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000})
+        self.assertEqual(db.transaction_mode, 'IMMEDIATE')
+
+    def test_maintenance_command(self):
+        Post.objects.create(author=make_user('author'), content='olá mundo')
+        out = io.StringIO()
+        call_command('sqlite_maintenance', stdout=out)
+        self.assertIn('Índice FTS5 de posts compactado', out.getvalue())
+        self.assertIn('Manutenção concluída', out.getvalue())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        Follow.objects.create(follower=self.reader, following=self.author)
+        self.posts = [Post.objects.create(author=self.author, content=f'post {i}') for i in range(3)]
+        for post in self.posts:
+            timeline.fan_out_post(post)
+        self.client.force_authenticate(self.reader)
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        return first, second
+
+    def test_feed_returns_304_before_rendering(self):
+        url = '/api/posts/posts/feed/'
+        first = self.client.get(url)
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', first)
+        self.assertIn('private', first['Cache-Control'])
+        self.assertIn('no-cache', first['Cache-Control'])
+        with mock.patch('posts.views.render_posts') as render:
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        render.assert_not_called()
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second.content, b'')
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_feed_changes_with_counters_and_viewer_state(self):
+        url = '/api/posts/posts/feed/'
+        etag = self.client.get(url)['ETag']
+        # Curtida de outra pessoa: só o contador muda
+        Post.objects.filter(pk=self.posts[0].pk).update(likes_count=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Curtida do próprio leitor
+        etag = response['ETag']
+        self.client.post(f'/api/posts/posts/{self.posts[1].pk}/like/')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get('/api/posts/posts/feed/')['ETag']
+        self.client.force_authenticate(self.author)
+        response = self.client.get('/api/posts/posts/feed/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_and_comment_list_304_skip_rendering(self):
+        post = self.posts[0]
+        Comment.objects.create(author=self.author, post=post, content='comentário')
+        self.client.post(f'/api/posts/posts/{post.pk}/like/')
+        for url in [f'/api/posts/posts/{post.pk}/', f'/api/posts/comments/?post={post.pk}']:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                # Uma consulta (a linha, com as flags do leitor) e nada de serializer ou renderização
+                with self.assertNumQueries(1), mock.patch('posts.views.render_posts') as render_posts, \
+                        mock.patch('posts.views.render_comments') as render_comments, \
+                        mock.patch.object(PostSerializer, 'to_representation') as serialize_post, \
+                        mock.patch.object(CommentSerializer, 'to_representation') as serialize_comment:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                for fn in (render_posts, render_comments, serialize_post, serialize_comment):
+                    fn.assert_not_called()
+        # As flags do leitor continuam no ETag do detalhe
+        url = f'/api/posts/posts/{post.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.delete(f'/api/posts/posts/{post.pk}/unlike/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_detail_comments_and_cached_list(self):
+        post = self.posts[0]
+        for url in [f'/api/posts/posts/{post.pk}/', f'/api/posts/posts/{post.pk}/comments/']:
+            with self.subTest(url=url):
+                _, second = self.revalidate(url)
+                self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        with override_settings(POSTS_CACHE_ENABLED=True):
+            # Não deixa a página em cache para os próximos testes
+            self.addCleanup(cache.clear)
+            _, second = self.revalidate('/api/posts/posts/')
+            self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        first = self.client.get(f'/api/posts/posts/{post.pk}/comments/')
+        self.client.post(f'/api/posts/posts/{post.pk}/comments/', {'content': 'novo'})
+        response = self.client.get(f'/api/posts/posts/{post.pk}/comments/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_errors_are_not_conditional(self):
+        response = self.client.get('/api/posts/posts/999/comments/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', response)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class FeedSinceTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        Follow.objects.create(follower=self.reader, following=self.author)
+        User.objects.filter(pk=self.author.pk).update(followers_count=1)
+        self.posts = [Post.objects.create(author=self.author, content=f'post {i}') for i in range(5)]
+        for post in self.posts:
+            timeline.fan_out_post(post)
+        self.client.force_authenticate(self.reader)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.json()['results']]
+
+    def test_since_id_returns_only_newer_posts(self):
+        response = self.client.get('/api/posts/posts/feed/', {'since_id': self.posts[1].pk, 'page_size': 2})
+        self.assertEqual(self.ids(response), [self.posts[3].pk, self.posts[2].pk])
+        # Mais novos que a página: seguem pelo "previous", já sem since_id
+        previous = response.json()['previous']
+        self.assertNotIn('since_id', previous)
+        self.assertEqual(self.ids(self.client.get(previous)), [self.posts[4].pk])
+
+        response = self.client.get('/api/posts/posts/feed/', {'since_id': self.posts[4].pk})
+        self.assertEqual(self.ids(response), [])
+        self.assertIsNone(response.json()['previous'])
+
+    def test_since_timestamp_and_anonymous_feed(self):
+        since = self.posts[2].created_at.isoformat()
+        self.assertEqual(self.ids(self.client.get('/api/posts/posts/feed/', {'since': since})),
+                         [self.posts[4].pk, self.posts[3].pk])
+        self.client.force_authenticate(None)
+        with override_settings(POSTS_CACHE_ENABLED=True):
+            self.addCleanup(cache.clear)
+            response = self.client.get('/api/posts/posts/feed/', {'since_id': self.posts[2].pk})
+        self.assertEqual(self.ids(response), [self.posts[4].pk, self.posts[3].pk])
+
+    def test_invalid_anchor(self):
+        for params in [{'since_id': 999}, {'since_id': 'x'}, {'since': 'ontem'}]:
+            with self.subTest(params=params):
+                response = self.client.get('/api/posts/posts/feed/', params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/posts/posts/feed/new_count/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_new_count_does_not_render_posts(self):
+        url = '/api/posts/posts/feed/new_count/'
+        with mock.patch('posts.views.render_posts') as render:
+            response = self.client.get(url, {'since_id': self.posts[1].pk})
+        render.assert_not_called()
+        self.assertEqual(response.json(), {'count': 3, 'has_more': False})
+        with override_settings(FEED_NEW_COUNT_LIMIT=2):
+            self.assertEqual(self.client.get(url, {'since_id': self.posts[0].pk}).json(), {'count': 2, 'has_more': True})
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url, {'since_id': self.posts[3].pk}).json(), {'count': 1, 'has_more': False})
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_new_count_merges_high_fanout_authors(self):
+        # O autor passou do limite depois do fan-out: os posts estão na timeline e são lidos direto
+        response = self.client.get('/api/posts/posts/feed/new_count/', {'since_id': self.posts[1].pk})
+        self.assertEqual(response.json(), {'count': 3, 'has_more': False})
+        response = self.client.get('/api/posts/posts/feed/', {'since_id': self.posts[1].pk})
+        self.assertEqual(self.ids(response), [post.pk for post in reversed(self.posts[2:])])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, LIVE_UPDATES_ENABLED=True, LIVE_TICK_SECONDS=0,
+                   LIVE_HEARTBEAT_SECONDS=0.05, LIVE_STREAM_SECONDS=5)
+class LiveUpdatesTests(APITestCase):
+    def setUp(self):
+        for name in ('_broker', '_publisher'):
+            setattr(live, name, None)
+            self.addCleanup(setattr, live, name, None)
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.post = Post.objects.create(author=self.author, content='post')
+        self.client.force_authenticate(self.reader)
+
+    def test_publisher_coalesces_per_tick(self):
+        broker = mock.Mock()
+        publisher = live.Publisher(broker, interval=60)
+        for _ in range(1000):
+            publisher.add(self.post.id, 'likes_count', 1)
+        publisher.add(self.post.id, 'retweets_count', 1)
+        publisher.add(self.post.id, 'retweets_count', -1)
+        broker.publish.assert_not_called()
+        self.assertEqual(publisher.flush(), 1)
+        broker.publish.assert_called_once_with({self.post.id: {'likes_count': 1000}})
+        self.assertEqual(publisher.flush(), 0)
+
+    def test_engagement_publishes_after_commit(self):
+        url = f'/api/posts/posts/{self.post.id}/'
+        with mock.patch.object(live.LocalBroker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url + 'like/')
+                self.client.post(url + 'like/')  # Repetida: nada muda
+                self.client.post(url + 'comments/', {'content': 'oi'})
+                publish.assert_not_called()
+        self.assertEqual(publish.call_args_list, [
+            mock.call({self.post.id: {'likes_count': 1}}),
+            mock.call({self.post.id: {'comments_count': 1}}),
+        ])
+
+    def test_stream_sends_batched_counts(self):
+        other = Post.objects.create(author=self.author, content='outro')
+
+        async def listen():
+            response = await self.async_client.get(f'/api/posts/live/?ids={self.post.id},{self.post.id}')
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            live.publish(self.post.id, 'likes_count', 1)
+            live.publish(self.post.id, 'likes_count', 1)
+            live.publish(other.id, 'likes_count', 1)
+            counts = await anext(chunks)
+            heartbeat = await anext(chunks)
+            await chunks.aclose()
+            return response, first, counts, heartbeat
+
+        response, first, counts, heartbeat = async_to_sync(listen)()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(first, b'retry: 3000\n\n')
+        self.assertEqual(counts, f'event: counts\ndata: {{"{self.post.id}":{{"likes_count":2}}}}\n\n'.encode())
+        self.assertEqual(heartbeat, b': ping\n\n')
+        # A assinatura sai do broker quando o stream termina
+        self.assertEqual(dict(live.get_broker()._subscribers), {})
+
+    def test_stream_errors(self):
+        async def get(url):
+            return await self.async_client.get(url)
+
+        for ids in ['', 'x', ','.join(str(i) for i in range(101))]:
+            with self.subTest(ids=ids):
+                self.assertEqual(async_to_sync(get)(f'/api/posts/live/?ids={ids}').status_code, 400)
+        # WSGI: cada conexão prenderia uma thread
+        self.assertEqual(self.client.get(f'/api/posts/live/?ids={self.post.id}').status_code, 501)
+        with override_settings(LIVE_UPDATES_ENABLED=False):
+            self.assertEqual(async_to_sync(get)(f'/api/posts/live/?ids={self.post.id}').status_code, 404)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False, TRENDING_ENABLED=True,
+                   TRENDING_FLUSH_INTERVAL=0, TRENDING_HALF_LIFE_HOURS=6, TRENDING_WINDOW_HOURS=24,
+                   TRENDING_MIN_SCORE=0.5)
+class TrendingTests(APITestCase):
+    def setUp(self):
+        trending._publisher = None
+        self.addCleanup(setattr, trending, '_publisher', None)
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.posts = [Post.objects.create(author=self.author, content=f'post {i}') for i in range(3)]
+        self.client.force_authenticate(self.reader)
+
+    def scores(self):
+        return {row.post_id: trending.current_score(row.score) for row in TrendingPost.objects.all()}
+
+    def test_engagement_feeds_trending(self):
+        quiet, liked, discussed = self.posts
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/posts/posts/{liked.id}/like/')
+            for content in ('um', 'dois'):
+                self.client.post(f'/api/posts/posts/{discussed.id}/comments/', {'content': content})
+        scores = self.scores()
+        self.assertEqual(set(scores), {liked.id, discussed.id})
+        self.assertAlmostEqual(scores[liked.id], 1, places=3)
+        self.assertAlmostEqual(scores[discussed.id], 4, places=3)
+
+        response = self.client.get('/api/posts/posts/trending/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.json()], [discussed.id, liked.id])
+        self.assertEqual([post['id'] for post in self.client.get('/api/posts/posts/trending/?limit=1').json()],
+                         [discussed.id])
+
+    def test_like_toggling_counts_once(self):
+        post = self.posts[0]
+        url = f'/api/posts/posts/{post.id}'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{url}/like/')
+            self.client.delete(f'{url}/unlike/')
+            self.client.post(f'{url}/like/')
+        self.assertAlmostEqual(self.scores()[post.id], 1, places=3)
+        for _ in range(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f'{url}/unlike/')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'{url}/like/')
+        self.assertAlmostEqual(self.scores()[post.id], 1, places=3)
+
+        # Desfeito por último: sai do ranking em vez de ficar negativo
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'{url}/unlike/')
+        self.assertEqual(self.scores(), {})
+
+    def test_subtract_keeps_older_points(self):
+        post = self.posts[0]
+        now = timezone.now()
+        trending.add(post.id, 3, now - timedelta(hours=6))
+        trending.add(post.id, 1, now)
+        trending.subtract(post.id, 1, now)
+        self.assertAlmostEqual(self.scores()[post.id], 1.5, places=3)
+
+    def test_scores_decay_with_half_life(self):
+        old, new, _ = self.posts
+        now = timezone.now()
+        trending.add(old.id, 10, now - timedelta(hours=20))
+        trending.add(new.id, 1, now)
+        trending.add(new.id, 1, now)
+        scores = self.scores()
+        self.assertAlmostEqual(scores[old.id], 10 * 2 ** (-20 / 6), places=3)
+        self.assertAlmostEqual(scores[new.id], 2, places=3)
+        self.assertEqual(trending.top(10), [new.id, old.id])
+
+    def test_compact_and_rebuild(self):
+        stale, cold, hot = self.posts
+        now = timezone.now()
+        trending.add(stale.id, 100, now - timedelta(hours=25))
+        trending.add(cold.id, 0.1, now)
+        trending.add(hot.id, 3, now)
+        self.assertEqual(trending.top(10), [hot.id, cold.id])
+        call_command('compact_trending', stdout=io.StringIO())
+        self.assertEqual(list(TrendingPost.objects.values_list('post_id', flat=True)), [hot.id])
+
+        Like.objects.create(user=self.reader, post=stale)
+        Retweet.objects.create(user=self.reader, post=stale)
+        call_command('compact_trending', '--rebuild', stdout=io.StringIO())
+        scores = self.scores()
+        self.assertEqual(set(scores), {stale.id})
+        self.assertAlmostEqual(scores[stale.id], 4, places=2)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False)
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.posts = [Post.objects.create(author=self.author, content=f'post {i}') for i in range(5)]
+        self.client.force_authenticate(self.author)
+
+    def walk(self, url):
+        """ids de todas as páginas seguindo ``next``; devolve também a URL da última página."""
+        ids, last = [], url
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [post['id'] for post in response.json()['results']]
+            last, url = url, response.json()['next']
+        return ids, last
+
+    def test_round_trip_next_and_previous(self):
+        expected = [post.id for post in reversed(self.posts)]
+        ids, last = self.walk('/api/posts/posts/?page_size=2')
+        self.assertEqual(ids, expected)
+
+        # Voltando pelos links "previous" a partir da última página
+        back, url = [], self.client.get(last).json()['previous']
+        while url:
+            page = self.client.get(url).json()
+            back = [post['id'] for post in page['results']] + back
+            url = page['previous']
+        self.assertEqual(back + [expected[-1]], expected)
+
+    def test_ties_on_created_at_are_broken_by_id(self):
+        Post.objects.update(created_at=timezone.now())
+        ids, _ = self.walk('/api/posts/posts/?page_size=2')
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), len(self.posts))
+
+        Post.objects.filter(pk__in=[p.id for p in self.posts[:3]]).update(likes_count=1)
+        ids, _ = self.walk('/api/posts/posts/?page_size=2&ordering=-likes_count')
+        self.assertEqual(ids, [p.id for p in reversed(self.posts[:3])] + [p.id for p in reversed(self.posts[3:])])
+
+    def test_invalid_cursor(self):
+        wrong_length = base64.urlsafe_b64encode(b'{"p":[1],"r":0}').decode()
+        wrong_type = base64.urlsafe_b64encode(b'{"p":["ontem","x"],"r":0}').decode()
+        for cursor in ['lixo', wrong_length, wrong_type]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/posts/posts/', {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, POSTS_CACHE_ENABLED=False, TIMELINE_FANOUT_LIMIT=1)
+class TimelineTests(APITestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+
+    def entries(self, user):
+        return list(TimelineEntry.objects.filter(user=user).order_by('post_id').values_list('post_id', flat=True))
+
+    def feed_ids(self, user):
+        self.client.force_authenticate(user)
+        return [post['id'] for post in self.client.get('/api/posts/posts/feed/').json()['results']]
+
+    def test_fan_out_on_create(self):
+        Follow.objects.create(follower=self.reader, following=self.author)
+        User.objects.filter(pk=self.author.pk).update(followers_count=1)
+        self.client.force_authenticate(self.author)
+        post_id = self.client.post('/api/posts/posts/', {'content': 'novo'}).json()['id']
+        self.assertEqual(self.entries(self.author), [post_id])
+        self.assertEqual(self.entries(self.reader), [post_id])
+        self.assertEqual(self.feed_ids(self.reader), [post_id])
+
+    def test_backfill_on_follow_and_prune_on_unfollow(self):
+        posts = [Post.objects.create(author=self.author, content=f'post {i}') for i in range(3)]
+        for post in posts:
+            timeline.fan_out_post(post)
+        self.assertEqual(self.entries(self.reader), [])
+
+        self.client.force_authenticate(self.reader)
+        self.client.post(f'/api/auth/follow/{self.author.id}/')
+        self.assertEqual(self.entries(self.reader), [post.id for post in posts])
+        self.assertEqual(self.feed_ids(self.reader), [post.id for post in reversed(posts)])
+
+        self.client.delete(f'/api/auth/follow/{self.author.id}/')
+        self.assertEqual(self.entries(self.reader), [])
+        self.assertEqual(self.feed_ids(self.reader), [])
+
+    def test_migration_backfills_existing_timelines(self):
+        # Dados de antes das timelines: posts e follows sem nenhuma TimelineEntry
+        Follow.objects.create(follower=self.reader, following=self.author)
+        posts = [Post.objects.create(author=self.author, content=f'post {i}') for i in range(3)]
+        self.assertEqual(self.feed_ids(self.reader), [])
+
+        migration = importlib.import_module('posts.migrations.0011_backfill_timelines')
+        migration.backfill_timelines(django_apps, None)
+        self.assertEqual(self.feed_ids(self.reader), [post.id for post in reversed(posts)])
+        self.assertEqual(self.entries(self.author), [post.id for post in posts])
+        # Rodar de novo não duplica nada
+        migration.backfill_timelines(django_apps, None)
+        self.assertEqual(TimelineEntry.objects.count(), 6)
+
+    def test_high_fanout_authors_are_merged_at_read_time(self):
+        other = make_user('other')
+        for follower in (self.reader, other):
+            Follow.objects.create(follower=follower, following=self.author)
+        # O request.user em cache ainda diria 0 seguidores; o fan-out confere no banco
+        User.objects.filter(pk=self.author.pk).update(followers_count=2)
+        self.client.force_authenticate(self.author)
+        celebrity = self.client.post('/api/posts/posts/', {'content': 'viral'}).json()['id']
+        self.assertEqual(list(TimelineEntry.objects.filter(post_id=celebrity).values_list('user_id', flat=True)), [self.author.id])
+
+        own = Post.objects.create(author=self.reader, content='meu')
+        timeline.fan_out_post(own)
+        self.assertEqual(self.feed_ids(self.reader), [own.id, celebrity])
@@ -0,0 +1,133 @@
+"""
+Timeline materializada (fan-out na escrita).
+
+Cada post novo é copiado para a timeline de cada seguidor do autor, de modo
+que ler o feed vira uma varredura por índice em ``TimelineEntry``. Autores
+com mais seguidores que ``TIMELINE_FANOUT_LIMIT`` não são distribuídos: seus
+posts são mesclados no momento da leitura.
+"""
+from django.conf import settings
+
+from accounts.models import Follow, User
+from .models import Post, TimelineEntry
+from .pagination import KeysetPagination, rows_by_pk
+
+TIMELINE_FIELDS = ['-created_at', '-post_id']
+POST_FIELDS = ['-created_at', '-id']
+
+
+def _entry(user_id, post_id, author_id, created_at):
+    return TimelineEntry(user_id=user_id, post_id=post_id, author_id=author_id, created_at=created_at)
+
+
+def fan_out_post(post):
+    """Distribui ``post`` para a timeline do autor e de seus seguidores."""
+    # Contagem lida do banco: ``post.author`` costuma ser o ``request.user``, que pode vir do cache de usuários
+    if high_fanout_authors([post.author_id]):
+        # Autor muito seguido: lido sob demanda em home_timeline()
+        follower_ids = []
+    else:
+        follower_ids = Follow.objects.filter(following_id=post.author_id).values_list('follower_id', flat=True)
+    entries = [
+        _entry(user_id, post.pk, post.author_id, post.created_at)
+        for user_id in [post.author_id, *follower_ids]
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+def backfill(follower_id, author_id):
+    """Copia os posts recentes de ``author_id`` para a timeline de quem passou a segui-lo."""
+    if author_id in high_fanout_authors([author_id]):
+        return
+    recent = (
+        Post.objects.filter(author_id=author_id)
+        .order_by(*POST_FIELDS)
+        .values_list('id', 'created_at')[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    entries = [_entry(follower_id, post_id, author_id, created_at) for post_id, created_at in recent]
+    TimelineEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+def prune(follower_id, author_id):
+    """Remove os posts de ``author_id`` da timeline de quem deixou de segui-lo."""
+    TimelineEntry.objects.filter(user_id=follower_id, author_id=author_id).delete()
+
+
+def high_fanout_authors(author_ids):
+    """Subconjunto de ``author_ids`` com seguidores acima do limite de fan-out."""
+    return set(
+        User.objects.filter(id__in=author_ids, followers_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+        .values_list('id', flat=True)
+    )
+
+
+def followed_high_fanout(user):
+    """Autores muito seguidos (fora do fan-out) que ``user`` segue."""
+    return high_fanout_authors(Follow.objects.filter(follower=user).values_list('following_id', flat=True))
+
+
+def timeline_keys(user):
+    """
+    ``fetch(position, reverse, limit)`` com só as chaves da timeline de
+    ``user`` (``{'created_at', 'id'}``): a timeline materializada mesclada com
+    os posts dos autores muito seguidos que ele segue.
+    """
+    pulled = followed_high_fanout(user)
+
+    def fetch(position, reverse, limit):
+        entries = TimelineEntry.objects.filter(user=user)
+        if position is not None:
+            entries = entries.filter(KeysetPagination.position_filter(TIMELINE_FIELDS, position, reverse))
+        keys = list(
+            entries.order_by(*KeysetPagination.order_by(TIMELINE_FIELDS, reverse))
+            .values_list('created_at', 'post_id')[:limit]
+        )
+
+        if pulled:
+            extra = Post.objects.filter(author_id__in=pulled)
+            if position is not None:
+                extra = extra.filter(KeysetPagination.position_filter(POST_FIELDS, position, reverse))
+            keys.extend(
+                extra.order_by(*KeysetPagination.order_by(POST_FIELDS, reverse))
+                .values_list('created_at', 'id')[:limit]
+            )
+            keys = sorted(set(keys), reverse=not reverse)[:limit]
+
+        return [{'created_at': created_at, 'id': post_id} for created_at, post_id in keys]
+
+    return fetch
+
+
+def home_timeline(user, queryset):
+    """
+    Devolve um ``fetch(position, reverse, limit)`` para
+    ``KeysetPagination.paginate_rows`` com as linhas de ``timeline_keys``
+    carregadas de ``queryset`` (modelos ou ``.values()``).
+    """
+    fetch_keys = timeline_keys(user)
+
+    def fetch(position, reverse, limit):
+        keys = fetch_keys(position, reverse, limit)
+        posts = rows_by_pk(queryset, [key['id'] for key in keys])
+        return [posts[key['id']] for key in keys if key['id'] in posts]
+
+    return fetch
+
+
+def count_newer(user, position, limit):
+    """
+    Quantos posts da timeline de ``user`` vêm antes de ``position`` na ordem
+    do feed (os mais novos), até ``limit``. Só toca os índices
+    ``(user, created_at, post)`` da timeline e ``(created_at, id)`` dos posts.
+    """
+    entries = TimelineEntry.objects.filter(user=user).filter(
+        KeysetPagination.position_filter(TIMELINE_FIELDS, position, reverse=True)
+    ).order_by()
+    pulled = followed_high_fanout(user)
+    if not pulled:
+        return entries[:limit].count()
+    extra = Post.objects.filter(author_id__in=pulled).filter(
+        KeysetPagination.position_filter(POST_FIELDS, position, reverse=True)
+    ).order_by()
+    # UNION: posts de quem passou do limite depois do fan-out podem estar nos dois lados
+    return len(entries.values_list('created_at', 'post_id').union(extra.values_list('created_at', 'id'))[:limit])
@@ -0,0 +1,175 @@
+"""
+Ranking de tendências com decaimento no tempo (``TRENDING_ENABLED``).
+
+Cada curtida, retweet ou comentário soma ``w * 2^((t - EPOCH) / meia-vida)``
+à pontuação do post (pesos em ``TRENDING_WEIGHTS``). Todas as pontuações
+decaem no mesmo ritmo, então comparar as somas "infladas" é o mesmo que
+comparar as pontuações decaídas de agora: o top K é uma leitura pelo índice
+de ``TrendingPost.score``, sem recalcular nada. Para não estourar o float, a
+coluna guarda o log2 da soma e cada gravação a atualiza num único UPDATE com
+log-sum-exp: ``max(s, v) + log2(1 + 2^-|s - v|)``.
+
+As ações não escrevem na tabela: os eventos são somados em memória por post
+(o ``Publisher`` de ``posts/live.py``) e gravados a cada
+``TRENDING_FLUSH_INTERVAL`` segundos numa transação, uma escrita por post, o
+que evita disputar a linha de um post viral a cada curtida.
+
+Desfazer uma curtida, um retweet ou um comentário tira o mesmo peso,
+inflado até o instante em que foi desfeito: como esse valor é pelo menos o
+que a ação somou, curtir e descurtir repetidamente não sobe o post. Quando
+a subtração zeraria a pontuação, a linha sai do ranking (pontuação 0), e a
+próxima ação começa do zero. Linhas sem
+atividade em ``TRENDING_WINDOW_HOURS`` ou já frias são apagadas pelo comando
+``compact_trending``. Mudou a meia-vida ou os pesos? ``compact_trending
+--rebuild`` recalcula a partir dos engajamentos da janela.
+"""
+import atexit
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.utils import timezone
+
+from .live import Publisher
+from .counters import SOURCES
+from .models import Post, TrendingPost
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+SUBTRACT_MARGIN = 1e-9
+
+
+def log_weight(weight, when):
+    """log2 de ``weight`` inflado até ``when``."""
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return math.log2(weight) + (when - EPOCH).total_seconds() / half_life
+
+
+def log_add(a, b):
+    """log2(2^a + 2^b) sem estourar."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def current_score(score, now=None):
+    """Pontuação decaída de agora (pesos somados, meia-vida aplicada) a partir da coluna ``score``."""
+    return 2 ** (score - log_weight(1, now or timezone.now()))
+
+
+def add(post_id, weight, when):
+    """Soma ``weight`` (já ponderado) à pontuação de ``post_id`` no instante ``when``."""
+    value = log_weight(weight, when)
+    v = Value(value, output_field=FloatField())
+    score = Greatest(F('score'), v) + Log(2, 1 + Power(2, -Abs(F('score') - v)))
+    if TrendingPost.objects.filter(post_id=post_id).update(score=score, last_event_at=when):
+        return
+    try:
+        with transaction.atomic():
+            TrendingPost.objects.create(post_id=post_id, score=value, last_event_at=when)
+    except IntegrityError:
+        # Outro processo criou a linha no meio do caminho
+        TrendingPost.objects.filter(post_id=post_id).update(score=score, last_event_at=when)
+
+
+def subtract(post_id, weight, when):
+    """Tira ``weight`` (já ponderado) da pontuação de ``post_id`` no instante ``when``, sem passar de 0."""
+    value = log_weight(weight, when)
+    # Não fica nada acima de 0 (a margem evita log2 de 0 por arredondamento): sai do ranking
+    TrendingPost.objects.filter(post_id=post_id, score__lte=value + SUBTRACT_MARGIN).delete()
+    # log2(2^s - 2^v) = s + log2(1 - 2^(v - s))
+    v = Value(value, output_field=FloatField())
+    TrendingPost.objects.filter(post_id=post_id).update(score=F('score') + Log(2, 1 - Power(2, v - F('score'))))
+
+
+class ScoreWriter:
+    """
+    Destino do ``Publisher``: grava um lote ``{post_id: {contador: eventos}}``,
+    uma escrita por post; o saldo negativo (ações desfeitas) é subtraído.
+    """
+
+    def publish(self, deltas):
+        now = timezone.now()
+        weights = {
+            post_id: sum(settings.TRENDING_WEIGHTS.get(field, 0) * count for field, count in fields.items())
+            for post_id, fields in deltas.items()
+        }
+        # Posts apagados desde o evento não entram (a FK só reclamaria no commit)
+        changed = [post_id for post_id, weight in weights.items() if weight]
+        existing = set(Post.objects.filter(pk__in=changed).values_list('id', flat=True))
+        with transaction.atomic():
+            # Ordem fixa: dois processos gravando juntos travam as linhas na mesma ordem
+            for post_id in sorted(existing):
+                weight = weights[post_id]
+                if weight > 0:
+                    add(post_id, weight, now)
+                else:
+                    subtract(post_id, -weight, now)
+
+
+_publisher = None
+
+
+def get_publisher():
+    """O acumulador de eventos do processo, ou None se desligado."""
+    global _publisher
+    if not settings.TRENDING_ENABLED:
+        return None
+    if _publisher is None:
+        _publisher = Publisher(ScoreWriter(), settings.TRENDING_FLUSH_INTERVAL)
+        atexit.register(_publisher.flush)
+    return _publisher
+
+
+def record(post_id, field, count=1):
+    """
+    Registra ``count`` eventos de ``field`` (``likes_count``...) em ``post_id``,
+    negativo para ações desfeitas; gravados no próximo flush.
+    """
+    publisher = get_publisher()
+    if publisher is not None and count:
+        publisher.add(post_id, field, count)
+
+
+def top(limit):
+    """ids dos ``limit`` posts mais quentes com atividade dentro da janela."""
+    cutoff = timezone.now() - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    return list(
+        TrendingPost.objects.filter(last_event_at__gte=cutoff)
+        .order_by('-score').values_list('post_id', flat=True)[:limit]
+    )
+
+
+def compact(now=None):
+    """Apaga posts sem atividade na janela ou com pontuação decaída abaixo do mínimo; devolve quantos."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    floor = log_weight(settings.TRENDING_MIN_SCORE, now)
+    deleted, _ = TrendingPost.objects.filter(last_event_at__lt=cutoff).delete()
+    cold, _ = TrendingPost.objects.filter(score__lt=floor).delete()
+    return deleted + cold
+
+
+def rebuild(now=None):
+    """Recalcula todas as pontuações a partir dos engajamentos da janela; devolve quantos posts."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    scores, last = {}, defaultdict(lambda: cutoff)
+    for field, model in SOURCES.items():
+        weight = settings.TRENDING_WEIGHTS.get(field)
+        if not weight:
+            continue
+        events = model.objects.filter(created_at__gte=cutoff).values_list('post_id', 'created_at').iterator()
+        for post_id, when in events:
+            value = log_weight(weight, when)
+            scores[post_id] = log_add(scores[post_id], value) if post_id in scores else value
+            last[post_id] = max(last[post_id], when)
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            [TrendingPost(post_id=post_id, score=score, last_event_at=last[post_id]) for post_id, score in scores.items()],
+            batch_size=1000,
+        )
+    return len(scores)
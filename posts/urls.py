@@ -1,8 +1,14 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
+from . import live
 from .views import PostViewSet, CommentViewSet
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
 router.register(r'comments', CommentViewSet, basename='comment')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = [
+    # Contadores ao vivo (SSE; LIVE_UPDATES_ENABLED, servidor ASGI)
+    path('live/', live.stream, name='post-live'),
+    *router.urls,
+]
\ No newline at end of file
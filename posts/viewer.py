@@ -0,0 +1,75 @@
+"""Estado do usuário (curtiu/retweetou) para uma página de posts, resolvido em lote."""
+from typing import NamedTuple
+
+from django.db.models import Exists, OuterRef
+
+from . import buffer as engagement_buffer
+from .models import Like, Retweet
+
+
+class ViewerState(NamedTuple):
+    liked: frozenset
+    retweeted: frozenset
+
+
+EMPTY_STATE = ViewerState(frozenset(), frozenset())
+
+
+def engaged_ids(model, user, post_ids):
+    """Ids de ``post_ids`` com linha de ``model`` (Like/Retweet) de ``user``, segundo o banco."""
+    return frozenset(model.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True))
+
+
+def with_pending(user, post_ids, state):
+    """``state`` com as ações ainda no buffer write-behind sobrepostas."""
+    buffer = engagement_buffer.get_buffer()
+    if buffer is None:
+        return state
+    return ViewerState(
+        buffer.overlay('like', user.pk, post_ids, state.liked),
+        buffer.overlay('retweet', user.pk, post_ids, state.retweeted),
+    )
+
+
+def resolve_viewer_state(user, post_ids):
+    """
+    Uma consulta ``IN (post_ids)`` em Like e outra em Retweet para a página
+    inteira, com as ações ainda no buffer write-behind sobrepostas.
+    """
+    post_ids = list(post_ids)
+    if not (user and user.is_authenticated) or not post_ids:
+        return EMPTY_STATE
+    state = ViewerState(engaged_ids(Like, user, post_ids), engaged_ids(Retweet, user, post_ids))
+    return with_pending(user, post_ids, state)
+
+
+def annotate_viewer_state(queryset, user):
+    """
+    ``queryset`` (de ``.values()``) com as flags de ``user`` em subconsultas
+    ``EXISTS``: para um post só, a mesma consulta que busca a linha resolve o estado.
+    """
+    if not (user and user.is_authenticated):
+        return queryset
+    return queryset.annotate(
+        viewer_liked=Exists(Like.objects.filter(user=user, post=OuterRef('pk'))),
+        viewer_retweeted=Exists(Retweet.objects.filter(user=user, post=OuterRef('pk'))),
+    )
+
+
+def row_viewer_state(user, row):
+    """Estado de uma linha de ``annotate_viewer_state()`` (as flags saem da linha), com o buffer sobreposto."""
+    liked, retweeted = row.pop('viewer_liked', False), row.pop('viewer_retweeted', False)
+    if not (user and user.is_authenticated):
+        return EMPTY_STATE
+    post_ids = [row['id']]
+    state = ViewerState(frozenset(post_ids if liked else ()), frozenset(post_ids if retweeted else ()))
+    return with_pending(user, post_ids, state)
+
+
+def overlay_viewer_state(posts, user):
+    """Aplica as flags de ``user`` sobre posts já serializados (dicts)."""
+    state = resolve_viewer_state(user, [post['id'] for post in posts])
+    for post in posts:
+        post['liked_by_me'] = post['id'] in state.liked
+        post['retweeted_by_me'] = post['id'] in state.retweeted
+    return posts
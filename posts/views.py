@@ -1,140 +1,340 @@
+import sys
+
 from rest_framework import viewsets, permissions, status, filters
+from rest_framework.settings import api_settings
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
-from .models import Post, Comment, Like, Retweet
+from .models import Post, Comment
 from .serializers import PostSerializer, CommentSerializer
-from django.db.models import Count, Exists, OuterRef, Value, BooleanField
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .permissions import IsAuthorOrReadOnly
+from .pagination import KeysetPagination, rows_by_pk
+from .filters import PostSearchFilter
+from .search import SEARCH_FIELDS, ranked_search, tokenize
+from . import engagement, timeline, trending
+from .cache import bump_posts_version, cached_response
+from .viewer import EMPTY_STATE, annotate_viewer_state, resolve_viewer_state, row_viewer_state
+from .fastpath import COMMENT_COLUMNS, POST_COLUMNS, render_comments, render_posts
 from accounts.models import Follow
+from backend import images
+from backend.conditional import ConditionalGetMixin, latest
+
+
+def schedule_image(post):
+    """Gera as variantes da imagem do post em segundo plano (backend.images)."""
+    images.schedule(post, 'image', 'image_variants', images.POST_IMAGE_SIZES,
+                    on_done=lambda pk: bump_posts_version())
+
+
+def post_pk(pk):
+    """pk da URL como inteiro; 404 (como ``get_object()``) se não for válido."""
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        raise NotFound()
+
+
+def feed_since(request):
+    """
+    Posição do keyset do feed (``[created_at, id]``) a partir de ``?since_id=``
+    (o post mais novo que o cliente já tem) ou ``?since=`` (data ISO 8601),
+    ou None sem nenhum dos dois.
+    """
+    params = request.query_params
+    if params.get('since_id'):
+        try:
+            created_at = Post.objects.filter(pk=int(params['since_id'])).values_list('created_at', flat=True).first()
+        except ValueError:
+            created_at = None
+        if created_at is None:
+            raise ValidationError({'since_id': ['Post inexistente; use since com a data do post.']})
+        return [created_at.isoformat(), int(params['since_id'])]
+    if params.get('since'):
+        try:
+            moment = parse_datetime(params['since'])
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise ValidationError({'since': ['Data inválida; use ISO 8601.']})
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        # id acima de qualquer outro: posts no mesmo instante de ``since`` não entram
+        return [moment.isoformat(), sys.maxsize]
+    return None
+
+
+def page_validators(rows, viewer_state):
+    """O que identifica uma página do caminho rápido: as linhas e as flags do leitor nela."""
+    return rows, sorted(viewer_state.liked), sorted(viewer_state.retweeted)
+
+
+def engagement_response(result, done, already, done_status=status.HTTP_201_CREATED, already_status=status.HTTP_200_OK):
+    """Resposta das ações de engajamento, com os contadores atualizados do post."""
+    if result.counts is None:
+        raise NotFound()
+    message, code = (done, done_status) if result.changed else (already, already_status)
+    return Response({'message': message, **result.counts._asdict()}, status=code)
+
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.select_related('author')\
-        .annotate(
-            likes_count=Count('likes', distinct=True),
-            comments_count=Count('comments', distinct=True),
-            retweets_count=Count('retweets', distinct=True),
-        )\
-        .prefetch_related('comments')\
-        .order_by('-created_at')
+def latest_comments(post_ids, limit, values=False):
+    """
+    Os ``limit`` comentários mais recentes de cada post, numa única consulta
+    com ROW_NUMBER() OVER (PARTITION BY post_id). Com ``values=True`` devolve
+    linhas de ``COMMENT_COLUMNS`` em vez de instâncias.
+    """
+    ranked = Comment.objects.filter(post_id__in=post_ids).select_related('author').annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('post_id'),
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(position__lte=limit).order_by('post_id', 'position')
+    previews = {post_id: [] for post_id in post_ids}
+    if values:
+        for comment in ranked.values(*COMMENT_COLUMNS):
+            previews[comment['post_id']].append(comment)
+        return previews
+    for comment in ranked:
+        previews[comment.post_id].append(comment)
+    return previews
+
+
+class PostViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.select_related('author').order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    pagination_class = KeysetPagination
     ordering_fields = ['created_at', 'likes_count', 'comments_count', 'retweets_count']
     ordering = ['-created_at']
-    filter_backends = [filters.OrderingFilter, filters.SearchFilter]
-    search_fields = ['content', 'author__username']
+    filter_backends = [filters.OrderingFilter, PostSearchFilter]
+    max_comments_preview = 10
+    # Verdadeiro enquanto o payload anônimo (cacheável) é montado
+    anonymous = False
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        timeline.fan_out_post(post)
+        schedule_image(post)
+        bump_posts_version()
 
-    def get_queryset(self):
-        qs = Post.objects.select_related('author').prefetch_related('comments')
-        qs = qs.annotate(
-            likes_count=Count('likes', distinct=True), 
-            comments_count=Count('comments', distinct=True),
-            retweets_count=Count('retweets', distinct=True),
-        )
-        user = getattr(self, 'request', None).user if hasattr(self, 'request') else None
-        if user and user.is_authenticated:
-            qs = qs.annotate(
-                liked_by_me=Exists(
-                    Like.objects.filter(post=OuterRef('pk'), user=user)
-                ),
-                retweeted_by_me=Exists(
-                    Retweet.objects.filter(post=OuterRef('pk'), user=user)
-                ),
-            )
+    def perform_update(self, serializer):
+        if 'image' in serializer.validated_data:
+            # Imagem nova: variantes antigas saem já; as novas chegam depois
+            schedule_image(serializer.save(image_variants=None))
         else:
-            qs = qs.annotate(
-                liked_by_me=Value(False, output_field=BooleanField()),
-                retweeted_by_me=Value(False, output_field=BooleanField()),
-            )
-        return qs.order_by('-created_at')
+            serializer.save()
+        bump_posts_version()
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        bump_posts_version()
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(self, request, lambda: self.build_list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(self, request, lambda: self.build_retrieve(request, *args, **kwargs))
+
+    def build_retrieve(self, request, *args, **kwargs):
+        if not settings.POSTS_FAST_READ_PATH:
+            return super().retrieve(request, *args, **kwargs)
+        queryset = self.get_read_queryset().filter(pk=post_pk(kwargs[self.lookup_field]))
+        if not self.anonymous:
+            # As flags do leitor vêm na mesma consulta da linha
+            queryset = annotate_viewer_state(queryset, request.user)
+        row = queryset.first()
+        if row is None:
+            raise NotFound()
+        if self.anonymous:
+            viewer_state = EMPTY_STATE
+        else:
+            viewer_state = row_viewer_state(request.user, row)
+            # 304 antes de montar o post, como em render_page()
+            self.validate(page_validators([row], viewer_state), last_modified=row['updated_at'])
+        return Response(render_posts([row], request, viewer_state)[0])
+
+    def build_list(self, request, *args, **kwargs):
+        # Busca sem ordenação explícita: resultados ranqueados por relevância
+        term = request.query_params.get('search', '').strip()
+        if tokenize(term) and api_settings.ORDERING_PARAM not in request.query_params:
+            fetch = ranked_search(term, self.get_read_queryset())
+            page = self.paginator.paginate_rows(fetch, request, SEARCH_FIELDS)
+            return self.get_paginated_response(self.render_page(page))
+        queryset = self.filter_queryset(self.get_read_queryset())
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.render_page(page))
+
+    def get_read_queryset(self):
+        """Queryset das listagens: linhas de ``.values()`` no caminho rápido."""
+        if settings.POSTS_FAST_READ_PATH:
+            return self.get_queryset().values(*POST_COLUMNS)
+        return self.get_queryset()
+
+    def render_page(self, page, paginated=True):
+        """Representação de uma página de ``get_read_queryset()`` (``paginated``: com links do cursor)."""
+        if not settings.POSTS_FAST_READ_PATH:
+            return self.get_serializer(page, many=True).data
+        post_ids = [row['id'] for row in page]
+        if self.anonymous:
+            viewer_state = EMPTY_STATE
+        else:
+            viewer_state = resolve_viewer_state(self.request.user, post_ids)
+        limit = self.get_comments_preview_limit()
+        preview = latest_comments(post_ids, limit, values=True) if limit else None
+        if not self.anonymous:
+            # 304 antes de montar a página (o payload anônimo é validado depois do overlay)
+            links = (self.paginator.get_next_link(), self.paginator.get_previous_link()) if paginated else ()
+            self.validate(page_validators(page, viewer_state), preview, *links, last_modified=latest(page))
+        return render_posts(page, self.request, viewer_state, preview)
+
+    def get_serializer(self, *args, **kwargs):
+        # ?comments_preview=N embute os N comentários mais recentes de cada post da página
+        if args and kwargs.get('many'):
+            limit = self.get_comments_preview_limit()
+            if limit:
+                context = self.get_serializer_context()
+                context['comments_preview'] = latest_comments([post.id for post in args[0]], limit)
+                kwargs['context'] = context
+        return super().get_serializer(*args, **kwargs)
 
+    def get_comments_preview_limit(self):
+        try:
+            limit = int(self.request.query_params.get('comments_preview', 0))
+        except ValueError:
+            return 0
+        return max(0, min(limit, self.max_comments_preview))
+
+    def get_queryset(self):
+        # Sem anotações por usuário: as flags vêm de resolve_viewer_state() após a paginação
+        return Post.objects.select_related('author').order_by('-created_at')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.anonymous:
+            context['viewer_state'] = EMPTY_STATE
+        return context
+
+    # Ações de engajamento: sem get_object(), só o pk (ver posts/engagement.py)
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def retweet(self, request, pk=None):
-        post = self.get_object()
-        retweet, created = Retweet.objects.get_or_create(user=request.user, post=post)
-        if created:
-            return Response({'message': 'Retweet realizado'}, status=status.HTTP_201_CREATED)
-        return Response({'message': 'Você já retweetou este post'}, status=status.HTTP_200_OK)
-        
+        result = engagement.engage('retweet', request.user.pk, post_pk(pk))
+        return engagement_response(result, 'Retweet realizado', 'Você já retweetou este post')
+
     @action(detail=True, methods=['delete'], permission_classes=[permissions.IsAuthenticated])
     def unretweet(self, request, pk=None):
-        post = self.get_object()
-        deleted, _ = Retweet.objects.filter(user=request.user, post=post).delete()
-        if deleted:
-            return Response({'message': 'Retweet removido'}, status=status.HTTP_200_OK)
-        return Response({'message': 'Você não tinha retweetado este post'}, status=status.HTTP_404_NOT_FOUND)
-        
+        result = engagement.disengage('retweet', request.user.pk, post_pk(pk))
+        return engagement_response(result, 'Retweet removido', 'Você não tinha retweetado este post',
+                                   status.HTTP_200_OK, status.HTTP_404_NOT_FOUND)
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def like(self, request, pk=None):
-        post = self.get_object()
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
-        if created:
-            return Response({'message': 'Post curtido'}, status=status.HTTP_201_CREATED)
-        return Response({'message': 'Você já curtiu este post'}, status=status.HTTP_200_OK)
+        result = engagement.engage('like', request.user.pk, post_pk(pk))
+        return engagement_response(result, 'Post curtido', 'Você já curtiu este post')
 
     @action(detail=True, methods=['delete'], permission_classes=[permissions.IsAuthenticated])
     def unlike(self, request, pk=None):
-        post = self.get_object()
-        deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
-        if deleted:
-            return Response({'message': 'Curtida removida'}, status=status.HTTP_200_OK)
-        return Response({'message': 'Você não tinha curtido este post'}, status=status.HTTP_404_NOT_FOUND)
-    
+        result = engagement.disengage('like', request.user.pk, post_pk(pk))
+        return engagement_response(result, 'Curtida removida', 'Você não tinha curtido este post',
+                                   status.HTTP_200_OK, status.HTTP_404_NOT_FOUND)
+
     @action(detail=True, methods=['get', 'post'], permission_classes=[permissions.IsAuthenticated])
     def comments(self, request, pk=None):
-        post = self.get_object()
+        post_id = post_pk(pk)
         if request.method == 'GET':
-            qs = Comment.objects.filter(post=post).select_related('author').order_by('-created_at')
-            serializer = CommentSerializer(qs, many=True, context={'request': request})
-            return Response(serializer.data)
+            qs = Comment.objects.filter(post_id=post_id).select_related('author').order_by('-created_at')
+            rows = list(qs.values(*COMMENT_COLUMNS) if settings.POSTS_FAST_READ_PATH else qs)
+            # Lista vazia: distinguir post sem comentários de post inexistente
+            if not rows and not Post.objects.filter(pk=post_id).exists():
+                raise NotFound()
+            if not settings.POSTS_FAST_READ_PATH:
+                return Response(CommentSerializer(rows, many=True, context={'request': request}).data)
+            self.validate(rows)
+            return Response(render_comments(rows))
         # POST: criar comentário deste post
         content = request.data.get('content', '').strip()
         if not content:
             return Response({'content': ['Este campo é obrigatório.']}, status=status.HTTP_400_BAD_REQUEST)
-        comment = Comment.objects.create(author=request.user, post=post, content=content)
+        comment, counts = engagement.add_comment(request.user, post_id, content)
+        if comment is None:
+            raise NotFound()
         return Response(CommentSerializer(comment, context={'request': request}).data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def feed(self, request):
-        # Feed público: todos os posts, com anotações
-        qs = Post.objects.select_related('author').prefetch_related('comments')
-        qs = qs.annotate(
-            likes_count=Count('likes', distinct=True),
-            comments_count=Count('comments', distinct=True),
-            retweets_count=Count('retweets', distinct=True),
-        )
-
-        user = request.user
-        if user.is_authenticated:
-            qs = qs.annotate(
-                liked_by_me=Exists(Like.objects.filter(post=OuterRef('pk'), user=user)),
-                retweeted_by_me=Exists(Retweet.objects.filter(post=OuterRef('pk'), user=user)),
-            )
-        else:
-            qs = qs.annotate(
-                liked_by_me=Value(False, output_field=BooleanField()),
-                retweeted_by_me=Value(False, output_field=BooleanField()),
+        # Autenticado: timeline dos seguidos; anônimo: feed público (em cache) com todos os posts.
+        # ?since_id=/?since= devolvem só os posts mais novos que a âncora.
+        since = feed_since(request)
+        if request.user.is_authenticated:
+            page = self.paginator.paginate_rows(
+                timeline.home_timeline(request.user, self.get_read_queryset()), request, timeline.POST_FIELDS, since
             )
+            return self.get_paginated_response(self.render_page(page))
+        if since is not None:
+            # Uma âncora por cliente: não compensa guardar em cache
+            return self.public_feed(request, since)
+        return cached_response(self, request, lambda: self.public_feed(request))
 
-        qs = qs.order_by('-created_at')
+    def public_feed(self, request, since=None):
+        page = self.paginator.paginate_queryset(self.get_read_queryset(), request, view=self, since=since)
+        return self.get_paginated_response(self.render_page(page))
 
-        page = self.paginate_queryset(qs)
-        if page is not None:
-            serializer = PostSerializer(page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
-        serializer = PostSerializer(qs, many=True, context={'request': request})
-        return Response(serializer.data)
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def trending(self, request):
+        # ?limit=K posts mais quentes das últimas TRENDING_WINDOW_HOURS, do mais quente para o menos
+        return cached_response(self, request, lambda: self.build_trending(request))
 
+    def build_trending(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.POSTS_PAGE_SIZE))
+        except ValueError:
+            limit = settings.POSTS_PAGE_SIZE
+        post_ids = trending.top(max(1, min(limit, settings.POSTS_MAX_PAGE_SIZE)))
+        rows = rows_by_pk(self.get_read_queryset(), post_ids)
+        page = [rows[post_id] for post_id in post_ids if post_id in rows]
+        return Response(self.render_page(page, paginated=False))
 
-class CommentViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path='feed/new_count', permission_classes=[permissions.AllowAny])
+    def new_count(self, request):
+        """Quantos posts do feed são mais novos que ``since_id``/``since``, sem montar nenhum post."""
+        since = feed_since(request)
+        if since is None:
+            raise ValidationError({'since_id': ['Informe since_id ou since.']})
+        limit = settings.FEED_NEW_COUNT_LIMIT
+        if request.user.is_authenticated:
+            count = timeline.count_newer(request.user, since, limit + 1)
+        else:
+            newer = Post.objects.filter(KeysetPagination.position_filter(timeline.POST_FIELDS, since, reverse=True))
+            count = newer.order_by()[:limit + 1].count()
+        return Response({'count': min(count, limit), 'has_more': count > limit})
+
+
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.select_related('author', 'post').order_by('-created_at')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            engagement.comment_created(comment)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            engagement.comment_deleted(instance)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.POSTS_FAST_READ_PATH:
+            return super().list(request, *args, **kwargs)
+        rows = list(self.filter_queryset(self.get_queryset()).values(*COMMENT_COLUMNS))
+        self.validate(rows)
+        return Response(render_comments(rows))
 
     def get_queryset(self):
         qs = super().get_queryset()